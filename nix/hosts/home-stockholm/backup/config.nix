@@ -21,12 +21,102 @@
       yearly = policy.yearly or null;
     };
 
+  # Serialize pre-backup commands (a bare argv is a serial command)
+  serializePreBackupCommand = command:
+    if builtins.isList command
+    then serializePreBackupCommand {inherit command;}
+    else {
+      command = command.command;
+      parallel = command.parallel or false;
+      timeoutSeconds = command.timeoutSeconds or 1800;
+    };
+
+  # Serialize application quiesce hooks
+  serializeQuiesceHook = hook: {
+    name = hook.name;
+    quiesce = hook.quiesce;
+    unquiesce = hook.unquiesce or [];
+    deployment = hook.deployment or null;
+    container = hook.container or null;
+    hold = hook.hold or false;
+    timeoutSeconds = hook.timeoutSeconds or 60;
+  };
+
+  # Serialize stdin stream sources
+  serializeStream = stream: {
+    name = stream.name;
+    command = stream.command;
+    filename = stream.filename;
+    deployment = stream.deployment or null;
+    container = stream.container or null;
+  };
+
+  # Serialize built-in k3s etcd source
+  serializeK3sEtcd = source:
+    if source == null
+    then null
+    else {
+      k3s = source.k3s;
+      etcdctl = source.etcdctl or null;
+      timeoutSeconds = source.timeoutSeconds or 600;
+    };
+
+  # Serialize built-in Vault raft source
+  serializeVaultRaft = source:
+    if source == null
+    then null
+    else {
+      address = source.address;
+      tokenPath = source.tokenPath;
+      curl = source.curl or "curl";
+      filename = source.filename or "vault-raft.snap";
+    };
+
+  # Serialize built-in Prometheus TSDB snapshot source
+  serializePrometheusSnapshot = source:
+    if source == null
+    then null
+    else {
+      pvc = source.pvc;
+      deployment = source.deployment or "prometheus";
+      container = source.container or null;
+      tsdbPath = source.tsdbPath or "data";
+      port = source.port or 9090;
+      timeoutSeconds = source.timeoutSeconds or 300;
+    };
+
+  # Serialize sharding config
+  serializeSharding = sharding:
+    if sharding == null
+    then null
+    else {
+      by = sharding.by or "target";
+      jobs = sharding.jobs or 2;
+    };
+
+  # Serialize target frequency class
+  serializeTargetClass = targetClass: {
+    frequency = targetClass.frequency or "nightly";
+    regenerable = targetClass.regenerable or false;
+  };
+
+  # Serialize point-in-time snapshot config
+  serializeSnapshot = snapshot:
+    if snapshot == null
+    then null
+    else {
+      provider = snapshot.provider or "auto";
+      stagingDir = snapshot.stagingDir or null;
+    };
+
   # Serialize restore config
   serializeRestore = name: svc: let
     backup = svc.backup or {};
     restore = backup.restore or {};
     restic = restore.restic or {};
     kubernetes = restore.kubernetes or (backup.kubernetes or null);
+    # The TSDB snapshot is restored into its PVC, with Prometheus scaled down
+    prometheus = backup.prometheusSnapshot or null;
   in {
     tag = restore.tag or name;
     paths = restore.paths or (backup.paths or []);
@@ -35,8 +125,12 @@
       then null
       else {
         namespace = kubernetes.namespace;
-        deployments = kubernetes.deployments or [];
-        pvcs = kubernetes.pvcs or [];
+        deployments = lib.unique (
+          (kubernetes.deployments or [])
+          ++ lib.optional (prometheus != null) (prometheus.deployment or "prometheus")
+        );
+        pvcs = lib.unique ((kubernetes.pvcs or []) ++ lib.optional (prometheus != null) prometheus.pvc);
+        dependsOn = kubernetes.dependsOn or {};
       };
     target = restic.target or "/";
   };
@@ -58,11 +152,23 @@
           namespace = kubernetes.namespace;
           deployments = kubernetes.deployments or [];
           pvcs = kubernetes.pvcs or [];
+          dependsOn = kubernetes.dependsOn or {};
+          detectWriters = kubernetes.detectWriters or false;
         };
-      preBackupCommands = backup.preBackupCommands or [];
+      preBackupCommands = map serializePreBackupCommand (backup.preBackupCommands or []);
       tags = backup.tags or [name];
       exclude = backup.exclude or [];
       policy = serializePolicy (backup.policy or null);
+      weight = backup.weight or 1;
+      quiesce = backup.quiesce or "scale";
+      quiesceHooks = map serializeQuiesceHook (backup.quiesceHooks or []);
+      streams = map serializeStream (backup.streams or []);
+      k3sEtcd = serializeK3sEtcd (backup.k3sEtcd or null);
+      vaultRaft = serializeVaultRaft (backup.vaultRaft or null);
+      prometheusSnapshot = serializePrometheusSnapshot (backup.prometheusSnapshot or null);
+      snapshot = serializeSnapshot (backup.snapshot or null);
+      sharding = serializeSharding (backup.sharding or null);
+      targetClasses = lib.mapAttrs (_: serializeTargetClass) (backup.targetClasses or {});
     };
     restore = serializeRestore name svc;
   };
@@ -72,7 +178,14 @@
     paths = {
       secretsRoot = config.homeserver.paths.secretsRoot;
       backupMetadataRoot = "/var/lib/svc/backup-metadata";
+      mountRoot = "/run/svc/mnt";
     };
+    # Recorded as the restic --host of every snapshot, so parent lookup does not
+    # depend on the runtime hostname.
+    resticHost = config.networking.hostName;
+    # Kubernetes calls go to the API server over pooled connections; set to
+    # "kubectl" to spawn kubectl for each call instead.
+    kubernetesClient = "api";
     services = lib.mapAttrs serializeService services;
   };
 
@@ -15,6 +15,9 @@
 
   svcPackage = import ./svc {inherit pkgs;};
   svcBin = "${svcPackage}/bin/svc";
+
+  # Combined service weight allowed to back up concurrently (see backup.weight).
+  backupJobs = 3;
 in {
   homeserver.vault.secrets = {
     restic-local = {
@@ -41,9 +44,13 @@ in {
     lib.mapAttrsToList (name: svc: {
       assertion =
         (svc.backup.paths or []) != []
+        || (svc.backup.streams or []) != []
+        || (svc.backup.k3sEtcd or null) != null
+        || (svc.backup.vaultRaft or null) != null
+        || (svc.backup.prometheusSnapshot or null) != null
         || (((svc.backup.kubernetes or null) != null)
           && ((svc.backup.kubernetes.pvcs or []) != []));
-      message = "Service '${name}' has backup.enable = true but backup.paths and backup.kubernetes.pvcs are both empty.";
+      message = "Service '${name}' has backup.enable = true but no backup source: backup.paths, backup.streams and backup.kubernetes.pvcs are all empty, and backup.k3sEtcd, backup.vaultRaft and backup.prometheusSnapshot are unset.";
     })
     selected;
 
@@ -59,13 +66,18 @@ in {
         TimeoutStartSec = "12h";
         EnvironmentFile = resticEnv "local";
       };
-      script = "${svcBin} backup local all";
+      script = "${svcBin} backup --jobs ${toString backupJobs} --async-scale-up local all";
     };
 
+    # Replicates the local repository's new snapshots with `restic copy`: no service
+    # downtime and no source reads. The remote repository must share the local
+    # chunker parameters for data to deduplicate (create it with
+    # `restic init --from-repo <local> --copy-chunker-params`).
     backup-remote = {
       description = "Restic backup (remote)";
       restartIfChanged = false;
-      after = ["network-online.target" "vault-agent.service"];
+      # Both timers fire at the same time; copy what the local run just saved.
+      after = ["network-online.target" "vault-agent.service" "backup.service"];
       wants = ["network-online.target" "vault-agent.service"];
       requires = ["vault-agent.service"];
       serviceConfig = {
@@ -73,7 +85,7 @@ in {
         TimeoutStartSec = "12h";
         EnvironmentFile = resticEnv "remote";
       };
-      script = "${svcBin} backup remote all";
+      script = "${svcBin} backup --jobs ${toString backupJobs} --replicate-from local remote all";
     };
   };
 
@@ -26,7 +26,14 @@ let
 in
   pkgs.writeShellApplication {
     name = "svc";
-    runtimeInputs = [pythonEnv];
+    runtimeInputs = [
+      pythonEnv
+      # Point-in-time snapshot providers and restic bind-mount namespaces.
+      pkgs.btrfs-progs
+      pkgs.lvm2
+      pkgs.rsync
+      pkgs.util-linux
+    ];
     text = ''
       exec ${pythonEnv}/bin/python3 -m svc.svc "$@"
     '';
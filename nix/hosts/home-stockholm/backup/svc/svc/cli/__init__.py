@@ -3,6 +3,7 @@
 from .commands import AppContext, Command
 from .parser import cli
 from .renderer import (
+    BufferedRenderer,
     PlainRenderer,
     Renderer,
     RichRenderer,
@@ -13,6 +14,7 @@ from .renderer import (
 
 __all__ = [
     "AppContext",
+    "BufferedRenderer",
     "Command",
     "PlainRenderer",
     "Renderer",
@@ -11,6 +11,12 @@ class BackupArgs:
 
     env: str
     service: str
+    jobs: int = 1
+    async_scale_up: bool = False
+    force: bool = False
+    replicate_from: str | None = None
+    resume: bool = False
+    resume_max_age: float = 24
 
 
 @dataclass(frozen=True)
@@ -21,6 +27,7 @@ class RestoreArgs:
     service: str
     snapshot: str
     verify_includes: bool
+    vault_token_file: str | None = None
 
 
 @dataclass(frozen=True)
@@ -36,3 +43,14 @@ class ListBackupsArgs:
 
     env: str
     service: str
+
+
+@dataclass(frozen=True)
+class MigratePvcArgs:
+    """Arguments for `svc migrate-pvc`."""
+
+    namespace: str
+    mode: str
+    source: str
+    target: str
+    jobs: int = 4
@@ -3,6 +3,7 @@
 from .backup_cmd import BackupCommand
 from .base import AppContext, Command
 from .list_cmd import ListBackupsCommand, ListCommand
+from .migrate_cmd import MigratePvcCommand
 from .restore_cmd import RestoreCommand
 
 __all__ = [
@@ -11,5 +12,6 @@ __all__ = [
     "Command",
     "ListBackupsCommand",
     "ListCommand",
+    "MigratePvcCommand",
     "RestoreCommand",
 ]
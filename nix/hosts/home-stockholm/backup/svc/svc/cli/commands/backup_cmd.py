@@ -1,12 +1,26 @@
 """Backup command."""
 
+from datetime import timedelta
+
 from ...config import ServiceConfig, load_restic_env
-from ...core import BackupOrchestrator, BackupResult, require_root
+from ...core import (
+    BackupOptions,
+    BackupOrchestrator,
+    BackupResult,
+    BackupScheduler,
+    ChangeIndex,
+    CheckpointJournal,
+    TargetSchedule,
+    require_root,
+)
 from ...exceptions import EXIT_SUCCESS
 from ..args import BackupArgs
-from ..renderer import TableColumn, TableRow
+from ..renderer import BufferedRenderer, Renderer, TableColumn, TableRow
 from .base import AppContext, Command
 
+# Repositories written by `svc backup both`: the primary first, then its mirrors
+BOTH_ENVS = ("local", "remote")
+
 
 class BackupCommand(Command[BackupArgs]):
     """Run backup for one or all services."""
@@ -14,34 +28,110 @@ class BackupCommand(Command[BackupArgs]):
     async def execute(self, args: BackupArgs, ctx: AppContext) -> int:
         """Execute backups and render a plan + summary."""
         env = args.env
-        orchestrator = self._orchestrator(env, ctx)
+        orchestrator = self._orchestrator(env, ctx, args)
         services: list[ServiceConfig] = orchestrator.get_backup_services(args.service)
         if not services:
             ctx.renderer.print_warn("No services with backup enabled")
             return EXIT_SUCCESS
 
-        self._require_root_if_needed(services)
+        journal = None
+        if args.service == "all" and not ctx.dry_run:
+            journal = CheckpointJournal(ctx.config.paths.backup_metadata_root, env)
+            services = await self._skip_checkpointed(ctx, journal, args, services)
+            if not services:
+                ctx.renderer.print_ok("Every service already finished in the resumed run")
+                await journal.finish()
+                return EXIT_SUCCESS
 
-        self._render_plan(ctx, orchestrator, env, services)
-        results, overall_status = await self._run_backups(ctx, orchestrator, env, services)
+        if args.replicate_from is not None:
+            ctx.renderer.print_info(f"Replicating snapshots from {args.replicate_from} to {env}")
+        else:
+            self._require_root_if_needed(services)
+            await ctx.path_resolver.index_services(services)
+            self._render_plan(ctx, orchestrator, env, services)
+            if ctx.dry_run:
+                await self._render_writers(ctx, orchestrator, services)
+        results, overall_status = await self._run_backups(
+            ctx, orchestrator, args, services, journal
+        )
         self._render_results(ctx, results)
+        if journal is not None and overall_status == EXIT_SUCCESS:
+            await journal.finish()
         return overall_status
 
-    def _orchestrator(self, env: str, ctx: AppContext) -> BackupOrchestrator:
-        """Create a BackupOrchestrator for the selected restic env."""
-        env_vars = load_restic_env(ctx.config.paths.secrets_root, env)
-        restic = ctx.create_restic_runner(env_vars)
+    async def _skip_checkpointed(
+        self,
+        ctx: AppContext,
+        journal: CheckpointJournal,
+        args: BackupArgs,
+        services: list[ServiceConfig],
+    ) -> list[ServiceConfig]:
+        """
+        Start the run's checkpoint journal and return the services left to back up.
+
+        Without `--resume` the journal starts empty. With it, services the previous
+        run finished within `--resume-max-age` hours are skipped.
+        """
+        if not args.resume:
+            await journal.start()
+            return services
+
+        checkpoints = await journal.resume(timedelta(hours=args.resume_max_age))
+        finished = [svc.name for svc in services if svc.name in checkpoints]
+        if finished:
+            ctx.renderer.print_info(
+                f"Resuming: skipping {len(finished)} finished service(s): {', '.join(finished)}"
+            )
+        return [svc for svc in services if svc.name not in checkpoints]
+
+    def _orchestrator(self, env: str, ctx: AppContext, args: BackupArgs) -> BackupOrchestrator:
+        """
+        Create a BackupOrchestrator for the selected restic env.
+
+        Unchanged services are skipped unless `--force` is given. With
+        `--replicate-from`, snapshots are copied from that env's repository instead.
+        For env "both", local is the primary repository and remote a mirror written
+        within the same quiesce window. Weekly and monthly targets are only backed up
+        when due for this env.
+        """
+        envs = BOTH_ENVS if env == "both" else (env,)
+        primary, *mirror_envs = (
+            ctx.create_restic_runner(
+                load_restic_env(ctx.config.paths.secrets_root, name), echo_output=args.jobs == 1
+            )
+            for name in envs
+        )
+        replicate_from = None
+        if args.replicate_from is not None:
+            source_vars = load_restic_env(ctx.config.paths.secrets_root, args.replicate_from)
+            replicate_from = ctx.create_restic_runner(source_vars)
         return BackupOrchestrator(
             config=ctx.config,
-            restic=restic,
+            restic=primary,
             kubernetes=ctx.kubernetes,
             path_resolver=ctx.path_resolver,
+            options=BackupOptions(
+                async_scale_up=args.async_scale_up,
+                change_index=None
+                if args.force
+                else ChangeIndex(ctx.config.paths.backup_metadata_root, env),
+                replicate_from=replicate_from,
+                mirrors=dict(zip(envs[1:], mirror_envs, strict=True)),
+                schedule=TargetSchedule(ctx.config.paths.backup_metadata_root, env),
+            ),
         )
 
     def _require_root_if_needed(self, services: list[ServiceConfig]) -> None:
         """Require root if backup needs host or Kubernetes state access."""
         for svc in services:
-            if svc.backup.kubernetes is not None or svc.backup.pre_backup_commands:
+            backup = svc.backup
+            if (
+                backup.kubernetes is not None
+                or backup.pre_backup_commands
+                or backup.k3s_etcd is not None
+                or backup.vault_raft is not None
+                or backup.snapshot is not None
+            ):
                 require_root(f"backup {svc.name}")
 
     def _render_plan(
@@ -54,23 +144,33 @@ class BackupCommand(Command[BackupArgs]):
         """Render the backup plan table."""
         columns = [
             TableColumn("Service", style="bold"),
-            TableColumn("Scale down", justify="center"),
+            TableColumn("Quiesce", justify="center"),
+            TableColumn("Snapshot", justify="center"),
             TableColumn("Paths", justify="right"),
             TableColumn("PVCs", justify="right"),
+            TableColumn("Streams", justify="right"),
+            TableColumn("Shards", justify="center"),
+            TableColumn("Deferred"),
+            TableColumn("Weight", justify="right"),
             TableColumn("Tags"),
         ]
 
         rows: list[TableRow] = []
         for svc in services:
             plan = orchestrator.create_backup_plan(svc)
-            scale_display = "yes" if plan.scales_down else "no"
+            quiesce_display = plan.quiesce or "no"
             rows.append(
                 TableRow(
                     cells=[
                         plan.service_name,
-                        scale_display,
+                        quiesce_display,
+                        plan.snapshot or "-",
                         str(plan.paths_count),
                         str(plan.pvcs_count),
+                        str(plan.streams_count),
+                        plan.sharding or "-",
+                        ", ".join(plan.deferred) or "-",
+                        str(plan.weight),
                         ", ".join(plan.tags),
                     ]
                 )
@@ -78,46 +178,170 @@ class BackupCommand(Command[BackupArgs]):
 
         ctx.renderer.render_table(f"Backup plan ({env})", columns, rows)
 
+    async def _render_writers(
+        self, ctx: AppContext, orchestrator: BackupOrchestrator, services: list[ServiceConfig]
+    ) -> None:
+        """Show the deployments computed from PVC mounts for services that detect writers."""
+        for svc in services:
+            kubernetes = svc.backup.kubernetes
+            if kubernetes is None or not kubernetes.detect_writers or svc.backup.quiesce_hooks:
+                continue
+            quiesced = await orchestrator.quiesced_deployments(svc)
+            writers = quiesced.deployments if quiesced is not None else []
+            ctx.renderer.print_info(
+                f"{svc.name}: would quiesce {', '.join(writers) or 'no deployments'} "
+                f"(writers of {', '.join(kubernetes.pvcs)})"
+            )
+
     async def _run_backups(
         self,
         ctx: AppContext,
         orchestrator: BackupOrchestrator,
-        env: str,
+        args: BackupArgs,
         services: list[ServiceConfig],
-    ) -> tuple[list[tuple[str, int]], int]:
-        """Run backups for each service and return (results, overall_status)."""
-        results: list[tuple[str, int]] = []
-        overall_status = EXIT_SUCCESS
+        journal: CheckpointJournal | None,
+    ) -> tuple[list[tuple[str, int, bool]], int]:
+        """
+        Run backups through the scheduler and return (results, overall_status).
 
-        for svc in services:
-            ctx.renderer.print_heading(f"Backup: {svc.name} ({env})")
-            if ctx.dry_run:
-                ctx.renderer.print_warn("Dry run enabled: no changes will be made")
+        Each service that succeeded in every repository is checkpointed in the
+        journal (if any) as soon as it finishes.
+        """
+        env = args.env
+        scheduler = BackupScheduler(concurrency=args.jobs)
+
+        async def run_one(svc: ServiceConfig) -> BackupResult:
+            # With several services running at once, each prints its output as one block
+            # when it finishes rather than interleaving with the others
+            renderer = BufferedRenderer(ctx.renderer) if args.jobs > 1 else ctx.renderer
+            renderer.print_heading(f"Backup: {svc.name} ({env})")
+            try:
+                result = await self._backup_service(ctx, orchestrator, svc, renderer)
+            finally:
+                if isinstance(renderer, BufferedRenderer):
+                    renderer.flush()
+            if journal is not None and all(
+                repo_result.success for repo_result in _repository_results(env, result).values()
+            ):
+                await journal.record(svc.name, _checkpoint_snapshots(env, result))
+            return result
+
+        try:
+            backup_results = await scheduler.run(services, run_one)
+            completed = list(zip(services, backup_results, strict=True))
+            prune = await orchestrator.apply_retention(completed)
+            mirror_prunes = {
+                mirror_env: await orchestrator.apply_retention(
+                    [(svc, result.mirror_results[mirror_env]) for svc, result in completed],
+                    runner,
+                )
+                for mirror_env, runner in orchestrator.mirrors.items()
+            }
+        finally:
+            scale_up_failures = await orchestrator.join_scale_ups()
 
-            result = await orchestrator.backup_service(svc)
-            if result.exit_code != EXIT_SUCCESS:
-                overall_status = result.exit_code
-            self._render_backup_result(ctx, svc.name, result)
-            results.append((svc.name, result.exit_code))
+        for _, result in completed:
+            result.scale_up_errors.extend(scale_up_failures.get(result.service_name, []))
+        primary_env = BOTH_ENVS[0] if orchestrator.mirrors else None
+        self._render_retention(ctx, completed, prune, primary_env)
+        for mirror_env, mirror_prune in mirror_prunes.items():
+            mirror_completed = [
+                (svc, result.mirror_results[mirror_env]) for svc, result in completed
+            ]
+            self._render_retention(ctx, mirror_completed, mirror_prune, mirror_env)
+        self._render_scale_up_errors(ctx, completed)
+
+        results: list[tuple[str, int, bool]] = []
+        overall_status = EXIT_SUCCESS
+        for svc, result in completed:
+            for repo_env, repo_result in _repository_results(env, result).items():
+                if repo_result.exit_code != EXIT_SUCCESS:
+                    overall_status = repo_result.exit_code
+                name = f"{svc.name} ({repo_env})" if result.mirror_results else svc.name
+                results.append((name, repo_result.exit_code, repo_result.skipped))
 
         return results, overall_status
 
+    async def _backup_service(
+        self,
+        ctx: AppContext,
+        orchestrator: BackupOrchestrator,
+        svc: ServiceConfig,
+        renderer: Renderer,
+    ) -> BackupResult:
+        """Back up one service and render its result."""
+        if ctx.dry_run:
+            renderer.print_warn("Dry run enabled: no changes will be made")
+
+        result = await orchestrator.backup_service(svc)
+        self._render_backup_result(renderer, result)
+        if ctx.verbose and result.phase_seconds:
+            phases = ", ".join(
+                f"{name} {seconds:.1f}s" for name, seconds in result.phase_seconds.items()
+            )
+            renderer.print_info(f"{svc.name} phases: {phases}")
+        return result
+
     def _render_backup_result(
-        self, ctx: AppContext, name: str, result: BackupResult
+        self, renderer: Renderer, result: BackupResult, repo_env: str | None = None
     ) -> None:
-        """Render per-service backup result messages."""
+        """Render per-service backup result messages, then those of each mirror."""
+        if repo_env is None and result.mirror_results:
+            repo_env = BOTH_ENVS[0]
+        prefix = f"[{repo_env}] " if repo_env is not None else ""
         if result.success:
-            ctx.renderer.print_ok(result.message)
+            renderer.print_ok(prefix + result.message)
         else:
-            ctx.renderer.print_error(result.message)
+            renderer.print_error(prefix + result.message)
             if result.missing_paths:
                 missing = ", ".join(result.missing_paths)
-                ctx.renderer.print_error(f"Missing paths: {missing}")
+                renderer.print_error(f"Missing paths: {missing}")
+
+        snapshots = [f"{result.snapshot_id[:8]} (files)"] if result.snapshot_id else []
+        if result.shard_snapshots:
+            snapshots.append(f"{len(result.shard_snapshots)} shard snapshot(s)")
+        snapshots.extend(
+            f"{snapshot_id[:8]} ({name})" for name, snapshot_id in result.stream_snapshots.items()
+        )
+        if snapshots:
+            renderer.print_info(f"{prefix}Snapshots: {', '.join(snapshots)}")
+
+        for mirror_env, mirror in result.mirror_results.items():
+            self._render_backup_result(renderer, mirror, mirror_env)
+
+    def _render_scale_up_errors(
+        self, ctx: AppContext, completed: list[tuple[ServiceConfig, BackupResult]]
+    ) -> None:
+        """Render deployments that did not come back after a backup."""
+        for svc, result in completed:
+            for error in result.scale_up_errors:
+                ctx.renderer.print_warn(f"Scale-up failed for {svc.name}: {error}")
 
-        if result.forget_status is not None and result.forget_status != 0:
-            ctx.renderer.print_warn(f"Forget failed for {name} (exit code {result.forget_status})")
+    def _render_retention(
+        self,
+        ctx: AppContext,
+        completed: list[tuple[ServiceConfig, BackupResult]],
+        prune: tuple[int, float] | None,
+        repo_env: str | None = None,
+    ) -> None:
+        """Render forget failures and the end-of-run prune result of one repository."""
+        prefix = f"[{repo_env}] " if repo_env is not None else ""
+        for svc, result in completed:
+            if result.forget_status is not None and result.forget_status != 0:
+                ctx.renderer.print_warn(
+                    f"{prefix}Forget failed for {svc.name} (exit code {result.forget_status})"
+                )
+
+        if prune is None:
+            return
+
+        prune_status, prune_seconds = prune
+        if prune_status == 0:
+            ctx.renderer.print_ok(f"{prefix}Pruned repository in {prune_seconds:.1f}s")
+        else:
+            ctx.renderer.print_warn(f"{prefix}Prune failed (exit code {prune_status})")
 
-    def _render_results(self, ctx: AppContext, results: list[tuple[str, int]]) -> None:
+    def _render_results(self, ctx: AppContext, results: list[tuple[str, int, bool]]) -> None:
         """Render the final backup summary table."""
         columns = [
             TableColumn("Service", style="bold"),
@@ -127,9 +351,34 @@ class BackupCommand(Command[BackupArgs]):
             TableRow(
                 cells=[
                     name,
-                    "OK" if code == EXIT_SUCCESS else f"FAIL ({code})",
+                    _result_display(code, skipped=skipped),
                 ]
             )
-            for name, code in results
+            for name, code, skipped in results
         ]
         ctx.renderer.render_table("Backup results", columns, rows)
+
+
+def _repository_results(env: str, result: BackupResult) -> dict[str, BackupResult]:
+    """Return a service's result in each repository, by env name."""
+    if not result.mirror_results:
+        return {env: result}
+    return {BOTH_ENVS[0]: result, **result.mirror_results}
+
+
+def _checkpoint_snapshots(env: str, result: BackupResult) -> dict[str, dict[str, str]]:
+    """Return the snapshot IDs of a service's backup to record in its checkpoint."""
+    snapshots: dict[str, dict[str, str]] = {}
+    for repo_env, repo_result in _repository_results(env, result).items():
+        repo_snapshots = {**repo_result.shard_snapshots, **repo_result.stream_snapshots}
+        if repo_result.snapshot_id is not None:
+            repo_snapshots["files"] = repo_result.snapshot_id
+        snapshots[repo_env] = repo_snapshots
+    return snapshots
+
+
+def _result_display(code: int, *, skipped: bool) -> str:
+    """Return the Result column text for one service."""
+    if code != EXIT_SUCCESS:
+        return f"FAIL ({code})"
+    return "skipped" if skipped else "OK"
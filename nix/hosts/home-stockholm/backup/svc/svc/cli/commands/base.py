@@ -45,9 +45,21 @@ class AppContext:
     def kubernetes(self) -> KubernetesController:
         """Get or create a KubernetesController."""
         if self._kubernetes is None:
-            self._kubernetes = KubernetesController(dry_run=self.dry_run)
+            self._kubernetes = KubernetesController(
+                dry_run=self.dry_run, use_api=self.config.kubernetes_client == "api"
+            )
         return self._kubernetes
 
+    async def close(self) -> None:
+        """Release the connections held by the controllers."""
+        if self._kubernetes is not None:
+            if self.verbose:
+                cache = self._kubernetes.cache
+                self.renderer.print_info(
+                    f"Kubernetes object cache: {cache.hits} hits, {cache.misses} misses"
+                )
+            await self._kubernetes.close()
+
     @property
     def path_resolver(self) -> PathResolver:
         """Get or create a PathResolver."""
@@ -55,9 +67,13 @@ class AppContext:
             self._path_resolver = PathResolver(self.kubernetes)
         return self._path_resolver
 
-    def create_restic_runner(self, env_vars: dict[str, str]) -> ResticRunner:
+    def create_restic_runner(
+        self, env_vars: dict[str, str], *, echo_output: bool = True
+    ) -> ResticRunner:
         """Create a ResticRunner with the given environment variables."""
-        return ResticRunner(env_vars, dry_run=self.dry_run)
+        return ResticRunner(
+            env_vars, dry_run=self.dry_run, host=self.config.restic_host, echo_output=echo_output
+        )
 
 
 class Command(ABC, Generic[TArgs]):
@@ -0,0 +1,33 @@
+"""PVC migration command."""
+
+from ...core import PvcMigrator, require_root
+from ..args import MigratePvcArgs
+from .base import AppContext, Command
+
+
+class MigratePvcCommand(Command[MigratePvcArgs]):
+    """Copy or move one PVC's data into another on the host."""
+
+    async def execute(self, args: MigratePvcArgs, ctx: AppContext) -> int:
+        """Migrate the PVC data and render the result."""
+        require_root(f"{args.mode} PVC {args.namespace}/{args.source}")
+        ctx.renderer.print_heading(
+            f"Migrate PVC ({args.mode}): {args.namespace}/{args.source} -> {args.target}"
+        )
+        if ctx.dry_run:
+            ctx.renderer.print_warn("Dry run enabled: no changes will be made")
+
+        migrator = PvcMigrator(
+            ctx.kubernetes, ctx.path_resolver, jobs=args.jobs, dry_run=ctx.dry_run
+        )
+        result = await migrator.migrate(
+            args.namespace, args.source, args.target, move=args.mode == "move"
+        )
+        for error in result.scale_up_errors:
+            ctx.renderer.print_warn(f"Scale-up failed: {error}")
+
+        if result.success:
+            ctx.renderer.print_ok(result.message)
+        else:
+            ctx.renderer.print_error(result.message)
+        return result.exit_code
@@ -37,6 +37,7 @@ class RestoreCommand(Command[RestoreArgs]):
             result = await K3sRestoreOrchestrator(
                 restic,
                 dry_run=ctx.dry_run,
+                metadata_root=ctx.config.paths.backup_metadata_root,
             ).restore_service(
                 svc=svc,
                 snapshot_spec=snapshot_spec,
@@ -62,6 +63,7 @@ class RestoreCommand(Command[RestoreArgs]):
             svc=svc,
             snapshot_spec=snapshot_spec,
             verify_includes=verify_includes,
+            vault_token_file=args.vault_token_file,
         )
 
         if result.missing_in_snapshot:
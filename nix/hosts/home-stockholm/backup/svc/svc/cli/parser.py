@@ -21,12 +21,14 @@ from .args import (
     BackupArgs,
     ListArgs,
     ListBackupsArgs,
+    MigratePvcArgs,
     RestoreArgs,
 )
 from .commands import (
     BackupCommand,
     ListBackupsCommand,
     ListCommand,
+    MigratePvcCommand,
     RestoreCommand,
 )
 from .commands.base import AppContext, Command
@@ -115,11 +117,19 @@ def _get_app_ctx(ctx: click.Context) -> AppContext:
     )
 
 
+async def _execute(command: Command[Any], args: Any, app_ctx: AppContext) -> int:
+    """Execute a command, then release the context's connections."""
+    try:
+        return await command.execute(args, app_ctx)
+    finally:
+        await app_ctx.close()
+
+
 def _run_command(ctx: click.Context, command: Command[Any], args: Any) -> None:
     """Run a command object using an isolated asyncio event loop."""
     app_ctx = _get_app_ctx(ctx)
     try:
-        exit_code: int = asyncio.run(command.execute(args, app_ctx))
+        exit_code: int = asyncio.run(_execute(command, args, app_ctx))
         raise click.exceptions.Exit(exit_code)
     except (KeyboardInterrupt, asyncio.CancelledError):
         raise click.exceptions.Exit(130) from None
@@ -165,12 +175,55 @@ def list_backups_cmd(ctx: click.Context, env: str, service: str) -> None:
 
 
 @cli.command("backup")
-@click.argument("env", type=click.Choice(["local", "remote"], case_sensitive=False))
+@click.argument("env", type=click.Choice(["local", "remote", "both"], case_sensitive=False))
 @click.argument("service", type=ServiceNameParam(backup_only=True, allow_all=True))
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Maximum combined weight of services backed up concurrently",
+)
+@click.option(
+    "--async-scale-up",
+    is_flag=True,
+    help="Wait for scaled-down deployments to become ready in the background",
+)
+@click.option(
+    "--force",
+    "-f",
+    is_flag=True,
+    help="Back up services even if nothing changed since their last backup",
+)
+@click.option(
+    "--replicate-from",
+    type=click.Choice(["local", "remote"], case_sensitive=False),
+    default=None,
+    help="Copy new snapshots from this env's repository instead of backing up sources",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Skip services the previous `all` run already finished and continue with the rest",
+)
+@click.option(
+    "--resume-max-age",
+    type=click.FloatRange(min=0),
+    default=24,
+    show_default=True,
+    help="Hours after which a finished service is backed up again by --resume",
+)
 @click.pass_context
-def backup_cmd(ctx: click.Context, env: str, service: str) -> None:
-    """Run backups"""
-    _run_command(ctx, BackupCommand(), BackupArgs(env=env, service=service))
+def backup_cmd(ctx: click.Context, env: str, service: str, **options: Any) -> None:
+    """Run backups (ENV "both" writes local and remote within one quiesce window)"""
+    if options["replicate_from"] is not None and env in {options["replicate_from"], "both"}:
+        message = "must differ from ENV, which cannot be both"
+        raise click.BadParameter(message, param_hint="--replicate-from")
+    if options["resume"] and service != "all":
+        message = "only applies to `all` runs"
+        raise click.BadParameter(message, param_hint="--resume")
+    _run_command(ctx, BackupCommand(), BackupArgs(env=env, service=service, **options))
 
 
 @cli.command("restore")
@@ -182,22 +235,48 @@ def backup_cmd(ctx: click.Context, env: str, service: str) -> None:
     is_flag=True,
     help="Check snapshot contains each configured path/PVC before restoring",
 )
+@click.option(
+    "--vault-token-file",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Token allowed to write sys/storage/raft/snapshot-force, for Vault raft restores",
+)
 @click.pass_context
-def restore_cmd(
-    ctx: click.Context,
-    env: str,
-    service: str,
-    snapshot: str,
-    verify_includes: bool,
-) -> None:
+def restore_cmd(ctx: click.Context, env: str, service: str, snapshot: str, **options: Any) -> None:
     """Restore a service from a snapshot (default: `latest`)."""
     _run_command(
         ctx,
         RestoreCommand(),
-        RestoreArgs(
-            env=env,
-            service=service,
-            snapshot=snapshot,
-            verify_includes=verify_includes,
-        ),
+        RestoreArgs(env=env, service=service, snapshot=snapshot, **options),
+    )
+
+
+@cli.command("migrate-pvc")
+@click.argument("mode", type=click.Choice(["copy", "move"], case_sensitive=False))
+@click.argument("source")
+@click.argument("target")
+@click.option(
+    "--namespace",
+    "-n",
+    default="default",
+    show_default=True,
+    help="Namespace of both PVCs",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Files copied concurrently",
+)
+@click.pass_context
+def migrate_pvc_cmd(
+    ctx: click.Context, mode: str, source: str, target: str, **options: Any
+) -> None:
+    """Copy or move the data of PVC SOURCE into PVC TARGET on the host."""
+    _run_command(
+        ctx,
+        MigratePvcCommand(),
+        MigratePvcArgs(mode=mode.lower(), source=source, target=target, **options),
     )
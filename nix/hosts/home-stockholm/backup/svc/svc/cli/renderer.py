@@ -2,8 +2,9 @@
 
 import sys
 from abc import ABC, abstractmethod
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
 from dataclasses import dataclass
+from functools import partial
 from typing import Final, Literal, Optional
 
 from rich.console import Console, RenderableType
@@ -203,6 +204,66 @@ class PlainRenderer(Renderer):
         return f"{status}: {detail}"
 
 
+class BufferedRenderer(Renderer):
+    """
+    Renderer holding messages back until `flush()`, then printing them in order.
+
+    Concurrent backups each write to their own buffer, so the output of one
+    service is printed as a block instead of interleaving with the others.
+    """
+
+    def __init__(self, renderer: Renderer):
+        self.renderer = renderer
+        self._pending: list[Callable[[], None]] = []
+
+    def print_heading(self, title: str) -> None:
+        """Queue a section heading."""
+        self._pending.append(partial(self.renderer.print_heading, title))
+
+    def print_ok(self, message: str) -> None:
+        """Queue a success message."""
+        self._pending.append(partial(self.renderer.print_ok, message))
+
+    def print_warn(self, message: str) -> None:
+        """Queue a warning message."""
+        self._pending.append(partial(self.renderer.print_warn, message))
+
+    def print_error(self, message: str) -> None:
+        """Queue an error message."""
+        self._pending.append(partial(self.renderer.print_error, message))
+
+    def print_info(self, message: str) -> None:
+        """Queue an informational message."""
+        self._pending.append(partial(self.renderer.print_info, message))
+
+    def render_table(
+        self,
+        title: str,
+        columns: Sequence[TableColumn],
+        rows: Sequence[TableRow],
+        *,
+        show_lines: bool = True,
+    ) -> None:
+        """Queue a table."""
+        self._pending.append(
+            partial(self.renderer.render_table, title, columns, rows, show_lines=show_lines)
+        )
+
+    def format_check(self, ok: bool) -> RenderableType | str:
+        """Format a boolean as a check mark or dash."""
+        return self.renderer.format_check(ok)
+
+    def format_status(self, ok: bool, detail: str) -> RenderableType | str:
+        """Format a status indicator with detail text."""
+        return self.renderer.format_status(ok, detail)
+
+    def flush(self) -> None:
+        """Print the queued output."""
+        pending, self._pending = self._pending, []
+        for call in pending:
+            call()
+
+
 def create_renderer(force_plain: bool = False) -> Renderer:
     """Create the appropriate renderer based on environment."""
     if force_plain:
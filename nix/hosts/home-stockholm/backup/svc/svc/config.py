@@ -2,7 +2,7 @@
 
 import json
 from pathlib import Path
-from typing import TypeVar
+from typing import Literal, TypeVar, cast
 
 from pydantic import BaseModel, Field, ValidationError
 
@@ -45,6 +45,96 @@ class KubernetesBackupConfig(PydanticBase):
     namespace: str
     deployments: list[str] = Field(default_factory=list)
     pvcs: list[str] = Field(default_factory=list)
+    depends_on: dict[str, list[str]] = Field(default_factory=dict, alias="dependsOn")
+    # Quiesce the namespace's deployments that mount `pvcs` read-write instead of
+    # `deployments` (backup only)
+    detect_writers: bool = Field(default=False, alias="detectWriters")
+
+
+class SnapshotConfig(PydanticBase):
+    """Point-in-time snapshot configuration for a service backup."""
+
+    provider: Literal["auto", "lvm", "btrfs", "reflink", "copy"] = "auto"
+    staging_dir: str | None = Field(default=None, alias="stagingDir")
+
+
+class QuiesceHook(PydanticBase):
+    """Application hook that makes a service's on-disk state consistent for a backup."""
+
+    name: str
+    quiesce: list[str]
+    unquiesce: list[str] = Field(default_factory=list)
+    deployment: str | None = None
+    container: str | None = None
+    hold: bool = False
+    timeout_seconds: int = Field(default=60, ge=1, alias="timeoutSeconds")
+
+
+class StreamSource(PydanticBase):
+    """Command whose stdout is backed up as a single file (e.g. a database dump)."""
+
+    name: str
+    command: list[str]
+    filename: str
+    deployment: str | None = None
+    container: str | None = None
+
+
+class K3sEtcdSource(PydanticBase):
+    """Built-in source backing up one fresh k3s embedded-etcd snapshot and the token."""
+
+    k3s: str
+    # Compact and defragment etcd before the snapshot (skipped when unset)
+    etcdctl: str | None = None
+    timeout_seconds: int = Field(default=600, ge=1, alias="timeoutSeconds")
+
+
+class VaultRaftSource(PydanticBase):
+    """Built-in stream source backing up a Vault raft snapshot over the Vault API."""
+
+    address: str
+    # File holding a token allowed to read sys/storage/raft/snapshot; restores take
+    # a token allowed to write sys/storage/raft/snapshot-force on the command line
+    token_path: str = Field(alias="tokenPath")
+    curl: str = "curl"
+    filename: str = "vault-raft.snap"
+
+
+class PrometheusSnapshotSource(PydanticBase):
+    """Built-in source backing up a Prometheus TSDB snapshot instead of its live PVC."""
+
+    # PVC holding the TSDB, in the backup namespace; leave it out of `pvcs`
+    pvc: str
+    deployment: str = "prometheus"
+    container: str | None = None
+    # Directory of the TSDB (`--storage.tsdb.path`) relative to the PVC root
+    tsdb_path: str = Field(default="data", alias="tsdbPath")
+    port: int = 9090
+    timeout_seconds: int = Field(default=300, ge=1, alias="timeoutSeconds")
+
+
+class PreBackupCommand(PydanticBase):
+    """Host command that prepares backup targets (e.g. writes a dump into a path)."""
+
+    command: list[str]
+    parallel: bool = False
+    timeout_seconds: int = Field(default=1800, ge=1, alias="timeoutSeconds")
+
+
+class TargetClass(PydanticBase):
+    """How often one backup target (a path or PVC) is backed up."""
+
+    frequency: Literal["nightly", "weekly", "monthly", "never"] = "nightly"
+    # Data that can be re-downloaded or rebuilt: a missing target is skipped rather
+    # than failing the backup or restore
+    regenerable: bool = False
+
+
+class ShardingConfig(PydanticBase):
+    """Split a service's backup into several concurrently written snapshots."""
+
+    by: Literal["target", "directory"] = "target"
+    jobs: int = Field(default=2, ge=1)
 
 
 class BackupConfig(PydanticBase):
@@ -53,10 +143,27 @@ class BackupConfig(PydanticBase):
     enable: bool = False
     paths: list[str] = Field(default_factory=list)
     kubernetes: KubernetesBackupConfig | None = None
-    pre_backup_commands: list[list[str]] = Field(default_factory=list, alias="preBackupCommands")
+    pre_backup_commands: list[PreBackupCommand] = Field(
+        default_factory=list, alias="preBackupCommands"
+    )
     tags: list[str] = Field(default_factory=list)
     exclude: list[str] = Field(default_factory=list)
     policy: RetentionPolicy | None = None
+    weight: int = Field(default=1, ge=1)
+    snapshot: SnapshotConfig | None = None
+    quiesce: Literal["scale", "freeze"] = "scale"
+    quiesce_hooks: list[QuiesceHook] = Field(
+        default_factory=lambda: cast("list[QuiesceHook]", []), alias="quiesceHooks"
+    )
+    streams: list[StreamSource] = Field(default_factory=lambda: cast("list[StreamSource]", []))
+    k3s_etcd: K3sEtcdSource | None = Field(default=None, alias="k3sEtcd")
+    vault_raft: VaultRaftSource | None = Field(default=None, alias="vaultRaft")
+    prometheus_snapshot: PrometheusSnapshotSource | None = Field(
+        default=None, alias="prometheusSnapshot"
+    )
+    sharding: ShardingConfig | None = None
+    # Keyed by an entry of `paths` or a PVC name of `kubernetes.pvcs`
+    target_classes: dict[str, TargetClass] = Field(default_factory=dict, alias="targetClasses")
 
 
 class RestoreConfig(PydanticBase):
@@ -83,12 +190,16 @@ class PathsConfig(PydanticBase):
     backup_metadata_root: str = Field(
         default="/var/lib/svc/backup-metadata", alias="backupMetadataRoot"
     )
+    mount_root: str = Field(default="/run/svc/mnt", alias="mountRoot")
 
 
 class Config(PydanticBase):
     """Root configuration model."""
 
     paths: PathsConfig
+    restic_host: str | None = Field(default=None, alias="resticHost")
+    # Talk to the Kubernetes API server directly, or run kubectl for every call
+    kubernetes_client: Literal["api", "kubectl"] = Field(default="api", alias="kubernetesClient")
     services: dict[str, ServiceConfig] = Field(default_factory=dict)
 
 
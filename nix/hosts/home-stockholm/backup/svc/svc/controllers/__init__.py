@@ -1,13 +1,38 @@
 """External system controllers for svc."""
 
+from .cgroups import CgroupFreezer
+from .kube_api import KubeApiClient
 from .kubernetes import DeploymentScale, KubernetesController
-from .restic import ResticRunner
+from .process import ProcessResult, capture_process, kill_process_group, run_process
+from .restic import (
+    GROUP_TAG_PREFIX,
+    SHARD_TAG_PREFIX,
+    STREAM_TAG,
+    ResticBackupResult,
+    ResticRunner,
+    ResticSnapshot,
+    parse_snapshot_time,
+)
 from .systemctl import SystemctlController, unit_last_success
+from .vault import VaultController
 
 __all__ = [
+    "GROUP_TAG_PREFIX",
+    "SHARD_TAG_PREFIX",
+    "STREAM_TAG",
+    "CgroupFreezer",
     "DeploymentScale",
+    "KubeApiClient",
     "KubernetesController",
+    "ProcessResult",
+    "ResticBackupResult",
     "ResticRunner",
+    "ResticSnapshot",
     "SystemctlController",
+    "VaultController",
+    "capture_process",
+    "kill_process_group",
+    "parse_snapshot_time",
+    "run_process",
     "unit_last_success",
 ]
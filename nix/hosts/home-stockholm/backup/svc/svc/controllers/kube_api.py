@@ -0,0 +1,516 @@
+"""Async Kubernetes API client keeping its connections alive between requests."""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import contextlib
+import json
+import logging
+import ssl
+import tempfile
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+from urllib.parse import urlencode, urlsplit
+
+from ..exceptions import KubernetesError
+from .process import capture_process
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, Callable
+
+logger = logging.getLogger("svc.controllers.kube_api")
+
+# Responses larger than this are not from the objects svc reads
+MAX_LINE_BYTES = 64 * 1024
+
+# Server-side lifetime of one watch request; the watch then resumes from the last
+# resourceVersion it saw
+WATCH_TIMEOUT_SECONDS = 300
+HTTP_GONE = 410
+
+
+class WatchExpiredError(KubernetesError):
+    """The resourceVersion a watch resumed from is too old; the objects must be listed again."""
+
+
+@dataclass
+class _Connection:
+    """One keep-alive connection to the API server."""
+
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    # Whether it already served a request, so the server may have closed it since
+    reused: bool = False
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class KubeApiClient:
+    """
+    Minimal HTTP/1.1 client for the Kubernetes API server.
+
+    Connections (and their TLS sessions) are kept open and reused, so a call costs
+    a request round-trip instead of a kubectl start, a kubeconfig parse and a TLS
+    handshake. At most `max_connections` requests are in flight at once.
+    """
+
+    def __init__(
+        self,
+        server: str,
+        *,
+        ssl_context: ssl.SSLContext | None = None,
+        token: str | None = None,
+        max_connections: int = 8,
+        timeout_seconds: float = 30,
+    ):
+        url = urlsplit(server)
+        if url.scheme not in {"http", "https"} or not url.hostname:
+            message = f"Unsupported Kubernetes API server: {server}"
+            raise KubernetesError(message)
+
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.base_path = url.path.rstrip("/")
+        self.ssl_context = ssl_context if url.scheme == "https" else None
+        self.token = token
+        self.timeout_seconds = timeout_seconds
+        self._idle: list[_Connection] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    @classmethod
+    def from_kubeconfig(cls, kubeconfig: dict[str, Any]) -> KubeApiClient:
+        """Build a client for the current context of a parsed kubeconfig."""
+        context = _named(kubeconfig, "contexts", kubeconfig.get("current-context"), "context")
+        cluster = _named(kubeconfig, "clusters", context.get("cluster"), "cluster")
+        user = _named(kubeconfig, "users", context.get("user"), "user")
+
+        server = cluster.get("server")
+        if not isinstance(server, str):
+            message = "Kubeconfig cluster has no server"
+            raise KubernetesError(message)
+
+        token = user.get("token")
+        token_file = user.get("tokenFile")
+        if not isinstance(token, str) and isinstance(token_file, str):
+            token = Path(token_file).read_text().strip()
+        return cls(
+            server,
+            ssl_context=_ssl_context(cluster, user) if server.startswith("https:") else None,
+            token=token if isinstance(token, str) else None,
+        )
+
+    async def get(self, path: str, query: dict[str, str] | None = None) -> dict[str, Any]:
+        """GET an object (or list) and return it."""
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        return await self._json_request("GET", path)
+
+    async def patch(self, path: str, body: dict[str, Any]) -> dict[str, Any]:
+        """Apply a JSON merge patch to an object and return the result."""
+        return await self._json_request(
+            "PATCH", path, json.dumps(body).encode(), "application/merge-patch+json"
+        )
+
+    async def watch(
+        self, path: str, query: dict[str, str]
+    ) -> AsyncGenerator[tuple[str, dict[str, Any]]]:
+        """
+        Stream the (type, object) events of a watch.
+
+        A watch holds its own connection for as long as it runs, outside the pool.
+        The stream ends when the server closes the watch (after about
+        WATCH_TIMEOUT_SECONDS); raises WatchExpiredError when it must be re-listed.
+        """
+        query = {**query, "watch": "1", "timeoutSeconds": str(WATCH_TIMEOUT_SECONDS)}
+        path = f"{path}?{urlencode(query)}"
+        connection = await self._open()
+        try:
+            try:
+                async with asyncio.timeout(self.timeout_seconds):
+                    connection.writer.write(self._encode("GET", path, b"", "application/json"))
+                    await connection.writer.drain()
+                    status, headers = await _read_head(connection.reader)
+                    if status != 200:  # noqa: PLR2004
+                        body = await _read_body(connection.reader, headers)
+                        message = f"Watch {path} failed: HTTP {status} {body[:200]!r}"
+                        raise (WatchExpiredError if status == HTTP_GONE else KubernetesError)(
+                            message
+                        )
+                async for event in _watch_events(connection.reader, headers):
+                    yield event
+            except (
+                ConnectionError,
+                asyncio.IncompleteReadError,
+                TimeoutError,
+                ValueError,
+            ) as error:
+                message = f"Watch {path} failed: {error!r}"
+                raise KubernetesError(message) from error
+        finally:
+            connection.close()
+
+    async def close(self) -> None:
+        """Close the idle connections."""
+        while self._idle:
+            connection = self._idle.pop()
+            connection.close()
+            with contextlib.suppress(OSError, ssl.SSLError):
+                await connection.writer.wait_closed()
+
+    async def _json_request(
+        self, method: str, path: str, body: bytes = b"", content_type: str = "application/json"
+    ) -> dict[str, Any]:
+        """Send a request and return its JSON object, raising on non-2xx statuses."""
+        status, payload = await self._request(method, path, body, content_type)
+        try:
+            raw = json.loads(payload)
+        except json.JSONDecodeError as error:
+            message = f"Invalid JSON from {method} {path} (HTTP {status})"
+            raise KubernetesError(message) from error
+        if not isinstance(raw, dict):
+            message = f"Expected JSON object from {method} {path}"
+            raise KubernetesError(message)
+
+        obj = cast("dict[str, Any]", raw)
+        if not 200 <= status < 300:  # noqa: PLR2004
+            detail = obj.get("message")
+            message = detail if isinstance(detail, str) else f"{method} {path}: HTTP {status}"
+            raise KubernetesError(message)
+        return obj
+
+    async def _request(
+        self, method: str, path: str, body: bytes, content_type: str
+    ) -> tuple[int, bytes]:
+        """Send a request over a pooled connection, retrying once if it went stale."""
+        request = self._encode(method, path, body, content_type)
+        async with self._slots:
+            for _attempt in range(2):
+                connection = await self._connection()
+                try:
+                    async with asyncio.timeout(self.timeout_seconds):
+                        connection.writer.write(request)
+                        await connection.writer.drain()
+                        status, headers = await _read_head(connection.reader)
+                        payload = await _read_body(connection.reader, headers)
+                except (ConnectionError, asyncio.IncompleteReadError) as error:
+                    connection.close()
+                    # The server closes idle keep-alive connections at will
+                    if connection.reused:
+                        continue
+                    message = f"Kubernetes API request {method} {path} failed: {error}"
+                    raise KubernetesError(message) from error
+                except (TimeoutError, OSError, ValueError) as error:
+                    connection.close()
+                    message = f"Kubernetes API request {method} {path} failed: {error!r}"
+                    raise KubernetesError(message) from error
+                except BaseException:
+                    # Cancelled mid-exchange: the connection is in an unknown state
+                    connection.close()
+                    raise
+
+                if headers.get("connection", "").lower() == "close":
+                    connection.close()
+                else:
+                    connection.reused = True
+                    self._idle.append(connection)
+                return status, payload
+
+        message = f"Kubernetes API request {method} {path} failed: connection closed"
+        raise KubernetesError(message)
+
+    async def _connection(self) -> _Connection:
+        """Return an idle connection, or open a new one."""
+        if self._idle:
+            return self._idle.pop()
+        return await self._open()
+
+    async def _open(self) -> _Connection:
+        """Open a new connection to the API server."""
+        logger.debug("Connecting to the Kubernetes API at %s:%s", self.host, self.port)
+        try:
+            async with asyncio.timeout(self.timeout_seconds):
+                reader, writer = await asyncio.open_connection(
+                    self.host, self.port, ssl=self.ssl_context, limit=MAX_LINE_BYTES
+                )
+        except (TimeoutError, OSError) as error:
+            message = f"Cannot connect to the Kubernetes API at {self.host}:{self.port}: {error!r}"
+            raise KubernetesError(message) from error
+        return _Connection(reader, writer)
+
+    def _encode(self, method: str, path: str, body: bytes, content_type: str) -> bytes:
+        """Serialize an HTTP/1.1 request."""
+        headers = [
+            f"{method} {self.base_path}{path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Accept: application/json",
+            "User-Agent: svc",
+        ]
+        if self.token:
+            headers.append(f"Authorization: Bearer {self.token}")
+        if body:
+            headers.extend([f"Content-Type: {content_type}", f"Content-Length: {len(body)}"])
+        return ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+
+
+class ObjectWatch:
+    """
+    The objects under one API path (e.g. the pods of a namespace), kept current by
+    a watch stream.
+
+    The stream starts on the first `wait_until()` and runs until `close()`, so any
+    number of waits on the same namespace share it. Waits are woken on every
+    event and return as soon as their condition holds.
+    """
+
+    def __init__(self, api: KubeApiClient, path: str):
+        self.api = api
+        self.path = path
+        self.objects: dict[str, dict[str, Any]] = {}
+        self._changed = asyncio.Condition()
+        self._listed = False
+        self._error: KubernetesError | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    async def wait_until(self, condition: Callable[[dict[str, dict[str, Any]]], bool]) -> None:
+        """Wait until the condition holds for the objects, keyed by name."""
+        if self._task is None or self._task.done():
+            self._error = None
+            self._task = asyncio.create_task(self._follow())
+        async with self._changed:
+            await self._changed.wait_for(
+                lambda: self._error is not None or (self._listed and condition(self.objects))
+            )
+            if self._error is not None:
+                raise self._error
+
+    async def close(self) -> None:
+        """Stop the watch stream."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    async def _follow(self) -> None:
+        """List the objects, then apply watch events, re-listing when the watch expires."""
+        try:
+            while True:
+                listing = await self.api.get(self.path)
+                version = _resource_version(listing)
+                items = listing.get("items")
+                await self._update(
+                    partial(
+                        self._replace, cast("list[Any]", items) if isinstance(items, list) else []
+                    )
+                )
+                try:
+                    while True:
+                        query = {"resourceVersion": version, "allowWatchBookmarks": "true"}
+                        async for kind, obj in self.api.watch(self.path, query):
+                            version = _resource_version(obj) or version
+                            if kind != "BOOKMARK":
+                                await self._update(partial(self._apply, kind, obj))
+                except WatchExpiredError:
+                    logger.debug("Watch on %s expired, listing again", self.path)
+        except KubernetesError as error:
+            await self._update(partial(setattr, self, "_error", error))
+
+    async def _update(self, change: Callable[[], None]) -> None:
+        """Apply a change to the objects and wake the waits."""
+        async with self._changed:
+            change()
+            self._changed.notify_all()
+
+    def _replace(self, items: list[Any]) -> None:
+        self.objects = {
+            name: cast("dict[str, Any]", item)
+            for item in items
+            if isinstance(item, dict) and (name := _object_name(cast("dict[str, Any]", item)))
+        }
+        self._listed = True
+
+    def _apply(self, kind: str, obj: dict[str, Any]) -> None:
+        name = _object_name(obj)
+        if name is None:
+            return
+        if kind == "DELETED":
+            self.objects.pop(name, None)
+        else:
+            self.objects[name] = obj
+
+
+async def load_kubeconfig(path: str, kubectl: str) -> dict[str, Any]:
+    """
+    Read a kubeconfig.
+
+    A JSON kubeconfig is parsed directly; YAML ones (like k3s's) are converted by
+    `kubectl config view`, which then runs once per svc invocation.
+    """
+    try:
+        text = await asyncio.to_thread(Path(path).read_text)
+    except OSError as error:
+        message = f"Cannot read kubeconfig {path}: {error}"
+        raise KubernetesError(message) from error
+
+    with contextlib.suppress(json.JSONDecodeError):
+        raw = json.loads(text)
+        if isinstance(raw, dict):
+            return cast("dict[str, Any]", raw)
+
+    result = await capture_process(
+        [kubectl, "--kubeconfig", path, "config", "view", "--raw", "--minify", "-o", "json"], 60
+    )
+    if result.returncode != 0:
+        message = result.stderr.strip() or f"Cannot read kubeconfig {path}"
+        raise KubernetesError(message)
+    try:
+        raw = json.loads(result.stdout)
+    except json.JSONDecodeError as error:
+        message = f"Invalid kubeconfig {path}"
+        raise KubernetesError(message) from error
+    if not isinstance(raw, dict):
+        message = f"Invalid kubeconfig {path}"
+        raise KubernetesError(message)
+    return cast("dict[str, Any]", raw)
+
+
+async def _read_head(reader: asyncio.StreamReader) -> tuple[int, dict[str, str]]:
+    """Read a status line and headers from the stream."""
+    status_line = await reader.readline()
+    if not status_line:
+        message = "connection closed by the server"
+        raise ConnectionResetError(message)
+    status = int(status_line.split(b" ", 2)[1])
+
+    headers: dict[str, str] = {}
+    while (line := await reader.readline()) not in {b"\r\n", b"\n", b""}:
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "content-length" not in headers and headers.get("transfer-encoding") != "chunked":
+        # No framing: the body runs until the server closes the connection
+        headers["connection"] = "close"
+    return status, headers
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: dict[str, str]) -> bytes:
+    """Read the body that follows the headers."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        return b"".join([chunk async for chunk in _chunks(reader)])
+    if "content-length" in headers:
+        return await reader.readexactly(int(headers["content-length"]))
+    return await reader.read()
+
+
+async def _chunks(reader: asyncio.StreamReader) -> AsyncGenerator[bytes]:
+    """Yield the chunks of a chunked transfer-encoded body as they arrive."""
+    while True:
+        size = int((await reader.readline()).split(b";", 1)[0].strip(), 16)
+        if size == 0:
+            # Skip trailers up to the blank line that ends the body
+            while (await reader.readline()) not in {b"\r\n", b"\n", b""}:
+                pass
+            return
+        yield await reader.readexactly(size)
+        await reader.readexactly(2)
+
+
+async def _watch_events(
+    reader: asyncio.StreamReader, headers: dict[str, str]
+) -> AsyncGenerator[tuple[str, dict[str, Any]]]:
+    """Decode the newline-delimited JSON events of a watch response."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = _chunks(reader)
+    else:
+        chunks = _stream(reader)
+
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            event: Any = json.loads(line)
+            if not isinstance(event, dict):
+                continue
+            kind: Any = cast("dict[str, Any]", event).get("type")
+            obj: Any = cast("dict[str, Any]", event).get("object")
+            if kind == "ERROR" and isinstance(obj, dict):
+                _raise_watch_error(cast("dict[str, Any]", obj))
+            if isinstance(kind, str) and isinstance(obj, dict):
+                yield kind, cast("dict[str, Any]", obj)
+
+
+async def _stream(reader: asyncio.StreamReader) -> AsyncGenerator[bytes]:
+    """Yield an unframed body as it arrives, until the server closes the connection."""
+    while chunk := await reader.read(MAX_LINE_BYTES):
+        yield chunk
+
+
+def _raise_watch_error(status: dict[str, Any]) -> None:
+    """Raise the error carried by an ERROR watch event."""
+    message = status.get("message")
+    message = message if isinstance(message, str) else "watch failed"
+    if status.get("code") == HTTP_GONE:
+        raise WatchExpiredError(message)
+    raise KubernetesError(message)
+
+
+def _object_name(obj: dict[str, Any]) -> str | None:
+    """Return metadata.name of an object."""
+    metadata = obj.get("metadata")
+    name: Any = cast("dict[str, Any]", metadata).get("name") if isinstance(metadata, dict) else None
+    return name if isinstance(name, str) else None
+
+
+def _resource_version(obj: dict[str, Any]) -> str:
+    """Return metadata.resourceVersion of an object or list, or an empty string."""
+    metadata = obj.get("metadata")
+    version: Any = (
+        cast("dict[str, Any]", metadata).get("resourceVersion")
+        if isinstance(metadata, dict)
+        else None
+    )
+    return version if isinstance(version, str) else ""
+
+
+def _named(kubeconfig: dict[str, Any], section: str, name: object, field: str) -> dict[str, Any]:
+    """Return the `field` of the named entry of a kubeconfig section."""
+    entries = kubeconfig.get(section)
+    if isinstance(entries, list):
+        for entry in cast("list[Any]", entries):
+            if isinstance(entry, dict) and cast("dict[str, Any]", entry).get("name") == name:
+                value = cast("dict[str, Any]", entry).get(field)
+                return cast("dict[str, Any]", value) if isinstance(value, dict) else {}
+    message = f"Kubeconfig has no {field} named {name!r}"
+    raise KubernetesError(message)
+
+
+def _ssl_context(cluster: dict[str, Any], user: dict[str, Any]) -> ssl.SSLContext:
+    """Build the TLS context trusting the cluster CA and presenting the user certificate."""
+    context = ssl.create_default_context()
+    if cluster.get("insecure-skip-tls-verify") is True:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif ca_data := cluster.get("certificate-authority-data"):
+        context.load_verify_locations(cadata=base64.b64decode(ca_data).decode())
+    elif ca_file := cluster.get("certificate-authority"):
+        context.load_verify_locations(cafile=ca_file)
+
+    cert_data = user.get("client-certificate-data")
+    key_data = user.get("client-key-data")
+    if isinstance(cert_data, str) and isinstance(key_data, str):
+        # load_cert_chain only reads files; they live as long as this call
+        with tempfile.TemporaryDirectory(prefix="svc-kubeconfig-") as directory:
+            cert = Path(directory) / "client.crt"
+            key = Path(directory) / "client.key"
+            cert.write_bytes(base64.b64decode(cert_data))
+            key.touch(mode=0o600)
+            key.write_bytes(base64.b64decode(key_data))
+            context.load_cert_chain(cert, key)
+    elif isinstance(user.get("client-certificate"), str):
+        context.load_cert_chain(user["client-certificate"], user.get("client-key"))
+    return context
@@ -1,19 +1,36 @@
-"""Kubernetes controller with async kubectl support."""
+"""Kubernetes controller talking to the API server, with kubectl as a fallback."""
 
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import json
 import logging
 import shutil
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, cast
+from typing import TYPE_CHECKING, Any, cast
+from urllib.parse import quote
 
 from ..exceptions import KubernetesError
+from .kube_api import KubeApiClient, ObjectWatch, load_kubeconfig
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, Iterable
 
 logger = logging.getLogger("svc.controllers.kubernetes")
 
+# Resources whose objects are kept in the run's ObjectCache
+CACHED_RESOURCES = frozenset({"deployment", "pvc", "pv"})
+
+# API group path and plural of the resources svc reads, keyed by their kubectl name
+API_RESOURCES = {
+    "deployment": ("/apis/apps/v1", "deployments"),
+    "pods": ("/api/v1", "pods"),
+    "pvc": ("/api/v1", "persistentvolumeclaims"),
+    "pv": ("/api/v1", "persistentvolumes"),
+}
+
 
 @dataclass
 class DeploymentScale:
@@ -24,6 +41,41 @@ class DeploymentScale:
     replicas: int
 
 
+@dataclass
+class ObjectCache:
+    """
+    Deployments, PVCs and PVs read during one svc run.
+
+    Entries are keyed by (resource, namespace, name) and dropped when svc changes
+    the object; a read never replaces an entry with an older resourceVersion.
+    """
+
+    objects: dict[tuple[str, str, str], dict[str, Any]] = field(
+        default_factory=lambda: cast("dict[tuple[str, str, str], dict[str, Any]]", {})
+    )
+    hits: int = 0
+    misses: int = 0
+
+    def get(self, key: tuple[str, str, str]) -> dict[str, Any] | None:
+        """Return a cached object, counting the lookup."""
+        obj = self.objects.get(key)
+        if obj is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return obj
+
+    def put(self, key: tuple[str, str, str], obj: dict[str, Any]) -> None:
+        """Store an object unless a newer version of it is cached."""
+        cached = self.objects.get(key)
+        if cached is None or _version(cached) <= _version(obj):
+            self.objects[key] = obj
+
+    def invalidate(self, key: tuple[str, str, str]) -> None:
+        """Drop an object svc is about to change."""
+        self.objects.pop(key, None)
+
+
 @dataclass
 class KubernetesCommandResult:
     """Result of a kubectl command."""
@@ -34,13 +86,21 @@ class KubernetesCommandResult:
 
 
 class KubernetesController:
-    """Controls Kubernetes operations needed for backup orchestration."""
+    """
+    Controls Kubernetes operations needed for backup orchestration.
+
+    Reads, scales and waits go to the API server through one pooled client, built
+    from the kubeconfig on first use. With `use_api=False` (or for `exec`, which
+    needs a streaming protocol) they run kubectl instead.
+    """
 
     def __init__(
         self,
         kubectl_bin: str = "/run/current-system/sw/bin/kubectl",
         kubeconfig: str = "/etc/rancher/k3s/k3s.yaml",
         dry_run: bool = False,
+        *,
+        use_api: bool = True,
     ):
         self.kubectl = kubectl_bin
         if not Path(self.kubectl).exists():
@@ -49,6 +109,39 @@ class KubernetesController:
                 self.kubectl = found
         self.kubeconfig = kubeconfig
         self.dry_run = dry_run
+        self.use_api = use_api
+        self._kubectl_exists: bool | None = None
+        self._api: KubeApiClient | None = None
+        self._api_lock = asyncio.Lock()
+        # Watches shared by the waits, keyed by (resource, namespace)
+        self._watches: dict[tuple[str, str], ObjectWatch] = {}
+        self.cache = ObjectCache()
+
+    async def close(self) -> None:
+        """Stop the watches and close the API server connections."""
+        for watch in self._watches.values():
+            await watch.close()
+        self._watches.clear()
+        if self._api is not None:
+            await self._api.close()
+
+    def _watch(self, api: KubeApiClient, resource: str, namespace: str) -> ObjectWatch:
+        """Return the watch on the resource's objects in a namespace."""
+        key = (resource, namespace)
+        if key not in self._watches:
+            group, plural = API_RESOURCES[resource]
+            self._watches[key] = ObjectWatch(api, f"{group}/namespaces/{quote(namespace)}/{plural}")
+        return self._watches[key]
+
+    async def _api_client(self) -> KubeApiClient | None:
+        """Return the API client, or None when kubectl is used instead."""
+        if not self.use_api:
+            return None
+        async with self._api_lock:
+            if self._api is None:
+                kubeconfig = await load_kubeconfig(self.kubeconfig, self.kubectl)
+                self._api = KubeApiClient.from_kubeconfig(kubeconfig)
+        return self._api
 
     async def _run(
         self,
@@ -58,8 +151,9 @@ class KubernetesController:
         allow_dry_run: bool = False,
     ) -> KubernetesCommandResult:
         """Run kubectl asynchronously."""
-        kubectl_exists = await asyncio.to_thread(Path(self.kubectl).exists)
-        if not kubectl_exists:
+        if self._kubectl_exists is None:
+            self._kubectl_exists = await asyncio.to_thread(Path(self.kubectl).exists)
+        if not self._kubectl_exists:
             message = "kubectl not found"
             raise KubernetesError(message)
 
@@ -100,9 +194,59 @@ class KubernetesController:
             raise KubernetesError(message)
         return cast("dict[str, Any]", raw)
 
+    async def _get(
+        self,
+        resource: str,
+        name: str | None = None,
+        *,
+        namespace: str | None = None,
+        selector: str | None = None,
+    ) -> dict[str, Any]:
+        """Get an object, or list objects matching a label selector."""
+        cached = resource in CACHED_RESOURCES
+        key = (resource, namespace or "", name or "")
+        if cached and name:
+            obj = self.cache.get(key)
+            if obj is None:
+                obj = await self._fetch(resource, name, namespace=namespace, selector=selector)
+                self.cache.put(key, obj)
+            return obj
+
+        obj = await self._fetch(resource, name, namespace=namespace, selector=selector)
+        if cached and not selector:
+            for item in _dict_list(obj, "items"):
+                item_name = _dict_field(item, "metadata").get("name")
+                if isinstance(item_name, str):
+                    self.cache.put((resource, namespace or "", item_name), item)
+        return obj
+
+    async def _fetch(
+        self,
+        resource: str,
+        name: str | None = None,
+        *,
+        namespace: str | None = None,
+        selector: str | None = None,
+    ) -> dict[str, Any]:
+        """Read an object or a list from the API server or kubectl."""
+        api = await self._api_client()
+        if api is None:
+            args = ["-n", namespace] if namespace else []
+            args.extend(["get", resource])
+            if name:
+                args.append(name)
+            if selector:
+                args.extend(["-l", selector])
+            return await self._get_json(args)
+
+        group, plural = API_RESOURCES[resource]
+        path = f"{group}/namespaces/{quote(namespace)}" if namespace else group
+        path = f"{path}/{plural}/{quote(name)}" if name else f"{path}/{plural}"
+        return await api.get(path, {"labelSelector": selector} if selector else None)
+
     async def deployment_replicas(self, namespace: str, deployment: str) -> int:
         """Get the desired replica count for a deployment."""
-        obj = await self._get_json(["-n", namespace, "get", "deployment", deployment])
+        obj = await self._get("deployment", deployment, namespace=namespace)
         spec = _dict_field(obj, "spec")
         replicas = spec.get("replicas", 1)
         return replicas if isinstance(replicas, int) else 1
@@ -115,6 +259,19 @@ class KubernetesController:
     async def scale_deployment(self, scale: DeploymentScale, replicas: int) -> None:
         """Scale a deployment to the requested replica count."""
         logger.info("Scaling deployment/%s in %s to %s...", scale.name, scale.namespace, replicas)
+        self.cache.invalidate(("deployment", scale.namespace, scale.name))
+        api = await self._api_client()
+        if api is not None:
+            if self.dry_run:
+                logger.info("[DRY RUN] Would scale deployment/%s to %s", scale.name, replicas)
+                return
+            await api.patch(
+                f"/apis/apps/v1/namespaces/{quote(scale.namespace)}/deployments/"
+                f"{quote(scale.name)}/scale",
+                {"spec": {"replicas": replicas}},
+            )
+            return
+
         result = await self._run(
             [
                 "-n",
@@ -136,7 +293,13 @@ class KubernetesController:
         replicas: int,
         timeout_seconds: int = 180,
     ) -> None:
-        """Wait until a deployment reaches the requested replica count."""
+        """
+        Wait until a deployment reaches the requested replica count.
+
+        Over the API, the deployment and (when scaling to zero) its pods are
+        followed through the namespace's watches, so the wait ends on the event
+        that completes it.
+        """
         if self.dry_run:
             logger.info(
                 "[DRY RUN] Would wait for deployment/%s in %s to reach %s replicas",
@@ -146,6 +309,12 @@ class KubernetesController:
             )
             return
 
+        api = await self._api_client()
+        if api is not None:
+            target = DeploymentScale(namespace=namespace, name=deployment, replicas=replicas)
+            await self._watch_replicas(api, target, timeout_seconds)
+            return
+
         result = await self._run(
             [
                 "-n",
@@ -164,20 +333,75 @@ class KubernetesController:
         if replicas == 0:
             await self._wait_for_no_deployment_pods(namespace, deployment, timeout_seconds)
 
+    async def deployment_pod_uids(self, namespace: str, deployment: str) -> list[str]:
+        """Return the UIDs of the pods currently selected by a deployment."""
+        selector = await self._deployment_selector(namespace, deployment)
+        obj = await self._get("pods", namespace=namespace, selector=selector)
+        items = obj.get("items")
+        if not isinstance(items, list):
+            return []
+
+        uids: list[str] = []
+        for item in cast("list[Any]", items):
+            if not isinstance(item, dict):
+                continue
+            metadata = _dict_field(cast("dict[str, Any]", item), "metadata")
+            uid = metadata.get("uid")
+            if isinstance(uid, str) and uid:
+                uids.append(uid)
+        return uids
+
+    async def pvc_writers(self, namespace: str, pvcs: list[str]) -> list[str]:
+        """
+        Return the deployments whose pod template mounts any of the PVCs read-write.
+
+        A PVC volume counts as written unless the volume itself or every container
+        (and init container) mount of it is read-only.
+        """
+        obj = await self._get("deployment", namespace=namespace)
+        items = obj.get("items")
+        if not isinstance(items, list):
+            return []
+
+        writers: list[str] = []
+        for item in cast("list[Any]", items):
+            if not isinstance(item, dict):
+                continue
+            deployment = cast("dict[str, Any]", item)
+            name = _dict_field(deployment, "metadata").get("name")
+            template = _dict_field(_dict_field(deployment, "spec"), "template")
+            if isinstance(name, str) and _template_writes_pvcs(template, set(pvcs)):
+                writers.append(name)
+        return sorted(writers)
+
+    def exec_command(
+        self,
+        namespace: str,
+        deployment: str,
+        command: list[str],
+        *,
+        container: str | None = None,
+        stdin: bool = False,
+    ) -> list[str]:
+        """Build the kubectl argv that runs a command in a pod of a deployment."""
+        args = [self.kubectl, "--kubeconfig", self.kubeconfig, "-n", namespace, "exec"]
+        if stdin:
+            args.append("-i")
+        args.append(f"deployment/{deployment}")
+        if container:
+            args.extend(["-c", container])
+        return [*args, "--", *command]
+
     async def pvc_filesystem_path(self, namespace: str, pvc: str) -> str:
         """Resolve a PVC to its backing host filesystem path for local PV backends."""
-        pvc_obj = await self._get_json(["-n", namespace, "get", "pvc", pvc])
+        pvc_obj = await self._get("pvc", pvc, namespace=namespace)
         pvc_spec = _dict_field(pvc_obj, "spec")
         volume_name = pvc_spec.get("volumeName")
         if not isinstance(volume_name, str) or not volume_name:
             message = f"PVC {namespace}/{pvc} is not bound to a PV"
             raise KubernetesError(message)
 
-        pv_obj = await self._get_json(["get", "pv", volume_name])
-        pv_spec = _dict_field(pv_obj, "spec")
-        path = _nested_string(pv_spec, "hostPath", "path") or _nested_string(
-            pv_spec, "local", "path"
-        )
+        path = _pv_host_path(await self._get("pv", volume_name))
         if path is None:
             message = (
                 f"PV {volume_name} for PVC {namespace}/{pvc} is not backed by "
@@ -187,6 +411,34 @@ class KubernetesController:
 
         return path
 
+    async def pvc_host_paths(self, namespaces: Iterable[str]) -> dict[str, str]:
+        """
+        Map `namespace/pvc` to the host path of every bound PVC of the namespaces.
+
+        Lists all PVs and the PVCs of each namespace, one request each; the listed
+        objects also fill the cache. PVCs that `pvc_filesystem_path()` would reject
+        (unbound, not host-backed) are left out.
+        """
+        ordered = sorted(set(namespaces))
+        pvs, *pvc_lists = await asyncio.gather(
+            self._get("pv"), *(self._get("pvc", namespace=namespace) for namespace in ordered)
+        )
+        pv_paths: dict[str, str] = {}
+        for pv in _dict_list(pvs, "items"):
+            name = _dict_field(pv, "metadata").get("name")
+            path = _pv_host_path(pv)
+            if isinstance(name, str) and path is not None:
+                pv_paths[name] = path
+
+        index: dict[str, str] = {}
+        for namespace, pvcs in zip(ordered, pvc_lists, strict=True):
+            for pvc in _dict_list(pvcs, "items"):
+                name = _dict_field(pvc, "metadata").get("name")
+                volume = _dict_field(pvc, "spec").get("volumeName")
+                if isinstance(name, str) and volume in pv_paths:
+                    index[f"{namespace}/{name}"] = pv_paths[volume]
+        return index
+
     async def _wait_for_no_deployment_pods(
         self,
         namespace: str,
@@ -223,9 +475,45 @@ class KubernetesController:
             message = f"Pods for deployment/{deployment} still exist after scale-down"
             raise KubernetesError(message)
 
+    async def _watch_replicas(
+        self, api: KubeApiClient, target: DeploymentScale, timeout_seconds: int
+    ) -> None:
+        """Wait on the namespace's watches for a rollout to the target scale to complete."""
+        namespace, deployment, replicas = target.namespace, target.name, target.replicas
+        deployments = self._watch(api, "deployment", namespace)
+
+        def rolled_out(objects: dict[str, dict[str, Any]]) -> bool:
+            # The spec check skips cached states from before the scale request
+            obj = objects.get(deployment)
+            return (
+                obj is not None
+                and _dict_field(obj, "spec").get("replicas", 1) == replicas
+                and _rollout_complete(obj)
+            )
+
+        async with _waiting(f"Timed out waiting for deployment/{deployment}", timeout_seconds):
+            await deployments.wait_until(rolled_out)
+        obj = deployments.objects[deployment]
+        self.cache.put(("deployment", namespace, deployment), obj)
+        if replicas != 0:
+            return
+
+        spec = _dict_field(obj, "spec")
+        labels = _dict_field(_dict_field(spec, "selector"), "matchLabels")
+        if not labels:
+            message = f"Deployment {namespace}/{deployment} has no matchLabels selector"
+            raise KubernetesError(message)
+
+        def no_pods(objects: dict[str, dict[str, Any]]) -> bool:
+            return not any(_labels_match(pod, labels) for pod in objects.values())
+
+        message = f"Pods for deployment/{deployment} still exist after scale-down"
+        async with _waiting(message, timeout_seconds):
+            await self._watch(api, "pods", namespace).wait_until(no_pods)
+
     async def _deployment_selector(self, namespace: str, deployment: str) -> str:
         """Return a comma-separated matchLabels selector for a deployment."""
-        obj = await self._get_json(["-n", namespace, "get", "deployment", deployment])
+        obj = await self._get("deployment", deployment, namespace=namespace)
         spec = _dict_field(obj, "spec")
         selector = _dict_field(spec, "selector")
         match_labels = _dict_field(selector, "matchLabels")
@@ -242,12 +530,92 @@ class KubernetesController:
         return ",".join(parts)
 
 
+@contextlib.asynccontextmanager
+async def _waiting(message: str, timeout_seconds: int) -> AsyncGenerator[None]:
+    """Raise KubernetesError with the message if the block outlives the timeout."""
+    try:
+        async with asyncio.timeout(timeout_seconds):
+            yield
+    except TimeoutError as error:
+        raise KubernetesError(message) from error
+
+
+def _version(obj: dict[str, Any]) -> int:
+    """Return an object's resourceVersion as a number, or -1 if it has none."""
+    version = _dict_field(obj, "metadata").get("resourceVersion")
+    return int(version) if isinstance(version, str) and version.isdigit() else -1
+
+
+def _labels_match(obj: dict[str, Any], labels: dict[str, Any]) -> bool:
+    """Return True if an object carries all the labels."""
+    own = _dict_field(_dict_field(obj, "metadata"), "labels")
+    return all(own.get(key) == value for key, value in labels.items())
+
+
+def _rollout_complete(deployment: dict[str, Any]) -> bool:
+    """Return True once every replica of a deployment runs its current template."""
+    metadata = _dict_field(deployment, "metadata")
+    spec = _dict_field(deployment, "spec")
+    status = _dict_field(deployment, "status")
+    replicas = spec.get("replicas", 1)
+    observed = status.get("observedGeneration", 0)
+    updated = status.get("updatedReplicas", 0)
+    return (
+        observed >= metadata.get("generation", 0)
+        and updated >= replicas
+        and status.get("replicas", 0) <= updated
+        and status.get("availableReplicas", 0) >= updated
+    )
+
+
 def _dict_field(obj: dict[str, Any], key: str) -> dict[str, Any]:
     """Return a nested dictionary field or an empty dictionary."""
     value = obj.get(key)
     return cast("dict[str, Any]", value) if isinstance(value, dict) else {}
 
 
+def _template_writes_pvcs(template: dict[str, Any], pvcs: set[str]) -> bool:
+    """Return True if a pod template mounts any of the PVCs without readOnly."""
+    pod_spec = _dict_field(template, "spec")
+    volumes: set[str] = set()
+    for volume in _dict_list(pod_spec, "volumes"):
+        claim = _dict_field(volume, "persistentVolumeClaim")
+        name = volume.get("name")
+        if (
+            isinstance(name, str)
+            and claim.get("claimName") in pvcs
+            and claim.get("readOnly") is not True
+        ):
+            volumes.add(name)
+    if not volumes:
+        return False
+
+    containers = [*_dict_list(pod_spec, "containers"), *_dict_list(pod_spec, "initContainers")]
+    return any(
+        mount.get("name") in volumes and mount.get("readOnly") is not True
+        for container in containers
+        for mount in _dict_list(container, "volumeMounts")
+    )
+
+
+def _dict_list(obj: dict[str, Any], key: str) -> list[dict[str, Any]]:
+    """Return the dictionaries of a list field, or an empty list."""
+    value = obj.get(key)
+    if not isinstance(value, list):
+        return []
+    return [
+        cast("dict[str, Any]", entry)
+        for entry in cast("list[Any]", value)
+        if isinstance(entry, dict)
+    ]
+
+
+def _pv_host_path(pv: dict[str, Any]) -> str | None:
+    """Return the host path of a hostPath or local PV."""
+    spec = _dict_field(pv, "spec")
+    return _nested_string(spec, "hostPath", "path") or _nested_string(spec, "local", "path")
+
+
 def _nested_string(obj: dict[str, Any], first: str, second: str) -> str | None:
     """Return obj[first][second] when it is a string."""
     raw_nested = obj.get(first)
@@ -0,0 +1,74 @@
+"""Subprocess helpers that run commands in their own process group with timeouts."""
+
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+from dataclasses import dataclass
+
+logger = logging.getLogger("svc.controllers.process")
+
+
+@dataclass
+class ProcessResult:
+    """Outcome of a command run with `run_process()` or `capture_process()`."""
+
+    returncode: int
+    timed_out: bool = False
+    # Only filled in by `capture_process()`
+    stdout: str = ""
+    stderr: str = ""
+
+
+async def run_process(argv: list[str], timeout_seconds: float | None = None) -> ProcessResult:
+    """
+    Run a command in a new session and wait for it.
+
+    When the timeout expires the whole process group is killed, so shells and the
+    children they spawned do not outlive the command.
+    """
+    proc = await asyncio.create_subprocess_exec(*argv, start_new_session=True)
+    try:
+        await asyncio.wait_for(proc.wait(), timeout_seconds)
+    except TimeoutError:
+        logger.warning("Timed out after %ss: %s", timeout_seconds, " ".join(argv))
+        await kill_process_group(proc)
+        return ProcessResult(returncode=proc.returncode or -signal.SIGKILL, timed_out=True)
+    return ProcessResult(returncode=proc.returncode or 0)
+
+
+async def capture_process(argv: list[str], timeout_seconds: float | None = None) -> ProcessResult:
+    """Run a command like `run_process()`, capturing its output."""
+    proc = await asyncio.create_subprocess_exec(
+        *argv,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+    )
+    try:
+        stdout_bytes, stderr_bytes = await asyncio.wait_for(proc.communicate(), timeout_seconds)
+    except TimeoutError:
+        logger.warning("Timed out after %ss: %s", timeout_seconds, " ".join(argv))
+        await kill_process_group(proc)
+        return ProcessResult(returncode=proc.returncode or -signal.SIGKILL, timed_out=True)
+    return ProcessResult(
+        returncode=proc.returncode or 0,
+        stdout=stdout_bytes.decode(errors="replace"),
+        stderr=stderr_bytes.decode(errors="replace"),
+    )
+
+
+async def kill_process_group(proc: asyncio.subprocess.Process, grace_seconds: float = 5) -> None:
+    """Send SIGTERM to a process group, then SIGKILL if it is still alive after the grace period."""
+    if proc.returncode is not None:
+        return
+
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, sig)
+        try:
+            await asyncio.wait_for(proc.wait(), grace_seconds)
+        except TimeoutError:
+            continue
+        return
@@ -4,6 +4,10 @@ import asyncio
 import json
 import logging
 import os
+import re
+import shutil
+import sys
+from collections.abc import Mapping
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, TypedDict, cast
@@ -13,6 +17,38 @@ from ..exceptions import ResticError
 
 logger = logging.getLogger("svc.controllers.restic")
 
+# Bind-mounts "$1" over "$2" (read-only) for each pair up to "--", then execs the rest.
+# A missing "$2" is created as a directory, or as an empty file for a file source.
+BIND_MOUNT_SCRIPT = (
+    'set -e; while [ "$1" != "--" ]; do '
+    'if [ -d "$1" ]; then mkdir -p "$2"; '
+    'else mkdir -p "$(dirname "$2")"; [ -e "$2" ] || touch "$2"; fi; '
+    'mount --bind "$1" "$2"; mount -o remount,bind,ro "$2"; shift 2; '
+    'done; shift; exec "$@"'
+)
+
+# Extra tag on snapshots created from a command's stdout, so they can be told apart
+# from the filesystem snapshot of the same service.
+STREAM_TAG = "svc-stream"
+
+# Tag prefixes of sharded backups: every shard snapshot carries a stable per-shard
+# tag (used to find its parent) and the tag of the group written in the same run.
+SHARD_TAG_PREFIX = "svc-shard:"
+GROUP_TAG_PREFIX = "svc-group:"
+
+_SNAPSHOT_SAVED = re.compile(r"^snapshot ([0-9a-f]+) saved", re.MULTILINE)
+
+# Repository settings and the variables restic reads them from for the source of
+# `restic copy`.
+_FROM_REPOSITORY_VARS = {
+    "RESTIC_REPOSITORY": "RESTIC_FROM_REPOSITORY",
+    "RESTIC_REPOSITORY_FILE": "RESTIC_FROM_REPOSITORY_FILE",
+    "RESTIC_PASSWORD": "RESTIC_FROM_PASSWORD",
+    "RESTIC_PASSWORD_FILE": "RESTIC_FROM_PASSWORD_FILE",
+    "RESTIC_PASSWORD_COMMAND": "RESTIC_FROM_PASSWORD_COMMAND",
+    "RESTIC_KEY_HINT": "RESTIC_FROM_KEY_HINT",
+}
+
 
 class ResticSnapshot(TypedDict, total=False):
     """Minimal restic snapshot representation."""
@@ -20,6 +56,9 @@ class ResticSnapshot(TypedDict, total=False):
     id: str
     time: str
     hostname: str
+    tree: str
+    tags: list[str]
+    paths: list[str]
 
 
 @dataclass
@@ -31,20 +70,55 @@ class CommandResult:
     stderr: str = ""
 
 
+@dataclass
+class ResticBackupResult:
+    """Result of a restic backup run."""
+
+    returncode: int
+    snapshot_id: str | None = None
+
+
 class ResticRunner:
     """Executes restic commands asynchronously."""
 
-    def __init__(self, env_vars: dict[str, str], dry_run: bool = False):
+    def __init__(
+        self,
+        env_vars: dict[str, str],
+        dry_run: bool = False,
+        host: str | None = None,
+        *,
+        echo_output: bool = True,
+    ):
         self.env_vars = env_vars
         self.dry_run = dry_run
+        self.host = host
+        # Whether restic's stdout reaches ours; concurrent backups keep it to debug logs
+        # so their output does not interleave
+        self.echo_output = echo_output
         self.restic = "/run/current-system/sw/bin/restic"
-
-    async def _run(self, args: list[str], capture_output: bool = False) -> CommandResult:
-        """Run a restic command with environment."""
+        self.unshare = shutil.which("unshare") or "/run/current-system/sw/bin/unshare"
+
+    async def _run(
+        self,
+        args: list[str],
+        capture_output: bool = False,
+        *,
+        wrapper: list[str] | None = None,
+        tee: bool = False,
+        extra_env: Mapping[str, str] | None = None,
+    ) -> CommandResult:
+        """
+        Run a restic command with environment, optionally through a wrapper command.
+
+        With `tee`, stdout is passed through to our stdout as it arrives and also
+        returned, so restic's output stays visible while it can still be parsed.
+        Without `echo_output`, stdout is logged at debug level instead.
+        """
         env = os.environ.copy()
         env.update(self.env_vars)
+        env.update(extra_env or {})
 
-        cmd = [self.restic, *args]
+        cmd = [*(wrapper or []), self.restic, *args]
         logger.debug("Running: %s", " ".join(cmd))
 
         if self.dry_run and not capture_output:
@@ -64,24 +138,129 @@ class ResticRunner:
                 stdout=stdout_bytes.decode() if stdout_bytes else "",
                 stderr=stderr_bytes.decode() if stderr_bytes else "",
             )
+        if tee or not self.echo_output:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, env=env, stdout=asyncio.subprocess.PIPE
+            )
+            lines: list[str] = []
+            async for raw in cast("asyncio.StreamReader", proc.stdout):
+                line = raw.decode(errors="replace")
+                if self.echo_output:
+                    sys.stdout.write(line)
+                else:
+                    logger.debug("restic: %s", line.rstrip("\n"))
+                lines.append(line)
+            await proc.wait()
+            return CommandResult(returncode=proc.returncode or 0, stdout="".join(lines))
         proc = await asyncio.create_subprocess_exec(*cmd, env=env)
         await proc.wait()
         return CommandResult(returncode=proc.returncode or 0)
 
-    async def backup(self, paths: list[str], tags: list[str], exclude: list[str]) -> int:
-        """Run restic backup command."""
+    async def backup(
+        self,
+        paths: list[str],
+        tags: list[str],
+        exclude: list[str],
+        *,
+        bind_mounts: Mapping[str, str] | None = None,
+        ignore_inode: bool = False,
+    ) -> ResticBackupResult:
+        """
+        Run restic backup command.
+
+        `bind_mounts` maps backed-up paths to the directories whose contents should be
+        read in their place. restic then runs in a private mount namespace with each
+        source bind-mounted read-only over its path, so snapshot paths stay unchanged.
+
+        The snapshot is recorded under `self.host` (when set), and the latest
+        filesystem snapshot carrying all of `tags` from that host is passed as
+        `--parent`, so restic still finds its parent after the set of paths changes.
+        A group tag (`GROUP_TAG_PREFIX`) differs on every run and is left out of that
+        lookup.
+        """
         args = ["backup"]
         args.extend(paths)
         for tag in tags:
             args.extend(["--tag", tag])
         for pattern in exclude:
             args.extend(["--exclude", pattern])
+        if ignore_inode:
+            args.extend(["--ignore-inode", "--ignore-ctime"])
+        if self.host is not None:
+            args.extend(["--host", self.host])
+        parent_tags = [tag for tag in tags if not tag.startswith(GROUP_TAG_PREFIX)]
+        parent = (
+            await self.get_latest_snapshot_id(",".join(parent_tags), self.host)
+            if parent_tags
+            else None
+        )
+        if parent is not None:
+            args.extend(["--parent", parent])
+
+        wrapper = self._bind_mount_wrapper(bind_mounts) if bind_mounts else None
+        result = await self._run(args, wrapper=wrapper, tee=True)
+        return _backup_result(result)
+
+    async def backup_stdin(
+        self, command: list[str], filename: str, tags: list[str]
+    ) -> ResticBackupResult:
+        """
+        Back up the stdout of a command as a single file, without staging it on disk.
+
+        Uses `restic backup --stdin-from-command`, which fails (and saves no snapshot)
+        when the command exits non-zero. The snapshot is tagged with `STREAM_TAG` in
+        addition to `tags`.
+        """
+        args = ["backup", "--stdin-filename", filename]
+        for tag in [*tags, STREAM_TAG]:
+            args.extend(["--tag", tag])
+        if self.host is not None:
+            args.extend(["--host", self.host])
+        args.extend(["--stdin-from-command", "--", *command])
+
+        result = await self._run(args, tee=True)
+        return _backup_result(result)
+
+    def _bind_mount_wrapper(self, bind_mounts: Mapping[str, str]) -> list[str]:
+        """Build an unshare prefix that bind-mounts sources over their target paths."""
+        pairs = [arg for target, source in bind_mounts.items() for arg in (source, target)]
+        return [
+            self.unshare,
+            "--mount",
+            "--propagation",
+            "private",
+            "--",
+            "/bin/sh",
+            "-c",
+            BIND_MOUNT_SCRIPT,
+            "svc-bind-mount",
+            *pairs,
+            "--",
+        ]
 
-        result = await self._run(args)
+    async def copy(self, source: "ResticRunner", snapshot_ids: list[str]) -> int:
+        """
+        Copy snapshots from the repository of `source` into this one.
+
+        Only data missing here is transferred. It deduplicates against this
+        repository only if both share chunker parameters, i.e. this one was created
+        with `restic init --from-repo <source> --copy-chunker-params`.
+        """
+        extra_env = {
+            _FROM_REPOSITORY_VARS[name]: value
+            for name, value in source.env_vars.items()
+            if name in _FROM_REPOSITORY_VARS
+        }
+        result = await self._run(["copy", *snapshot_ids], extra_env=extra_env)
         return result.returncode
 
     async def forget(self, tags: list[str], policy: RetentionPolicy) -> int:
-        """Run restic forget with retention policy."""
+        """
+        Run restic forget with retention policy.
+
+        Snapshots matching any of `tags` are selected; pruning of unreferenced data is
+        left to a separate `prune()` call so several forgets can share one prune pass.
+        """
         args = ["forget"]
 
         if policy.last is not None:
@@ -97,14 +276,17 @@ class ResticRunner:
         if policy.yearly is not None:
             args.extend(["--keep-yearly", str(policy.yearly)])
 
-        args.append("--prune")
-
         for tag in tags:
             args.extend(["--tag", tag])
 
         result = await self._run(args)
         return result.returncode
 
+    async def prune(self) -> int:
+        """Run restic prune to remove data no longer referenced by any snapshot."""
+        result = await self._run(["prune"])
+        return result.returncode
+
     async def restore(self, snapshot_id: str, include_paths: list[str], target: str = "/") -> int:
         """Run restic restore command with --delete flag."""
         args = ["restore", snapshot_id]
@@ -132,11 +314,41 @@ class ResticRunner:
         """Dump a file from a snapshot."""
         return await self._run(["dump", snapshot_id, path], capture_output=True)
 
-    async def snapshots(self, tags: list[str]) -> list[ResticSnapshot]:
-        """List snapshots for given tags."""
-        args = ["snapshots", "--json"]
+    async def dump_into(self, snapshot_id: str, path: str, command: list[str]) -> int:
+        """
+        Pipe a file from a snapshot into the stdin of a command, without staging it.
+
+        Returns restic's exit code if it failed, otherwise the command's.
+        """
+        if self.dry_run:
+            logger.info(f"[DRY RUN] Would run: restic dump {snapshot_id} {path} | {command[0]}")
+            return 0
+
+        env = os.environ.copy()
+        env.update(self.env_vars)
+        read_fd, write_fd = os.pipe()
+        try:
+            dump = await asyncio.create_subprocess_exec(
+                self.restic, "dump", snapshot_id, path, env=env, stdout=write_fd
+            )
+            consumer = await asyncio.create_subprocess_exec(*command, stdin=read_fd)
+        finally:
+            # The children hold their own ends; closing ours lets each see EOF/EPIPE
+            os.close(read_fd)
+            os.close(write_fd)
+
+        dump_status, consumer_status = await asyncio.gather(dump.wait(), consumer.wait())
+        return dump_status or consumer_status
+
+    async def snapshots(
+        self, tags: list[str], host: str | None = None, *, snapshot_ids: list[str] | None = None
+    ) -> list[ResticSnapshot]:
+        """List snapshots for given tags (or IDs), optionally only those of one host."""
+        args = ["snapshots", "--json", *(snapshot_ids or [])]
         for tag in tags:
             args.extend(["--tag", tag])
+        if host is not None:
+            args.extend(["--host", host])
 
         result = await self._run(args, capture_output=True)
         if result.returncode != 0:
@@ -156,27 +368,39 @@ class ResticRunner:
         for item in raw_list:
             if not isinstance(item, dict):
                 continue
-            item_dict = cast("dict[str, Any]", item)
-            snap: ResticSnapshot = {}
-            snap_id = item_dict.get("id")
-            if isinstance(snap_id, str):
-                snap["id"] = snap_id
-            snap_time = item_dict.get("time")
-            if isinstance(snap_time, str):
-                snap["time"] = snap_time
-            snap_hostname = item_dict.get("hostname")
-            if isinstance(snap_hostname, str):
-                snap["hostname"] = snap_hostname
-            snapshots.append(snap)
+            snapshots.append(_parse_snapshot(cast("dict[str, Any]", item)))
 
         return snapshots
 
-    async def get_latest_snapshot_id(self, tag: str) -> str | None:
-        """Get ID of the latest snapshot for a tag (across all hosts)."""
+    async def snapshot_group(self, snapshot_id: str) -> list[ResticSnapshot]:
+        """
+        Return every shard of the sharded backup a snapshot belongs to.
+
+        A snapshot that is not part of a sharded backup is returned on its own (an
+        empty list means it was not found).
+        """
+        found = await self.snapshots([], snapshot_ids=[snapshot_id])
+        group_tags = [
+            tag
+            for snap in found
+            for tag in snap.get("tags", [])
+            if tag.startswith(GROUP_TAG_PREFIX)
+        ]
+        if not group_tags:
+            return found
+        return await self.snapshots([group_tags[0]])
+
+    async def get_latest_snapshot_id(self, tag: str, host: str | None = None) -> str | None:
+        """
+        Get ID of the latest filesystem snapshot for a tag (across all hosts by default).
+
+        `tag` may be a comma-separated list to require several tags at once.
+        """
         try:
-            snapshots = await self.snapshots([tag])
+            snapshots = await self.snapshots([tag], host)
         except ResticError:
             return None
+        snapshots = [snap for snap in snapshots if STREAM_TAG not in snap.get("tags", [])]
         latest_id, _latest_time = self._latest_snapshot_by_parsed_time(snapshots)
         if latest_id is not None:
             return latest_id
@@ -185,17 +409,7 @@ class ResticRunner:
 
     def _parse_snapshot_time(self, value: str | None) -> datetime | None:
         """Parse a restic RFC3339 timestamp string to a datetime."""
-        if not value:
-            return None
-        try:
-            return datetime.fromisoformat(value)
-        except ValueError:
-            if value.endswith("Z"):
-                try:
-                    return datetime.fromisoformat(f"{value[:-1]}+00:00")
-                except ValueError:
-                    return None
-            return None
+        return parse_snapshot_time(value)
 
     def _latest_snapshot_by_parsed_time(
         self, snapshots: list[ResticSnapshot]
@@ -233,3 +447,51 @@ class ResticRunner:
         if path is not None:
             args.extend(["--path", path])
         return await self._run(args, capture_output=True)
+
+
+def _backup_result(result: CommandResult) -> ResticBackupResult:
+    """Extract the saved snapshot ID from restic backup output."""
+    match = _SNAPSHOT_SAVED.search(result.stdout)
+    return ResticBackupResult(
+        returncode=result.returncode,
+        snapshot_id=match.group(1) if match else None,
+    )
+
+
+def _parse_snapshot(item: dict[str, Any]) -> ResticSnapshot:
+    """Pick the fields svc uses from one `restic snapshots --json` entry."""
+    snap: ResticSnapshot = {}
+    snap_id = item.get("id")
+    if isinstance(snap_id, str):
+        snap["id"] = snap_id
+    snap_time = item.get("time")
+    if isinstance(snap_time, str):
+        snap["time"] = snap_time
+    snap_hostname = item.get("hostname")
+    if isinstance(snap_hostname, str):
+        snap["hostname"] = snap_hostname
+    snap_tree = item.get("tree")
+    if isinstance(snap_tree, str):
+        snap["tree"] = snap_tree
+    snap_tags = item.get("tags")
+    if isinstance(snap_tags, list):
+        snap["tags"] = [t for t in cast("list[Any]", snap_tags) if isinstance(t, str)]
+    snap_paths = item.get("paths")
+    if isinstance(snap_paths, list):
+        snap["paths"] = [p for p in cast("list[Any]", snap_paths) if isinstance(p, str)]
+    return snap
+
+
+def parse_snapshot_time(value: str | None) -> datetime | None:
+    """Parse a restic RFC3339 timestamp string to a datetime."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        if value.endswith("Z"):
+            try:
+                return datetime.fromisoformat(f"{value[:-1]}+00:00")
+            except ValueError:
+                return None
+        return None
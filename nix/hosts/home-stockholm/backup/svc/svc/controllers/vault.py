@@ -0,0 +1,52 @@
+"""Vault raft snapshot commands, run through curl against the Vault API."""
+
+# Reads the Vault token from "$1" into a curl config on fd 3, so it never shows up
+# in a process's argv, then execs curl ("$3") against the URL ("$2") with the
+# remaining arguments.
+AUTHENTICATED_CURL_SCRIPT = """set -e
+token=$(cat "$1")
+url="$2"
+curl="$3"
+shift 3
+exec 3<<CONFIG
+header = "X-Vault-Token: $token"
+CONFIG
+exec "$curl" --config /dev/fd/3 --fail --silent --show-error "$@" "$url"
+"""
+
+
+class VaultController:
+    """Builds the commands that save and restore Vault's integrated (raft) storage."""
+
+    def __init__(self, address: str, token_path: str, *, curl: str = "curl"):
+        self.address = address.rstrip("/")
+        self.token_path = token_path
+        self.curl = curl
+
+    def snapshot_command(self) -> list[str]:
+        """Return the command writing a raft snapshot to stdout."""
+        return self._curl("sys/storage/raft/snapshot")
+
+    def restore_command(self) -> list[str]:
+        """
+        Return the command installing the raft snapshot read from stdin.
+
+        Uses `snapshot-force`, which also accepts snapshots taken by a cluster
+        with different keys (e.g. one rebuilt from scratch).
+        """
+        return self._curl(
+            "sys/storage/raft/snapshot-force", "--request", "POST", "--upload-file", "-"
+        )
+
+    def _curl(self, path: str, *args: str) -> list[str]:
+        """Build a curl command against a Vault API path, authenticated by the token."""
+        return [
+            "/bin/sh",
+            "-c",
+            AUTHENTICATED_CURL_SCRIPT,
+            "svc-vault",
+            self.token_path,
+            f"{self.address}/v1/{path}",
+            self.curl,
+            *args,
+        ]
@@ -1,22 +1,60 @@
 """Core business logic for svc."""
 
-from .backup_orchestrator import BackupOrchestrator, BackupPlan, BackupResult
+from .backup_orchestrator import BackupOptions, BackupOrchestrator, BackupPlan, BackupResult
+from .change_index import ChangeIndex, TreeDigest
+from .checkpoint import Checkpoint, CheckpointJournal
+from .deployment_scaler import DeploymentScaler, deployment_levels
 from .k3s_restore import K3sRestoreOrchestrator, K3sRestoreResult
-from .path_resolver import PathResolver, ResolvedPath, normalize_path
+from .path_resolver import (
+    PathResolver,
+    ResolvedPath,
+    missing_targets,
+    normalize_path,
+    stable_pvc_path,
+    target_key,
+)
+from .pvc_migration import PvcMigrationResult, PvcMigrator
+from .quiesce import PodFreezer
+from .replicator import SnapshotReplicator
 from .restore_orchestrator import RestoreOrchestrator, RestoreResult
-from .service_helpers import require_root, validate_service
+from .scheduler import BackupScheduler
+from .service_helpers import require_root, stream_sources, validate_service
+from .sharding import Shard, plan_shards
+from .snapshots import FrozenView, SnapshotProvider
+from .target_schedule import TargetSchedule
 
 __all__ = [
+    "BackupOptions",
     "BackupOrchestrator",
     "BackupPlan",
     "BackupResult",
+    "BackupScheduler",
+    "ChangeIndex",
+    "Checkpoint",
+    "CheckpointJournal",
+    "DeploymentScaler",
+    "FrozenView",
     "K3sRestoreOrchestrator",
     "K3sRestoreResult",
     "PathResolver",
+    "PodFreezer",
+    "PvcMigrationResult",
+    "PvcMigrator",
     "ResolvedPath",
     "RestoreOrchestrator",
     "RestoreResult",
+    "Shard",
+    "SnapshotProvider",
+    "SnapshotReplicator",
+    "TargetSchedule",
+    "TreeDigest",
+    "deployment_levels",
+    "missing_targets",
     "normalize_path",
+    "plan_shards",
     "require_root",
+    "stable_pvc_path",
+    "stream_sources",
+    "target_key",
     "validate_service",
 ]
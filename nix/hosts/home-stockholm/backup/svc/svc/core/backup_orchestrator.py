@@ -3,23 +3,62 @@
 import asyncio
 import json
 import logging
-from dataclasses import dataclass, field
+import time
+import uuid
+from collections.abc import Callable, Coroutine, Generator, Mapping, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from functools import partial
 from pathlib import Path
-from typing import cast
+from typing import Any, cast
 
-from ..config import Config, KubernetesBackupConfig, ServiceConfig
-from ..controllers import DeploymentScale, KubernetesController, ResticRunner
+from ..config import (
+    Config,
+    KubernetesBackupConfig,
+    PreBackupCommand,
+    ServiceConfig,
+    SnapshotConfig,
+    validate_model,
+)
+from ..controllers import (
+    GROUP_TAG_PREFIX,
+    CgroupFreezer,
+    KubernetesController,
+    ResticBackupResult,
+    ResticRunner,
+    run_process,
+)
 from ..exceptions import (
     EXIT_CONFIG_ERROR,
     EXIT_RESTIC_ERROR,
     EXIT_SUCCESS,
-    KubernetesError,
+    QuiesceHookError,
+    ResticError,
+    SnapshotError,
 )
-from .path_resolver import PathResolver, ResolvedPath
-from .service_helpers import validate_service
+from .change_index import ChangeIndex, TreeDigest
+from .deployment_scaler import DeploymentScaler
+from .k3s_backup import K3sEtcdSnapshotter
+from .k3s_restore import K3S_TOKEN_PATH
+from .path_resolver import (
+    PathResolver,
+    ResolvedPath,
+    missing_targets,
+    stable_pvc_path,
+)
+from .prometheus_snapshot import TSDB_SNAPSHOT_SOURCE, PrometheusSnapshotter, TsdbSnapshot
+from .quiesce import HookQuiescer, PodFreezer
+from .replicator import SnapshotReplicator
+from .service_helpers import stream_sources, validate_service
+from .sharding import Shard, plan_shards
+from .snapshots import FrozenView
+from .target_schedule import TargetSchedule, drop_missing_regenerable, scheduled_targets
 
 logger = logging.getLogger("svc.core.backup")
 
+# Undoes a quiesce step and returns failure messages (empty when all came back).
+Resume = Callable[[], Coroutine[Any, Any, list[str]]]
+
 
 @dataclass
 class BackupResult:
@@ -32,6 +71,19 @@ class BackupResult:
     paths_backed_up: list[str] = field(default_factory=lambda: cast("list[str]", []))
     missing_paths: list[str] = field(default_factory=lambda: cast("list[str]", []))
     forget_status: int | None = None
+    prune_status: int | None = None
+    prune_seconds: float | None = None
+    scale_up_errors: list[str] = field(default_factory=lambda: cast("list[str]", []))
+    snapshot_id: str | None = None
+    stream_snapshots: dict[str, str] = field(default_factory=lambda: cast("dict[str, str]", {}))
+    # Snapshot of each shard of a sharded backup, by shard name
+    shard_snapshots: dict[str, str] = field(default_factory=lambda: cast("dict[str, str]", {}))
+    skipped: bool = False
+    phase_seconds: dict[str, float] = field(default_factory=lambda: cast("dict[str, float]", {}))
+    # Results of the same backup in each mirror repository, by env name
+    mirror_results: dict[str, "BackupResult"] = field(
+        default_factory=lambda: cast("dict[str, BackupResult]", {})
+    )
 
 
 @dataclass
@@ -40,9 +92,33 @@ class BackupPlan:
 
     service_name: str
     scales_down: bool
+    quiesce: str | None
     paths_count: int
     pvcs_count: int
     tags: list[str]
+    weight: int = 1
+    snapshot: str | None = None
+    streams_count: int = 0
+    sharding: str | None = None
+    deferred: list[str] = field(default_factory=lambda: cast("list[str]", []))
+
+
+@dataclass(frozen=True)
+class BackupOptions:
+    """Run-wide switches for BackupOrchestrator."""
+
+    # Resume deployments in the background and join them in `join_scale_ups()`
+    async_scale_up: bool = False
+    # Skip services whose targets did not change since their last backup
+    change_index: ChangeIndex | None = None
+    # Copy snapshots from this repository instead of backing up the sources
+    replicate_from: ResticRunner | None = None
+    # Further repositories (by env name) written within the same quiesce window
+    mirrors: Mapping[str, ResticRunner] = field(
+        default_factory=lambda: cast("dict[str, ResticRunner]", {})
+    )
+    # Back up weekly/monthly targets only when due (otherwise they always are)
+    schedule: TargetSchedule | None = None
 
 
 class BackupOrchestrator:
@@ -54,11 +130,31 @@ class BackupOrchestrator:
         restic: ResticRunner,
         kubernetes: KubernetesController,
         path_resolver: PathResolver,
+        options: BackupOptions | None = None,
     ):
+        options = options or BackupOptions()
         self.config = config
         self.restic = restic
         self.kubernetes = kubernetes
         self.path_resolver = path_resolver
+        self.scaler = DeploymentScaler(kubernetes)
+        self.pod_freezer = PodFreezer(kubernetes, CgroupFreezer(dry_run=restic.dry_run))
+        self.hooks = HookQuiescer(kubernetes, dry_run=restic.dry_run)
+        self.async_scale_up = options.async_scale_up
+        self.change_index = options.change_index
+        self.replicator = (
+            SnapshotReplicator(options.replicate_from, restic)
+            if options.replicate_from is not None
+            else None
+        )
+        self.mirrors = dict(options.mirrors)
+        self.schedule = options.schedule
+        self.tsdb_snapshotter = PrometheusSnapshotter(
+            kubernetes, path_resolver, config.paths.mount_root, dry_run=restic.dry_run
+        )
+        self._pending_scale_ups: dict[str, asyncio.Task[list[str]]] = {}
+        # TSDB snapshots taken for backups in progress, removed once they finish
+        self._tsdb_snapshots: dict[str, TsdbSnapshot] = {}
 
     def get_backup_services(self, service_arg: str) -> list[ServiceConfig]:
         """Get list of services to backup based on argument."""
@@ -69,12 +165,24 @@ class BackupOrchestrator:
     def create_backup_plan(self, svc: ServiceConfig) -> BackupPlan:
         """Create a backup plan for a service."""
         kubernetes = svc.backup.kubernetes
+        scales_down = (
+            kubernetes is not None
+            and (len(kubernetes.deployments) > 0 or kubernetes.detect_writers)
+            and not svc.backup.quiesce_hooks
+        )
+        quiesce = "hooks" if svc.backup.quiesce_hooks else svc.backup.quiesce
         return BackupPlan(
             service_name=svc.name,
-            scales_down=kubernetes is not None and len(kubernetes.deployments) > 0,
+            scales_down=scales_down,
+            quiesce=quiesce if scales_down or svc.backup.quiesce_hooks else None,
             paths_count=len(svc.backup.paths),
             pvcs_count=len(kubernetes.pvcs) if kubernetes else 0,
             tags=list(svc.backup.tags),
+            weight=svc.backup.weight,
+            snapshot=svc.backup.snapshot.provider if svc.backup.snapshot else None,
+            streams_count=len(stream_sources(svc)),
+            sharding=svc.backup.sharding.by if svc.backup.sharding else None,
+            deferred=self._deferred_targets(svc),
         )
 
     async def backup_service(self, svc: ServiceConfig) -> BackupResult:
@@ -83,86 +191,536 @@ class BackupOrchestrator:
 
         Handles:
         - Path resolution
-        - Kubernetes deployment scaling (if configured)
+        - Change detection (if a change index is set): services without stream
+          sources whose targets match the last successful backup are skipped
+          before anything is quiesced
+        - Stream sources (if configured), piped straight into restic while the
+          service is still running
+        - Quiescing the service: with its application hooks when configured,
+          otherwise by scaling its Kubernetes deployments to zero or freezing their
+          pods' cgroups
+        - Point-in-time snapshot (if configured), after which deployments are
+          resumed straight away and restic reads from the frozen view
         - Restic backup execution
-        - Retention policy application
-        """
-        dry_run_prefix = "[dry-run] " if self.restic.dry_run else ""
 
-        paths, invalid = await self._prepare_backup_paths(svc, dry_run_prefix)
-        if invalid is not None:
-            return invalid
+        The time spent in each phase is recorded in `BackupResult.phase_seconds`.
+        Retention is applied separately by `apply_retention()` once deployments are
+        back up, so forget/prune never extends the service downtime.
+
+        With `BackupOptions.mirrors` set, every restic backup also runs against each
+        mirror repository, concurrently and within the same quiesce window; the
+        mirror outcomes are recorded in `BackupResult.mirror_results`.
 
-        deployment_scales: list[DeploymentScale] = []
+        With `BackupOptions.replicate_from` set, the service's new snapshots are
+        copied from that repository instead (see `_replicate_service()`).
 
+        A Prometheus TSDB snapshot taken for the backup is removed once it is done.
+        """
         try:
-            deployment_scales = await self._scale_down_kubernetes_deployments(svc)
+            return await self._backup_service(svc)
+        finally:
+            tsdb_snapshot = self._tsdb_snapshots.pop(svc.name, None)
+            if tsdb_snapshot is not None:
+                await self.tsdb_snapshotter.remove(tsdb_snapshot)
 
-            # Run backup
-            logger.info("Running restic backup...")
-            status = await self.restic.backup(paths, svc.backup.tags, svc.backup.exclude)
+    async def _backup_service(self, svc: ServiceConfig) -> BackupResult:
+        """Back up a single service (see `backup_service()`)."""
+        dry_run_prefix = "[dry-run] " if self.restic.dry_run else ""
+        if self.replicator is not None:
+            return await self._replicate_service(svc, self.replicator, dry_run_prefix)
 
-            if status != 0:
-                return BackupResult(
+        deferred = self._deferred_targets(svc)
+        targets, invalid = await self._prepare_backup_targets(svc, dry_run_prefix, deferred)
+        if invalid is not None:
+            return self._with_mirror_results(invalid)
+
+        phases: dict[str, float] = {}
+        digests: dict[str, TreeDigest] | None = None
+        if self.change_index is not None and targets and not stream_sources(svc):
+            with _phase(phases, "scan"):
+                digests = await self._scan_for_changes(
+                    svc, self.change_index, list(targets.values())
+                )
+            if digests is not None and await self.change_index.unchanged(svc.name, digests):
+                skipped = BackupResult(
                     service_name=svc.name,
-                    success=False,
-                    exit_code=EXIT_RESTIC_ERROR,
-                    message=f"{dry_run_prefix}Backup failed for {svc.name} (exit code {status})",
-                    paths_backed_up=paths,
+                    success=True,
+                    exit_code=EXIT_SUCCESS,
+                    message=f"{dry_run_prefix}No changes in {svc.name} since its last backup",
+                    skipped=True,
+                    phase_seconds=phases,
                 )
+                return self._with_mirror_results(skipped)
 
-            # Run forget if policy defined
-            forget_status = None
-            if svc.backup.policy is not None:
-                logger.info("Running restic forget with retention policy...")
-                forget_status = await self.restic.forget(svc.backup.tags, svc.backup.policy)
+        stream_runs: list[tuple[dict[str, str], list[str]]] = []
+        if stream_sources(svc):
+            with _phase(phases, "streams"):
+                stream_runs = await asyncio.gather(
+                    *(self._run_stream_backups(svc, restic) for restic in self._runners())
+                )
 
-            return BackupResult(
+        if targets:
+            result = await self._backup_paths(svc, targets, dry_run_prefix, phases)
+        else:
+            result = BackupResult(
                 service_name=svc.name,
                 success=True,
                 exit_code=EXIT_SUCCESS,
                 message=f"{dry_run_prefix}Backup completed for {svc.name}",
-                paths_backed_up=paths,
-                forget_status=forget_status,
             )
 
+        results = [result, *self._with_mirror_results(result).mirror_results.values()]
+        _apply_stream_runs(svc, results, stream_runs, dry_run_prefix)
+        result.phase_seconds = phases
+        if all(repo_result.success for repo_result in results) and not self.restic.dry_run:
+            if digests is not None and self.change_index is not None:
+                await self.change_index.save(svc.name, digests)
+            if self.schedule is not None:
+                await self.schedule.record(svc.name, scheduled_targets(svc, deferred))
+        return result
+
+    def _deferred_targets(self, svc: ServiceConfig) -> list[str]:
+        """Return the targets of a service left out of this run by their frequency class."""
+        if self.schedule is not None:
+            return self.schedule.deferred(svc)
+        return [
+            target
+            for target, target_class in svc.backup.target_classes.items()
+            if target_class.frequency == "never"
+        ]
+
+    async def _replicate_service(
+        self, svc: ServiceConfig, replicator: SnapshotReplicator, dry_run_prefix: str
+    ) -> BackupResult:
+        """Copy snapshots of a service the target repository lacks; skip it if none."""
+        try:
+            missing = await replicator.missing_snapshots(svc)
+        except ResticError as error:
+            return BackupResult(
+                service_name=svc.name,
+                success=False,
+                exit_code=EXIT_RESTIC_ERROR,
+                message=f"{dry_run_prefix}Replication failed for {svc.name}: {error}",
+            )
+
+        if not missing:
+            return BackupResult(
+                service_name=svc.name,
+                success=True,
+                exit_code=EXIT_SUCCESS,
+                message=f"{dry_run_prefix}{svc.name} is already replicated",
+                skipped=True,
+            )
+
+        status = await replicator.copy(missing)
+        if status != 0:
+            return BackupResult(
+                service_name=svc.name,
+                success=False,
+                exit_code=EXIT_RESTIC_ERROR,
+                message=f"{dry_run_prefix}Replication failed for {svc.name} (exit code {status})",
+            )
+
+        return BackupResult(
+            service_name=svc.name,
+            success=True,
+            exit_code=EXIT_SUCCESS,
+            message=f"{dry_run_prefix}Replicated {len(missing)} snapshot(s) of {svc.name}",
+        )
+
+    async def _scan_for_changes(
+        self, svc: ServiceConfig, change_index: ChangeIndex, paths: list[str]
+    ) -> dict[str, TreeDigest] | None:
+        """Digest the backup targets, or return None (back up anyway) if scanning fails."""
+        metadata_path = str(self._backup_metadata_path(svc.name))
+        try:
+            return await change_index.scan([path for path in paths if path != metadata_path])
+        except OSError as error:
+            logger.warning("Change detection failed for %s: %s", svc.name, error)
+            return None
+
+    async def _backup_paths(
+        self,
+        svc: ServiceConfig,
+        targets: dict[str, str],
+        dry_run_prefix: str,
+        phases: dict[str, float],
+    ) -> BackupResult:
+        """
+        Quiesce the service, optionally snapshot the paths, resume it and run restic.
+
+        `targets` maps each path as recorded in the snapshot to the host path it is
+        read from (see `_prepare_backup_targets()`).
+        """
+        paths = list(targets)
+        resume: Resume | None = None
+        scale_up_errors: list[str] = []
+        resumed = False
+        view: FrozenView | None = None
+
+        try:
+            with _phase(phases, "quiesce"):
+                resume = await self._quiesce_service(svc)
+
+            if svc.backup.snapshot is not None:
+                with _phase(phases, "snapshot"):
+                    view = await self._freeze_paths(
+                        svc, svc.backup.snapshot, list(targets.values())
+                    )
+                with _phase(phases, "resume"):
+                    resumed = True
+                    scale_up_errors = await self._resume_service(svc, resume)
+
+            with _phase(phases, "backup"):
+                result = await self._run_restic_backup(svc, targets, dry_run_prefix, view)
+        except QuiesceHookError as error:
+            result = BackupResult(
+                service_name=svc.name,
+                success=False,
+                exit_code=EXIT_CONFIG_ERROR,
+                message=f"{dry_run_prefix}Quiesce failed for {svc.name}: {error}",
+                paths_backed_up=paths,
+            )
+        except SnapshotError as error:
+            result = BackupResult(
+                service_name=svc.name,
+                success=False,
+                exit_code=EXIT_CONFIG_ERROR,
+                message=f"{dry_run_prefix}Snapshot failed for {svc.name}: {error}",
+                paths_backed_up=paths,
+            )
         finally:
-            await self._restore_kubernetes_deployments(deployment_scales)
-
-    async def _prepare_backup_paths(
-        self, svc: ServiceConfig, dry_run_prefix: str
-    ) -> tuple[list[str], BackupResult | None]:
-        """Run preparation commands, resolve targets, and write metadata."""
-        pre_backup_status = await self._run_pre_backup_commands(svc)
-        if pre_backup_status != 0:
-            return [], BackupResult(
+            if not resumed:
+                with _phase(phases, "resume"):
+                    scale_up_errors = await self._resume_service(svc, resume)
+            if view is not None:
+                await view.release()
+
+        result.scale_up_errors = scale_up_errors
+        return result
+
+    def _with_mirror_results(self, result: BackupResult) -> BackupResult:
+        """Give mirrors no restic backup ran for (e.g. quiesce failed) the primary's outcome."""
+        result.mirror_results = {
+            env: result.mirror_results.get(env) or replace(result, mirror_results={})
+            for env in self.mirrors
+        }
+        return result
+
+    def _runners(self) -> list[ResticRunner]:
+        """Return the primary restic runner followed by the mirror runners."""
+        return [self.restic, *self.mirrors.values()]
+
+    async def _run_stream_backups(
+        self, svc: ServiceConfig, restic: ResticRunner
+    ) -> tuple[dict[str, str], list[str]]:
+        """
+        Back up each stream source's stdout with restic, one snapshot per source.
+
+        Returns the snapshot ID of each successful source (by name) and the failures.
+        """
+        kubernetes = svc.backup.kubernetes
+        snapshots: dict[str, str] = {}
+        failures: list[str] = []
+        for stream in stream_sources(svc):
+            command = stream.command
+            if stream.deployment is not None:
+                if kubernetes is None:
+                    failures.append(f"{stream.name} (no Kubernetes namespace)")
+                    continue
+                command = self.kubernetes.exec_command(
+                    kubernetes.namespace,
+                    stream.deployment,
+                    stream.command,
+                    container=stream.container,
+                )
+
+            logger.info("Streaming %s into restic as %s...", stream.name, stream.filename)
+            backup = await restic.backup_stdin(command, stream.filename, svc.backup.tags)
+            if backup.returncode != 0:
+                failures.append(f"{stream.name} (exit code {backup.returncode})")
+            elif backup.snapshot_id is not None:
+                snapshots[stream.name] = backup.snapshot_id
+        return snapshots, failures
+
+    async def _freeze_paths(
+        self, svc: ServiceConfig, snapshot: SnapshotConfig, paths: list[str]
+    ) -> FrozenView:
+        """Create point-in-time views of all backup targets (not the metadata file)."""
+        metadata_path = str(self._backup_metadata_path(svc.name))
+        view = FrozenView(svc.name, snapshot, dry_run=self.restic.dry_run)
+        await view.freeze([path for path in paths if path != metadata_path])
+        return view
+
+    async def join_scale_ups(self) -> dict[str, list[str]]:
+        """
+        Wait for background scale-ups started in async scale-up mode.
+
+        Returns a mapping of service name to the scale-up failures of that service;
+        services that came back cleanly are omitted.
+        """
+        pending = self._pending_scale_ups
+        self._pending_scale_ups = {}
+        if not pending:
+            return {}
+
+        logger.info("Waiting for %s service(s) to finish scaling up...", len(pending))
+        outcomes = await asyncio.gather(*pending.values(), return_exceptions=True)
+
+        failures: dict[str, list[str]] = {}
+        for name, outcome in zip(pending, outcomes, strict=True):
+            if isinstance(outcome, BaseException):
+                failures[name] = [str(outcome) or type(outcome).__name__]
+            elif outcome:
+                failures[name] = outcome
+        return failures
+
+    async def _run_restic_backup(
+        self,
+        svc: ServiceConfig,
+        targets: dict[str, str],
+        dry_run_prefix: str,
+        view: FrozenView | None = None,
+    ) -> BackupResult:
+        """
+        Run restic backup for resolved targets (or their frozen views) and build the result.
+
+        Every target whose snapshot path differs from where its data is read (a PVC
+        alias or a frozen view) is bind-mounted into place for restic, so snapshot
+        paths (and with them restic's parent snapshot) survive PV moves.
+
+        The primary and mirror repositories are backed up concurrently from the
+        same sources, so the service is quiesced only once for all of them.
+
+        With sharding configured, the targets are split into shards first and each
+        shard is written as a snapshot of its own (see `_run_sharded_backup()`).
+        """
+        paths = list(targets)
+        views = view.views if view is not None else {}
+        bind_mounts = {
+            path: views.get(source, source)
+            for path, source in targets.items()
+            if path != source or source in views
+        }
+        ignore_inode = view is not None and not view.stable_inodes
+        if svc.backup.sharding is not None:
+            shards = await asyncio.to_thread(plan_shards, targets, views, svc.backup.sharding.by)
+            shard_backups = await self._run_sharded_backup(svc, shards, bind_mounts, ignore_inode)
+            result, *mirror_results = (
+                _sharded_backup_result(svc, paths, shards, backups, dry_run_prefix)
+                for backups in shard_backups
+            )
+            result.mirror_results = dict(zip(self.mirrors, mirror_results, strict=True))
+            return result
+
+        logger.info("Running restic backup in %s repositories...", len(self._runners()))
+        backups = await asyncio.gather(
+            *(
+                restic.backup(
+                    paths,
+                    svc.backup.tags,
+                    svc.backup.exclude,
+                    bind_mounts=bind_mounts,
+                    ignore_inode=ignore_inode,
+                )
+                for restic in self._runners()
+            )
+        )
+        result, *mirror_results = (
+            _restic_backup_result(svc, paths, backup, dry_run_prefix) for backup in backups
+        )
+        result.mirror_results = dict(zip(self.mirrors, mirror_results, strict=True))
+        return result
+
+    async def _run_sharded_backup(
+        self,
+        svc: ServiceConfig,
+        shards: list[Shard],
+        bind_mounts: Mapping[str, str],
+        ignore_inode: bool,
+    ) -> list[list[ResticBackupResult]]:
+        """
+        Back up each shard as a snapshot of its own in every repository.
+
+        At most `sharding.jobs` restic processes run at once. Each shard snapshot
+        carries its shard tag, so its parent is the previous snapshot of the same
+        shard, and the group tag of this run, which is how restore finds the other
+        shards of a snapshot. Returns the shard results per repository.
+        """
+        jobs = svc.backup.sharding.jobs if svc.backup.sharding else 1
+        limit = asyncio.Semaphore(jobs)
+        group_tag = f"{GROUP_TAG_PREFIX}{uuid.uuid4().hex[:16]}"
+
+        async def backup_shard(restic: ResticRunner, shard: Shard) -> ResticBackupResult:
+            async with limit:
+                logger.info("Backing up shard %s...", shard.name)
+                return await restic.backup(
+                    shard.paths,
+                    [*svc.backup.tags, shard.tag, group_tag],
+                    svc.backup.exclude,
+                    bind_mounts={
+                        path: source for path, source in bind_mounts.items() if path == shard.target
+                    },
+                    ignore_inode=ignore_inode,
+                )
+
+        logger.info(
+            "Running sharded restic backup: %s shard(s), %s at a time...", len(shards), jobs
+        )
+        return [
+            list(await asyncio.gather(*(backup_shard(restic, shard) for shard in shards)))
+            for restic in self._runners()
+        ]
+
+    async def apply_retention(
+        self,
+        completed: Sequence[tuple[ServiceConfig, BackupResult]],
+        restic: ResticRunner | None = None,
+    ) -> tuple[int, float] | None:
+        """
+        Forget expired snapshots for successful backups, then prune once.
+
+        Each service is forgotten by its own restic call with its own tags and
+        policy, and the repository is pruned in one pass at the end of the run. The
+        forget status of each service and the shared prune status/duration are
+        recorded on its BackupResult. Returns (prune_status, prune_seconds), or None
+        if nothing was pruned.
+
+        Retention runs against the primary repository unless another runner is given
+        (e.g. a mirror's, together with the mirror results).
+        """
+        restic = restic or self.restic
+        forgotten: list[BackupResult] = []
+        for svc, result in completed:
+            policy = svc.backup.policy
+            if not result.success or result.skipped or policy is None:
+                continue
+            logger.info("Running restic forget with retention policy for %s...", svc.name)
+            result.forget_status = await restic.forget(svc.backup.tags, policy)
+            if result.forget_status == 0:
+                forgotten.append(result)
+
+        if not forgotten:
+            return None
+
+        logger.info("Running restic prune...")
+        started = time.monotonic()
+        prune_status = await restic.prune()
+        prune_seconds = time.monotonic() - started
+        if restic.dry_run:
+            return None
+        for result in forgotten:
+            result.prune_status = prune_status
+            result.prune_seconds = prune_seconds
+
+        return prune_status, prune_seconds
+
+    async def _prepare_backup_targets(
+        self, svc: ServiceConfig, dry_run_prefix: str, deferred: Sequence[str]
+    ) -> tuple[dict[str, str], BackupResult | None]:
+        """
+        Run preparation commands, resolve targets, and write metadata.
+
+        Returns the targets as a mapping of the path recorded in the snapshot to the
+        host path holding the data. PVCs are recorded under a stable per-service
+        path (`stable_pvc_path()`) rather than their PV directory, which changes
+        whenever the volume is recreated or migrated.
+
+        Kubernetes PVCs are resolved while the commands run; plain paths are only
+        checked afterwards, since the commands may create them.
+
+        Once the commands succeed, built-in sources take their snapshots (k3s
+        etcd, Prometheus TSDB) and add them to the targets.
+
+        `deferred` targets (by frequency class) are left out, and regenerable
+        targets that do not exist are dropped instead of failing the backup.
+        """
+        kubernetes = svc.backup.kubernetes
+        pre_backup_status, pvcs = await asyncio.gather(
+            self._run_pre_backup_commands(svc),
+            self.path_resolver.resolve_kubernetes_pvcs(
+                kubernetes.namespace if kubernetes else "",
+                [pvc for pvc in kubernetes.pvcs if pvc not in deferred] if kubernetes else [],
+            ),
+            return_exceptions=True,
+        )
+        if isinstance(pre_backup_status, BaseException):
+            raise pre_backup_status
+        if isinstance(pvcs, BaseException):
+            raise pvcs
+        etcd_snapshot, tsdb_snapshot = None, None
+        error: str | None = f"Pre-backup command failed for {svc.name}"
+        if pre_backup_status == 0:
+            etcd_snapshot, tsdb_snapshot, error = await self._take_source_snapshots(svc)
+        if error is not None:
+            return {}, BackupResult(
                 service_name=svc.name,
                 success=False,
                 exit_code=EXIT_CONFIG_ERROR,
-                message=f"{dry_run_prefix}Pre-backup command failed for {svc.name}",
+                message=f"{dry_run_prefix}{error}",
             )
 
-        resolved, missing = await self.path_resolver.resolve_all(
-            svc.backup.paths, svc.backup.kubernetes
+        resolved = await self.path_resolver.resolve_paths(
+            [
+                path
+                for path in [*svc.backup.paths, *_k3s_etcd_paths(etcd_snapshot)]
+                if path not in deferred
+            ]
         )
+        resolved.extend(pvcs)
+        if tsdb_snapshot is not None:
+            resolved.append(tsdb_snapshot.target)
+        resolved = drop_missing_regenerable(svc, resolved)
+        if not resolved and deferred and not stream_sources(svc):
+            return {}, BackupResult(
+                service_name=svc.name,
+                success=True,
+                exit_code=EXIT_SUCCESS,
+                message=f"{dry_run_prefix}No targets of {svc.name} are due on this run",
+                skipped=True,
+            )
+
         paths = [r.filesystem_path for r in resolved]
-        invalid = self._validate_backup_paths(svc, dry_run_prefix, paths, missing)
+        invalid = self._validate_backup_paths(svc, dry_run_prefix, paths, missing_targets(resolved))
         if invalid is not None:
-            return [], invalid
+            return {}, invalid
+        if not paths:
+            return {}, None
 
+        return self._targets_with_metadata(svc, resolved, etcd_snapshot, tsdb_snapshot)
+
+    def _targets_with_metadata(
+        self,
+        svc: ServiceConfig,
+        resolved: list[ResolvedPath],
+        etcd_snapshot: Path | None,
+        tsdb_snapshot: TsdbSnapshot | None,
+    ) -> tuple[dict[str, str], BackupResult | None]:
+        """Map resolved targets to their snapshot paths, adding the metadata file."""
+        targets = {self._snapshot_path(svc.name, r): r.filesystem_path for r in resolved}
+        # The TSDB PVC is restored as a whole, so the metadata lists it like any PVC
+        metadata_targets = [*resolved, *([tsdb_snapshot.pvc] if tsdb_snapshot else [])]
         try:
-            metadata_path = self._write_kubernetes_backup_metadata(svc, resolved)
+            metadata_path = self._write_backup_metadata(svc, metadata_targets, etcd_snapshot)
         except OSError as error:
-            return [], BackupResult(
+            return {}, BackupResult(
                 service_name=svc.name,
                 success=False,
                 exit_code=EXIT_CONFIG_ERROR,
-                message=f"Failed to write Kubernetes backup metadata: {error}",
+                message=f"Failed to write backup metadata: {error}",
             )
         if metadata_path is not None:
-            paths.append(metadata_path)
+            targets[metadata_path] = metadata_path
 
-        return paths, None
+        return targets, None
+
+    def _snapshot_path(self, service_name: str, resolved: ResolvedPath) -> str:
+        """Return the path a resolved target is recorded under in the snapshot."""
+        if resolved.source_type == TSDB_SNAPSHOT_SOURCE:
+            return resolved.source_name
+        if resolved.source_type != "kubernetes-pvc":
+            return resolved.filesystem_path
+        return stable_pvc_path(self.config.paths.mount_root, service_name, resolved.source_name)
 
     def _validate_backup_paths(
         self,
@@ -172,7 +730,7 @@ class BackupOrchestrator:
         missing: list[str],
     ) -> BackupResult | None:
         """Validate resolved backup paths."""
-        if not paths:
+        if not paths and not stream_sources(svc):
             return BackupResult(
                 service_name=svc.name,
                 success=False,
@@ -192,33 +750,92 @@ class BackupOrchestrator:
         return None
 
     async def _run_pre_backup_commands(self, svc: ServiceConfig) -> int:
-        """Run commands configured to prepare backup targets."""
-        for command in svc.backup.pre_backup_commands:
-            if not command:
-                continue
-
-            logger.info("Running pre-backup command: %s", " ".join(command))
-            if self.restic.dry_run:
-                continue
+        """
+        Run commands configured to prepare backup targets.
 
-            proc = await asyncio.create_subprocess_exec(*command)
-            await proc.wait()
-            if proc.returncode != 0:
-                return proc.returncode or 1
+        Consecutive commands marked `parallel` run concurrently; any other command
+        runs on its own once everything before it has finished. A command that
+        outlives its timeout is killed with its whole process group. Returns the
+        first non-zero exit code, or 0.
+        """
+        for group in _command_groups(svc.backup.pre_backup_commands):
+            statuses = await asyncio.gather(
+                *(self._run_pre_backup_command(command) for command in group)
+            )
+            failed = [status for status in statuses if status != 0]
+            if failed:
+                return failed[0]
 
         return 0
 
-    def _write_kubernetes_backup_metadata(
-        self, svc: ServiceConfig, resolved: list[ResolvedPath]
+    async def _run_pre_backup_command(self, command: PreBackupCommand) -> int:
+        """Run one pre-backup command and return its exit code."""
+        if not command.command:
+            return 0
+
+        logger.info("Running pre-backup command: %s", " ".join(command.command))
+        if self.restic.dry_run:
+            return 0
+
+        result = await run_process(command.command, command.timeout_seconds)
+        return result.returncode
+
+    async def _take_source_snapshots(
+        self, svc: ServiceConfig
+    ) -> tuple[Path | None, TsdbSnapshot | None, str | None]:
+        """Take the snapshots of built-in sources (k3s etcd, Prometheus TSDB)."""
+        etcd_snapshot, error = await self._take_k3s_etcd_snapshot(svc)
+        if error is not None:
+            return None, None, error
+        tsdb_snapshot, error = await self._take_tsdb_snapshot(svc)
+        return etcd_snapshot, tsdb_snapshot, error
+
+    async def _take_tsdb_snapshot(
+        self, svc: ServiceConfig
+    ) -> tuple[TsdbSnapshot | None, str | None]:
+        """Take the TSDB snapshot of the Prometheus source, if the service has one."""
+        source = svc.backup.prometheus_snapshot
+        if source is None:
+            return None, None
+        if svc.backup.kubernetes is None:
+            return None, f"prometheusSnapshot of {svc.name} needs a Kubernetes namespace"
+
+        snapshot, error = await self.tsdb_snapshotter.snapshot(
+            svc.name, svc.backup.kubernetes.namespace, source
+        )
+        if snapshot is not None:
+            self._tsdb_snapshots[svc.name] = snapshot
+        return snapshot, error
+
+    async def _take_k3s_etcd_snapshot(self, svc: ServiceConfig) -> tuple[Path | None, str | None]:
+        """Take the etcd snapshot of the built-in k3s source, if the service has one."""
+        source = svc.backup.k3s_etcd
+        if source is None:
+            return None, None
+        return await K3sEtcdSnapshotter(source, dry_run=self.restic.dry_run).snapshot()
+
+    def _write_backup_metadata(
+        self, svc: ServiceConfig, resolved: list[ResolvedPath], etcd_snapshot: Path | None
     ) -> str | None:
-        """Write metadata needed to restore PVCs whose backing paths later change."""
+        """
+        Write metadata restores need but cannot derive from the snapshot paths.
+
+        That is where PVCs whose backing paths later change were recorded, and
+        which etcd snapshot file the k3s source took.
+        """
         kubernetes = svc.backup.kubernetes
-        if kubernetes is None or self.restic.dry_run:
+        if (kubernetes is None and etcd_snapshot is None) or self.restic.dry_run:
             return None
 
         metadata_path = self._backup_metadata_path(svc.name)
         metadata_path.parent.mkdir(parents=True, mode=0o700, exist_ok=True)
-        metadata = self._kubernetes_backup_metadata(svc.name, kubernetes, resolved)
+        metadata: dict[str, object] = {"version": 1, "service": svc.name}
+        if kubernetes is not None:
+            metadata["kubernetes"] = self._kubernetes_backup_metadata(
+                svc.name, kubernetes, resolved
+            )
+        if etcd_snapshot is not None:
+            metadata["k3s"] = {"etcdSnapshot": str(etcd_snapshot)}
         metadata_path.write_text(json.dumps(metadata, indent=2, sort_keys=True))
         metadata_path.chmod(0o600)
         return str(metadata_path)
@@ -233,7 +850,7 @@ class BackupOrchestrator:
         kubernetes: KubernetesBackupConfig,
         resolved: list[ResolvedPath],
     ) -> dict[str, object]:
-        """Build snapshot metadata for Kubernetes backup targets."""
+        """Build the Kubernetes section of the backup metadata."""
         pvc_entries: list[dict[str, str]] = []
         for item in resolved:
             if item.source_type != "kubernetes-pvc":
@@ -245,67 +862,194 @@ class BackupOrchestrator:
                     "namespace": namespace,
                     "name": pvc,
                     "source": item.source_name,
-                    "path": item.filesystem_path,
+                    "path": self._snapshot_path(service_name, item),
+                    "hostPath": item.filesystem_path,
                 }
             )
 
         return {
-            "version": 1,
-            "service": service_name,
-            "kubernetes": {
-                "namespace": kubernetes.namespace,
-                "deployments": list(kubernetes.deployments),
-                "pvcs": pvc_entries,
-            },
+            "namespace": kubernetes.namespace,
+            "deployments": list(kubernetes.deployments),
+            "pvcs": pvc_entries,
         }
 
-    async def _scale_down_kubernetes_deployments(
-        self, svc: ServiceConfig
-    ) -> list[DeploymentScale]:
-        """Scale configured Kubernetes deployments to zero for a consistent backup."""
+    async def _quiesce_service(self, svc: ServiceConfig) -> Resume | None:
+        """
+        Quiesce the service and return how to resume it.
+
+        Application hooks, when configured, replace stopping the deployments: the
+        pods keep serving while the hooks hold their data consistent.
+        """
+        if svc.backup.quiesce_hooks:
+            namespace = svc.backup.kubernetes.namespace if svc.backup.kubernetes else None
+            quiesced = await self.hooks.quiesce(svc.backup.quiesce_hooks, namespace)
+            return partial(self.hooks.unquiesce, quiesced)
+
+        kubernetes = await self.quiesced_deployments(svc)
+        if kubernetes is None or not kubernetes.deployments:
+            return None
+
+        if svc.backup.quiesce == "freeze":
+            cgroups = await self.pod_freezer.freeze(kubernetes)
+            return partial(self.pod_freezer.thaw, cgroups)
+
+        deployment_scales = await self.scaler.scale_down(kubernetes)
+        return partial(self.scaler.restore, deployment_scales, kubernetes.depends_on)
+
+    async def quiesced_deployments(self, svc: ServiceConfig) -> KubernetesBackupConfig | None:
+        """
+        Return the Kubernetes config whose deployments are stopped for a backup.
+
+        With `detectWriters`, the configured deployment list is replaced by the
+        namespace's deployments whose pod templates mount one of the service's PVCs
+        read-write; `dependsOn` still orders those among each other.
+        """
         kubernetes = svc.backup.kubernetes
-        if kubernetes is None:
+        if kubernetes is None or not kubernetes.detect_writers:
+            return kubernetes
+
+        writers = await self.kubernetes.pvc_writers(kubernetes.namespace, kubernetes.pvcs)
+        logger.info(
+            "Writers of %s in %s: %s",
+            ", ".join(kubernetes.pvcs),
+            kubernetes.namespace,
+            ", ".join(writers) or "none",
+        )
+        return validate_model(
+            KubernetesBackupConfig,
+            {
+                "namespace": kubernetes.namespace,
+                "deployments": writers,
+                "pvcs": kubernetes.pvcs,
+                "dependsOn": {
+                    name: [dep for dep in deps if dep in writers]
+                    for name, deps in kubernetes.depends_on.items()
+                    if name in writers
+                },
+            },
+        )
+
+    async def _resume_service(self, svc: ServiceConfig, resume: Resume | None) -> list[str]:
+        """
+        Resume a quiesced service, in the background when async scale-up is enabled.
+
+        In async mode the readiness wait is tracked in `_pending_scale_ups` and joined
+        by `join_scale_ups()`, so the next service can start backing up immediately.
+        """
+        if resume is None:
+            return []
+        if self.async_scale_up:
+            self._pending_scale_ups[svc.name] = asyncio.create_task(
+                resume(), name=f"scale-up:{svc.name}"
+            )
             return []
+        return await resume()
 
-        original_scales: list[DeploymentScale] = []
-        try:
-            for deployment in kubernetes.deployments:
-                scale = await self.kubernetes.deployment_scale(kubernetes.namespace, deployment)
-                original_scales.append(scale)
-                if scale.replicas == 0:
-                    continue
 
-                await self.kubernetes.scale_deployment(scale, 0)
-                await self.kubernetes.wait_for_deployment_replicas(
-                    scale.namespace,
-                    scale.name,
-                    0,
-                )
-        except KubernetesError:
-            await self._restore_kubernetes_deployments(original_scales)
-            raise
-
-        return original_scales
-
-    async def _restore_kubernetes_deployments(
-        self, deployment_scales: list[DeploymentScale]
-    ) -> None:
-        """Restore Kubernetes deployments to their original replica counts."""
-        for scale in reversed(deployment_scales):
-            if scale.replicas == 0:
-                continue
+@contextmanager
+def _phase(phases: dict[str, float], name: str) -> Generator[None, None, None]:
+    """Record the wall-clock duration of a backup phase."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.monotonic() - started
 
-            try:
-                await self.kubernetes.scale_deployment(scale, scale.replicas)
-                await self.kubernetes.wait_for_deployment_replicas(
-                    scale.namespace,
-                    scale.name,
-                    scale.replicas,
-                )
-            except KubernetesError as error:
-                logger.warning(
-                    "Failed to restore deployment/%s in %s: %s",
-                    scale.name,
-                    scale.namespace,
-                    error,
-                )
+
+def _apply_stream_runs(
+    svc: ServiceConfig,
+    results: list[BackupResult],
+    stream_runs: list[tuple[dict[str, str], list[str]]],
+    dry_run_prefix: str,
+) -> None:
+    """Record each repository's stream snapshots and fail it if a stream failed."""
+    # stream_runs is empty for services without stream sources
+    for repo_result, (snapshots, failures) in zip(results, stream_runs, strict=False):
+        repo_result.stream_snapshots = snapshots
+        if failures and repo_result.success:
+            repo_result.success = False
+            repo_result.exit_code = EXIT_RESTIC_ERROR
+            repo_result.message = (
+                f"{dry_run_prefix}Stream backup failed for {svc.name}: " + ", ".join(failures)
+            )
+
+
+def _k3s_etcd_paths(etcd_snapshot: Path | None) -> list[str]:
+    """Return the paths the k3s source backs up: the etcd snapshot and the token."""
+    if etcd_snapshot is None:
+        return []
+    return [str(etcd_snapshot), K3S_TOKEN_PATH]
+
+
+def _command_groups(commands: Sequence[PreBackupCommand]) -> list[list[PreBackupCommand]]:
+    """Split pre-backup commands into groups that run concurrently, in order."""
+    groups: list[list[PreBackupCommand]] = []
+    for command in commands:
+        if command.parallel and groups and groups[-1][0].parallel:
+            groups[-1].append(command)
+        else:
+            groups.append([command])
+    return groups
+
+
+def _restic_backup_result(
+    svc: ServiceConfig, paths: list[str], backup: ResticBackupResult, dry_run_prefix: str
+) -> BackupResult:
+    """Build the BackupResult of one restic backup run."""
+    if backup.returncode != 0:
+        return BackupResult(
+            service_name=svc.name,
+            success=False,
+            exit_code=EXIT_RESTIC_ERROR,
+            message=(
+                f"{dry_run_prefix}Backup failed for {svc.name} (exit code {backup.returncode})"
+            ),
+            paths_backed_up=paths,
+        )
+
+    return BackupResult(
+        service_name=svc.name,
+        success=True,
+        exit_code=EXIT_SUCCESS,
+        message=f"{dry_run_prefix}Backup completed for {svc.name}",
+        paths_backed_up=paths,
+        snapshot_id=backup.snapshot_id,
+    )
+
+
+def _sharded_backup_result(
+    svc: ServiceConfig,
+    paths: list[str],
+    shards: list[Shard],
+    backups: list[ResticBackupResult],
+    dry_run_prefix: str,
+) -> BackupResult:
+    """Build the BackupResult of a sharded backup in one repository."""
+    failed = [
+        f"{shard.name} (exit code {backup.returncode})"
+        for shard, backup in zip(shards, backups, strict=True)
+        if backup.returncode != 0
+    ]
+    shard_snapshots = {
+        shard.name: backup.snapshot_id
+        for shard, backup in zip(shards, backups, strict=True)
+        if backup.snapshot_id is not None
+    }
+    if failed:
+        return BackupResult(
+            service_name=svc.name,
+            success=False,
+            exit_code=EXIT_RESTIC_ERROR,
+            message=f"{dry_run_prefix}Backup failed for {svc.name} shards: {', '.join(failed)}",
+            paths_backed_up=paths,
+            shard_snapshots=shard_snapshots,
+        )
+
+    return BackupResult(
+        service_name=svc.name,
+        success=True,
+        exit_code=EXIT_SUCCESS,
+        message=f"{dry_run_prefix}Backup completed for {svc.name} ({len(shards)} shards)",
+        paths_backed_up=paths,
+        shard_snapshots=shard_snapshots,
+    )
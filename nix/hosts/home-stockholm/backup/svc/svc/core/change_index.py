@@ -0,0 +1,143 @@
+"""Cheap change detection for backup targets between runs."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections.abc import Mapping, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, cast
+
+logger = logging.getLogger("svc.core.change_index")
+
+INDEX_VERSION = 1
+_DIGEST_MODULUS = 1 << 128
+
+
+@dataclass(frozen=True)
+class TreeDigest:
+    """Order-independent digest of every entry below a backup target."""
+
+    entries: int
+    digest: str
+
+
+def scan_tree(root: str, workers: int = 8) -> TreeDigest:
+    """
+    Digest the name, size, mtime, inode and mode of everything below `root`.
+
+    Directories are scanned in parallel with `os.scandir`. Each entry hashes to a
+    128-bit value and the values are summed, so the digest does not depend on the
+    order in which directories are visited. Symlinks are not followed.
+    """
+    if not Path(root).is_dir():
+        value = _entry_hash(root, Path(root).lstat())
+        return TreeDigest(entries=1, digest=f"{value:032x}")
+
+    total = 0
+    entries = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending: set[Future[tuple[int, int, list[str]]]] = {pool.submit(_scan_dir, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                value, count, subdirs = future.result()
+                total = (total + value) % _DIGEST_MODULUS
+                entries += count
+                pending.update(pool.submit(_scan_dir, subdir) for subdir in subdirs)
+    return TreeDigest(entries=entries, digest=f"{total:032x}")
+
+
+def _scan_dir(path: str) -> tuple[int, int, list[str]]:
+    """Digest the entries of one directory and return its subdirectories."""
+    total = 0
+    count = 0
+    subdirs: list[str] = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            total += _entry_hash(entry.path, entry.stat(follow_symlinks=False))
+            count += 1
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+    return total % _DIGEST_MODULUS, count, subdirs
+
+
+def _entry_hash(path: str, stat: os.stat_result) -> int:
+    """Hash the metadata restic uses to decide whether a file changed."""
+    key = f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0{stat.st_ino}\0{stat.st_mode}"
+    digest = hashlib.blake2b(key.encode(errors="surrogateescape"), digest_size=16).digest()
+    return int.from_bytes(digest)
+
+
+class ChangeIndex:
+    """
+    Per-service target digests from the last successful backup to one restic env.
+
+    Index files live under `<backup_metadata_root>/change-index/<env>/`, outside of
+    anything that is itself backed up.
+    """
+
+    def __init__(self, metadata_root: str, env: str):
+        self.directory = Path(metadata_root) / "change-index" / env
+
+    async def scan(self, paths: Sequence[str]) -> dict[str, TreeDigest]:
+        """Digest every target path concurrently."""
+        digests = await asyncio.gather(*(asyncio.to_thread(scan_tree, path) for path in paths))
+        return dict(zip(paths, digests, strict=True))
+
+    async def unchanged(self, service_name: str, digests: Mapping[str, TreeDigest]) -> bool:
+        """Return True if the targets match the index of the last successful backup."""
+        previous = await asyncio.to_thread(self._load, service_name)
+        return previous is not None and previous == dict(digests)
+
+    async def save(self, service_name: str, digests: Mapping[str, TreeDigest]) -> None:
+        """Record the digests of a successful backup."""
+        await asyncio.to_thread(self._save, service_name, digests)
+
+    def _index_path(self, service_name: str) -> Path:
+        """Return the index file of a service."""
+        return self.directory / f"{service_name}.json"
+
+    def _load(self, service_name: str) -> dict[str, TreeDigest] | None:
+        """Read an index file, treating a missing or unreadable index as absent."""
+        try:
+            raw: Any = json.loads(self._index_path(service_name).read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if not isinstance(raw, dict):
+            return None
+        data = cast("dict[str, Any]", raw)
+        paths: Any = data.get("paths")
+        if data.get("version") != INDEX_VERSION or not isinstance(paths, dict):
+            return None
+
+        digests: dict[str, TreeDigest] = {}
+        for path, entry in cast("dict[str, Any]", paths).items():
+            if not isinstance(entry, dict):
+                return None
+            entry_dict = cast("dict[str, Any]", entry)
+            entries = entry_dict.get("entries")
+            digest = entry_dict.get("digest")
+            if not isinstance(entries, int) or not isinstance(digest, str):
+                return None
+            digests[path] = TreeDigest(entries=entries, digest=digest)
+        return digests
+
+    def _save(self, service_name: str, digests: Mapping[str, TreeDigest]) -> None:
+        """Atomically write an index file."""
+        self.directory.mkdir(parents=True, mode=0o700, exist_ok=True)
+        index = {
+            "version": INDEX_VERSION,
+            "paths": {
+                path: {"entries": digest.entries, "digest": digest.digest}
+                for path, digest in digests.items()
+            },
+        }
+        path = self._index_path(service_name)
+        tmp_path = path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(index, indent=2, sort_keys=True))
+        tmp_path.replace(path)
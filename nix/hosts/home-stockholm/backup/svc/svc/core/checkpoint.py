@@ -0,0 +1,130 @@
+"""Checkpoint journal of the services an `all` backup run has finished."""
+
+import asyncio
+import json
+import logging
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, cast
+
+logger = logging.getLogger("svc.core.checkpoint")
+
+JOURNAL_VERSION = 1
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    """A service that finished backing up, with the snapshots it produced."""
+
+    service_name: str
+    finished_at: datetime
+    # Snapshot IDs by repository env, then by source ("files" or a stream name)
+    snapshots: dict[str, dict[str, str]]
+
+
+class CheckpointJournal:
+    """
+    Per-env journal of the services finished in the current backup run.
+
+    The journal lives at `<backup_metadata_root>/checkpoints/<env>.json` and is
+    rewritten atomically after every finished service, so a run that dies halfway
+    can be resumed from the first incomplete service.
+    """
+
+    def __init__(self, metadata_root: str, env: str):
+        self.path = Path(metadata_root) / "checkpoints" / f"{env}.json"
+        self.checkpoints: dict[str, Checkpoint] = {}
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Begin a new run, discarding the checkpoints of any previous one."""
+        self.checkpoints = {}
+        await asyncio.to_thread(self.path.unlink, missing_ok=True)
+
+    async def resume(self, max_age: timedelta) -> dict[str, Checkpoint]:
+        """
+        Continue the previous run and return its checkpoints younger than `max_age`.
+
+        Older checkpoints are dropped, so their services are backed up again.
+        """
+        cutoff = datetime.now(UTC) - max_age
+        loaded = await asyncio.to_thread(self._load)
+        self.checkpoints = {
+            name: checkpoint
+            for name, checkpoint in loaded.items()
+            if checkpoint.finished_at >= cutoff
+        }
+        if len(self.checkpoints) < len(loaded):
+            logger.info(
+                "Dropping %s checkpoint(s) older than %s",
+                len(loaded) - len(self.checkpoints),
+                max_age,
+            )
+        return dict(self.checkpoints)
+
+    async def record(self, service_name: str, snapshots: Mapping[str, dict[str, str]]) -> None:
+        """Record a finished service."""
+        async with self._lock:
+            self.checkpoints[service_name] = Checkpoint(
+                service_name=service_name,
+                finished_at=datetime.now(UTC),
+                snapshots=dict(snapshots),
+            )
+            await asyncio.to_thread(self._save, dict(self.checkpoints))
+
+    async def finish(self) -> None:
+        """End a run in which every service finished; nothing is left to resume."""
+        await self.start()
+
+    def _load(self) -> dict[str, Checkpoint]:
+        """Read the journal, treating a missing or unreadable journal as empty."""
+        try:
+            raw: Any = json.loads(self.path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+        if not isinstance(raw, dict):
+            return {}
+        data = cast("dict[str, Any]", raw)
+        services: Any = data.get("services")
+        if data.get("version") != JOURNAL_VERSION or not isinstance(services, dict):
+            return {}
+
+        checkpoints: dict[str, Checkpoint] = {}
+        for name, entry in cast("dict[str, Any]", services).items():
+            if not isinstance(entry, dict):
+                continue
+            entry_dict = cast("dict[str, Any]", entry)
+            finished_at: Any = entry_dict.get("finishedAt")
+            snapshots: Any = entry_dict.get("snapshots", {})
+            try:
+                finished = datetime.fromisoformat(finished_at)
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(snapshots, dict):
+                continue
+            checkpoints[name] = Checkpoint(
+                service_name=name,
+                finished_at=finished,
+                snapshots=cast("dict[str, dict[str, str]]", snapshots),
+            )
+        return checkpoints
+
+    def _save(self, checkpoints: Mapping[str, Checkpoint]) -> None:
+        """Atomically write the journal."""
+        self.path.parent.mkdir(parents=True, mode=0o700, exist_ok=True)
+        journal = {
+            "version": JOURNAL_VERSION,
+            "services": {
+                name: {
+                    "finishedAt": checkpoint.finished_at.isoformat(),
+                    "snapshots": checkpoint.snapshots,
+                }
+                for name, checkpoint in checkpoints.items()
+            },
+        }
+        tmp_path = self.path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(journal, indent=2, sort_keys=True))
+        tmp_path.replace(self.path)
@@ -0,0 +1,159 @@
+"""Dependency-aware scaling of Kubernetes deployments around backup and restore."""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Iterable, Mapping, Sequence
+from typing import TypeVar
+
+from ..config import KubernetesBackupConfig
+from ..controllers import DeploymentScale, KubernetesController
+from ..exceptions import ConfigError, KubernetesError
+
+logger = logging.getLogger("svc.core.scaler")
+
+TResult = TypeVar("TResult")
+
+
+def deployment_levels(
+    deployments: Sequence[str], depends_on: Mapping[str, Sequence[str]]
+) -> list[list[str]]:
+    """
+    Group deployments into startup levels.
+
+    Level 0 holds deployments without dependencies; every later level only depends on
+    earlier ones. Dependencies on deployments outside `deployments` are ignored.
+    Scale-down walks the levels in reverse so dependents stop before what they use.
+
+    Raises:
+        ConfigError: If the dependency graph contains a cycle
+
+    """
+    names = list(dict.fromkeys(deployments))
+    remaining = {
+        name: {dep for dep in depends_on.get(name, []) if dep in names and dep != name}
+        for name in names
+    }
+
+    levels: list[list[str]] = []
+    placed: set[str] = set()
+    while remaining:
+        level = [name for name in names if name in remaining and remaining[name] <= placed]
+        if not level:
+            cycle = ", ".join(sorted(remaining))
+            message = f"Deployment dependency cycle between: {cycle}"
+            raise ConfigError(message)
+        levels.append(level)
+        placed.update(level)
+        for name in level:
+            del remaining[name]
+
+    return levels
+
+
+def validate_deployment_dependencies(kubernetes: KubernetesBackupConfig) -> None:
+    """Check that dependsOn only references configured deployments and is acyclic."""
+    known = set(kubernetes.deployments)
+    for name, deps in kubernetes.depends_on.items():
+        unknown = [n for n in [name, *deps] if n not in known]
+        if unknown:
+            message = (
+                f"dependsOn in namespace {kubernetes.namespace} references unknown "
+                f"deployments: {', '.join(unknown)}"
+            )
+            raise ConfigError(message)
+    deployment_levels(kubernetes.deployments, kubernetes.depends_on)
+
+
+class DeploymentScaler:
+    """Scale deployments down and back up level by level, concurrently within a level."""
+
+    def __init__(self, kubernetes: KubernetesController):
+        self.kubernetes = kubernetes
+
+    async def scale_down(self, kubernetes: KubernetesBackupConfig) -> list[DeploymentScale]:
+        """
+        Scale configured deployments to zero and wait for their pods to go away.
+
+        Returns the original scales (in startup order) for `restore()`. If any
+        deployment fails to scale down, already captured deployments are restored
+        before the error is re-raised.
+        """
+        validate_deployment_dependencies(kubernetes)
+        levels = deployment_levels(kubernetes.deployments, kubernetes.depends_on)
+
+        original_scales: list[DeploymentScale] = []
+        try:
+            for level in reversed(levels):
+                scales = await gather_or_raise(
+                    self.kubernetes.deployment_scale(kubernetes.namespace, name) for name in level
+                )
+                original_scales[:0] = scales
+                await gather_or_raise(
+                    self._scale_and_wait(scale, 0) for scale in scales if scale.replicas > 0
+                )
+        except KubernetesError:
+            await self.restore(original_scales, kubernetes.depends_on)
+            raise
+
+        return original_scales
+
+    async def restore(
+        self,
+        deployment_scales: Sequence[DeploymentScale],
+        depends_on: Mapping[str, Sequence[str]],
+    ) -> list[str]:
+        """
+        Restore deployments to their original replica counts, dependencies first.
+
+        Failures are logged and returned as messages rather than raised, so one
+        deployment that does not come back does not keep the others down.
+        """
+        by_name = {scale.name: scale for scale in deployment_scales}
+        failures: list[str] = []
+        for level in deployment_levels(list(by_name), depends_on):
+            errors = await asyncio.gather(
+                *(self._restore_one(by_name[name]) for name in level if by_name[name].replicas)
+            )
+            failures.extend(error for error in errors if error is not None)
+        return failures
+
+    async def _restore_one(self, scale: DeploymentScale) -> str | None:
+        """Restore one deployment, returning (not raising) a failure message."""
+        try:
+            await self._scale_and_wait(scale, scale.replicas)
+        except KubernetesError as error:
+            logger.warning(
+                "Failed to restore deployment/%s in %s: %s",
+                scale.name,
+                scale.namespace,
+                error,
+            )
+            return f"deployment/{scale.name}: {error}"
+        return None
+
+    async def _scale_and_wait(self, scale: DeploymentScale, replicas: int) -> None:
+        """Scale one deployment and wait until it reaches the requested replicas."""
+        started = time.monotonic()
+        await self.kubernetes.scale_deployment(scale, replicas)
+        await self.kubernetes.wait_for_deployment_replicas(scale.namespace, scale.name, replicas)
+        if self.kubernetes.dry_run:
+            return
+        logger.info(
+            "deployment/%s in %s reached %s replicas in %.1fs",
+            scale.name,
+            scale.namespace,
+            replicas,
+            time.monotonic() - started,
+        )
+
+
+async def gather_or_raise(awaitables: Iterable[Awaitable[TResult]]) -> list[TResult]:
+    """Await all awaitables to completion, then raise the first failure if any."""
+    results = await asyncio.gather(*awaitables, return_exceptions=True)
+    values: list[TResult] = []
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+        values.append(result)
+    return values
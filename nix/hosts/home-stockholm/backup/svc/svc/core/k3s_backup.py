@@ -0,0 +1,150 @@
+"""K3s embedded-etcd backup source."""
+
+import asyncio
+import json
+import logging
+from pathlib import Path
+from typing import Any, cast
+
+from ..config import K3sEtcdSource
+from ..controllers import ProcessResult, capture_process
+from .k3s_restore import K3S_SNAPSHOTS_PATH, SNAPSHOT_NAME, newest_etcd_snapshot
+
+logger = logging.getLogger("svc.core.k3s_backup")
+
+K3S_ETCD_ENDPOINT = "https://127.0.0.1:2379"
+K3S_ETCD_TLS_DIR = "/var/lib/rancher/k3s/server/tls/etcd"
+
+
+class K3sEtcdSnapshotter:
+    """
+    Take the one etcd snapshot a k3s backup needs.
+
+    With `etcdctl` configured, etcd is compacted to its current revision and
+    defragmented first, so the snapshot carries no superseded revisions or free
+    pages. After the snapshot is saved, older `svc-backup` snapshots are pruned so
+    the snapshots directory holds only the one being backed up.
+    """
+
+    def __init__(self, source: K3sEtcdSource, *, dry_run: bool):
+        self.source = source
+        self.dry_run = dry_run
+
+    async def snapshot(self) -> tuple[Path | None, str | None]:
+        """Return the path of a fresh etcd snapshot, or an error message."""
+        snapshots_dir = Path(K3S_SNAPSHOTS_PATH)
+        if self.dry_run:
+            logger.info("Dry run: would compact etcd and save a %s snapshot", SNAPSHOT_NAME)
+            return newest_etcd_snapshot(snapshots_dir) or snapshots_dir, None
+
+        if self.source.etcdctl:
+            error = await self._compact_and_defragment(self.source.etcdctl)
+            if error is not None:
+                return None, error
+
+        existing = await asyncio.to_thread(_listing, snapshots_dir)
+        save = await self._run(
+            [
+                self.source.k3s,
+                "etcd-snapshot",
+                "save",
+                "--name",
+                SNAPSHOT_NAME,
+                "--dir",
+                K3S_SNAPSHOTS_PATH,
+            ]
+        )
+        if save.returncode != 0:
+            return None, f"k3s etcd-snapshot save failed (exit code {save.returncode})"
+
+        snapshot = newest_etcd_snapshot(snapshots_dir)
+        if snapshot is None or snapshot in existing:
+            return None, f"k3s etcd-snapshot save did not write a snapshot to {snapshots_dir}"
+
+        prune = await self._run(
+            [
+                self.source.k3s,
+                "etcd-snapshot",
+                "prune",
+                "--name",
+                SNAPSHOT_NAME,
+                "--dir",
+                K3S_SNAPSHOTS_PATH,
+                "--snapshot-retention",
+                "1",
+            ]
+        )
+        if prune.returncode != 0:
+            logger.warning("Failed to prune older etcd snapshots (exit code %s)", prune.returncode)
+
+        logger.info("Saved etcd snapshot %s", snapshot.name)
+        return snapshot, None
+
+    async def _compact_and_defragment(self, etcdctl: str) -> str | None:
+        """Compact etcd to its current revision and defragment it."""
+        status = await self._run(
+            [*self._etcdctl(etcdctl), "endpoint", "status", "--write-out=json"]
+        )
+        if status.returncode != 0:
+            return f"Failed to read etcd status: {status.stderr.strip()}"
+
+        revision = _current_revision(status.stdout)
+        if revision is None:
+            return "Could not read the current etcd revision"
+
+        compact = await self._run([*self._etcdctl(etcdctl), "compact", str(revision), "--physical"])
+        # Compacting to a revision that is already compacted is not an error here
+        if compact.returncode != 0 and "compacted" not in compact.stderr:
+            return f"Failed to compact etcd: {compact.stderr.strip()}"
+
+        defrag = await self._run([*self._etcdctl(etcdctl), "defrag"])
+        if defrag.returncode != 0:
+            return f"Failed to defragment etcd: {defrag.stderr.strip()}"
+        return None
+
+    def _etcdctl(self, etcdctl: str) -> list[str]:
+        """Return the etcdctl command with k3s's endpoint and client certificates."""
+        tls = Path(K3S_ETCD_TLS_DIR)
+        return [
+            etcdctl,
+            f"--endpoints={K3S_ETCD_ENDPOINT}",
+            f"--cacert={tls / 'server-ca.crt'}",
+            f"--cert={tls / 'client.crt'}",
+            f"--key={tls / 'client.key'}",
+            f"--command-timeout={self.source.timeout_seconds}s",
+        ]
+
+    async def _run(self, args: list[str]) -> ProcessResult:
+        """Run a command, capturing its output, and kill it after the timeout."""
+        logger.info("Running: %s", " ".join(args))
+        result = await capture_process(args, self.source.timeout_seconds)
+        if result.timed_out:
+            result.stderr = f"timed out after {self.source.timeout_seconds}s"
+        return result
+
+
+def _listing(directory: Path) -> set[Path]:
+    """Return the entries of a directory, or none if it does not exist yet."""
+    return set(directory.iterdir()) if directory.is_dir() else set()
+
+
+def _current_revision(raw: str) -> int | None:
+    """Extract the store revision from `etcdctl endpoint status --write-out=json`."""
+    try:
+        data: Any = json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+
+    if not isinstance(data, list) or not data:
+        return None
+    endpoint: Any = cast("list[Any]", data)[0]
+    if not isinstance(endpoint, dict):
+        return None
+    status: Any = cast("dict[str, Any]", endpoint).get("Status")
+    if not isinstance(status, dict):
+        return None
+    header: Any = cast("dict[str, Any]", status).get("header")
+    if not isinstance(header, dict):
+        return None
+    revision: Any = cast("dict[str, Any]", header).get("revision")
+    return revision if isinstance(revision, int) else None
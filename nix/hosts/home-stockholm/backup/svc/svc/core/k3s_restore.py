@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import os
 import shlex
@@ -11,6 +12,7 @@ import tempfile
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, cast
 
 from ..config import ServiceConfig
 from ..controllers import ResticRunner
@@ -25,6 +27,8 @@ logger = logging.getLogger("svc.core.k3s_restore")
 K3S_SNAPSHOTS_PATH = "/var/lib/rancher/k3s/server/db/snapshots"
 K3S_TOKEN_PATH = "/var/lib/rancher/k3s/server/token"
 K3S_SERVICE = "k3s.service"
+# Name prefix of the etcd snapshots svc takes
+SNAPSHOT_NAME = "svc-backup"
 
 
 @dataclass
@@ -55,10 +59,12 @@ class K3sRestoreOrchestrator:
         restic: ResticRunner,
         *,
         dry_run: bool,
+        metadata_root: str | None = None,
         systemctl_bin: str = "/run/current-system/sw/bin/systemctl",
     ):
         self.restic = restic
         self.dry_run = dry_run
+        self.metadata_root = metadata_root
         self.systemctl_bin = systemctl_bin
 
     async def restore_service(
@@ -103,17 +109,18 @@ class K3sRestoreOrchestrator:
                 snapshot_id=snapshot_id,
                 message=(
                     "Dry run: would restore k3s etcd by staging the backed-up "
-                    "server token and newest etcd snapshot, stopping k3s, running "
+                    "server token and recorded (or newest) etcd snapshot, stopping k3s, running "
                     "the k3s.service command with --cluster-reset, installing the "
                     "backed-up server token, then starting k3s"
                 ),
             )
 
+        recorded = await self._recorded_snapshot(svc, snapshot_id)
         with tempfile.TemporaryDirectory(prefix="svc-k3s-restore.") as staging_raw:
             staging = Path(staging_raw)
             restore_status = await self.restic.restore(
                 snapshot_id,
-                [K3S_SNAPSHOTS_PATH, K3S_TOKEN_PATH],
+                [recorded or K3S_SNAPSHOTS_PATH, K3S_TOKEN_PATH],
                 str(staging),
             )
             if restore_status != 0:
@@ -125,8 +132,11 @@ class K3sRestoreOrchestrator:
                 )
 
             token_path = self._staged_path(staging, K3S_TOKEN_PATH)
-            snapshots_dir = self._staged_path(staging, K3S_SNAPSHOTS_PATH)
-            snapshot_path = self._select_snapshot(snapshots_dir)
+            snapshot_path = (
+                self._staged_path(staging, recorded)
+                if recorded
+                else newest_etcd_snapshot(self._staged_path(staging, K3S_SNAPSHOTS_PATH))
+            )
             invalid = self._validate_staged_files(token_path, snapshot_path)
             if invalid is not None:
                 return K3sRestoreResult(
@@ -209,7 +219,7 @@ class K3sRestoreOrchestrator:
         if snapshots.returncode != 0:
             return f"Restic snapshot {snapshot_id[:8]} does not contain {K3S_SNAPSHOTS_PATH}"
 
-        if "svc-backup" not in snapshots.stdout:
+        if SNAPSHOT_NAME not in snapshots.stdout:
             return (
                 f"Restic snapshot {snapshot_id[:8]} contains {K3S_SNAPSHOTS_PATH}, "
                 "but no svc-backup etcd snapshot was found there"
@@ -300,9 +310,9 @@ class K3sRestoreOrchestrator:
             return f"Backed-up k3s server token was not restored at {token_path}"
         if token_path.stat().st_size == 0:
             return f"Backed-up k3s server token is empty at {token_path}"
-        if snapshot_path is None:
+        if snapshot_path is None or not snapshot_path.is_file():
             return (
-                "No svc-backup* etcd snapshot file was found in the restored "
+                f"No {SNAPSHOT_NAME}* etcd snapshot file was found in the restored "
                 "k3s snapshots directory"
             )
         return None
@@ -323,20 +333,35 @@ class K3sRestoreOrchestrator:
         os.chmod(temp, 0o600)
         temp.replace(target)
 
-    def _select_snapshot(self, snapshots_dir: Path) -> Path | None:
-        """Pick the newest staged etcd snapshot, preferring snapshots made by svc."""
-        if not snapshots_dir.is_dir():
+    async def _recorded_snapshot(self, svc: ServiceConfig, snapshot_id: str) -> str | None:
+        """
+        Return the etcd snapshot file the k3s backup source recorded in its metadata.
+
+        Backups made before the source existed carry no metadata; the newest staged
+        snapshot is used for those.
+        """
+        if self.metadata_root is None:
             return None
 
-        candidates = [
-            path
-            for path in snapshots_dir.iterdir()
-            if path.is_file() and path.name.startswith("svc-backup")
-        ]
-        if not candidates:
+        metadata_path = Path(self.metadata_root) / f"{svc.name}.json"
+        result = await self.restic.dump_file(snapshot_id, str(metadata_path))
+        if result.returncode != 0 or not result.stdout:
+            return None
+        try:
+            metadata: Any = json.loads(result.stdout)
+        except json.JSONDecodeError:
             return None
 
-        return max(candidates, key=lambda path: (path.stat().st_mtime_ns, path.name))
+        k3s: Any = (
+            cast("dict[str, Any]", metadata).get("k3s") if isinstance(metadata, dict) else None
+        )
+        recorded: Any = (
+            cast("dict[str, Any]", k3s).get("etcdSnapshot") if isinstance(k3s, dict) else None
+        )
+        if isinstance(recorded, str) and recorded:
+            logger.info("Backup recorded etcd snapshot %s", Path(recorded).name)
+            return recorded
+        return None
 
     async def _run(self, args: list[str]) -> int:
         """Run a subprocess, streaming output to the caller's terminal."""
@@ -359,3 +384,19 @@ class K3sRestoreOrchestrator:
             stdout=stdout_bytes.decode() if stdout_bytes else "",
             stderr=stderr_bytes.decode() if stderr_bytes else "",
         )
+
+
+def newest_etcd_snapshot(snapshots_dir: Path) -> Path | None:
+    """Pick the newest etcd snapshot svc made in a snapshots directory."""
+    if not snapshots_dir.is_dir():
+        return None
+
+    candidates = [
+        path
+        for path in snapshots_dir.iterdir()
+        if path.is_file() and path.name.startswith(SNAPSHOT_NAME)
+    ]
+    if not candidates:
+        return None
+
+    return max(candidates, key=lambda path: (path.stat().st_mtime_ns, path.name))
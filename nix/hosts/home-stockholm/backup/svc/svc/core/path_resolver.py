@@ -1,12 +1,16 @@
 """Path resolution utilities for backup and restore operations."""
 
 import asyncio
+import logging
 from collections.abc import Sequence
 from dataclasses import dataclass
 from pathlib import Path
 
-from ..config import KubernetesBackupConfig
+from ..config import KubernetesBackupConfig, ServiceConfig
 from ..controllers import KubernetesController
+from ..exceptions import KubernetesError
+
+logger = logging.getLogger("svc.core.path_resolver")
 
 
 @dataclass
@@ -26,11 +30,42 @@ def normalize_path(p: str) -> str:
     return p.rstrip("/")
 
 
+def stable_pvc_path(mount_root: str, service_name: str, source_name: str) -> str:
+    """Return the stable path a PVC (`namespace/name`) is backed up under for a service."""
+    _namespace, _, pvc = source_name.partition("/")
+    return str(Path(mount_root) / service_name / pvc)
+
+
 class PathResolver:
     """Resolves configured backup targets to filesystem locations."""
 
     def __init__(self, kubernetes: KubernetesController):
         self.kubernetes = kubernetes
+        # `namespace/pvc` -> host path, filled by `index_services()`
+        self._pvc_paths: dict[str, str] = {}
+
+    async def index_services(self, services: Sequence[ServiceConfig]) -> None:
+        """
+        Resolve the PVCs of all the services' namespaces up front.
+
+        Costs one PV listing plus one PVC listing per namespace, instead of two
+        lookups per PVC. PVCs missing from the index (or all of them, if listing
+        fails) are still resolved one by one.
+        """
+        namespaces = {
+            svc.backup.kubernetes.namespace
+            for svc in services
+            if svc.backup.kubernetes is not None
+            and (svc.backup.kubernetes.pvcs or svc.backup.prometheus_snapshot is not None)
+        }
+        if not namespaces:
+            return
+        try:
+            self._pvc_paths.update(await self.kubernetes.pvc_host_paths(namespaces))
+        except KubernetesError as error:
+            logger.warning(
+                "Could not list the PVCs of %s: %s", ", ".join(sorted(namespaces)), error
+            )
 
     def resolve_path(self, path: str) -> ResolvedPath:
         """Resolve a direct path (mostly normalization and existence check)."""
@@ -44,9 +79,18 @@ class PathResolver:
             exists=exists,
         )
 
+    async def resolve_paths(self, paths: Sequence[str]) -> list[ResolvedPath]:
+        """Resolve direct paths, checking their existence concurrently off the event loop."""
+        return list(
+            await asyncio.gather(*(asyncio.to_thread(self.resolve_path, path) for path in paths))
+        )
+
     async def resolve_kubernetes_pvc(self, namespace: str, pvc: str) -> ResolvedPath:
         """Resolve a Kubernetes PVC to its backing filesystem path."""
-        fs_path = normalize_path(await self.kubernetes.pvc_filesystem_path(namespace, pvc))
+        indexed = self._pvc_paths.get(f"{namespace}/{pvc}")
+        fs_path = normalize_path(
+            indexed or await self.kubernetes.pvc_filesystem_path(namespace, pvc)
+        )
         exists = await asyncio.to_thread(Path(fs_path).exists)
 
         return ResolvedPath(
@@ -56,6 +100,14 @@ class PathResolver:
             exists=exists,
         )
 
+    async def resolve_kubernetes_pvcs(
+        self, namespace: str, pvcs: Sequence[str]
+    ) -> list[ResolvedPath]:
+        """Resolve PVCs of a namespace concurrently."""
+        return list(
+            await asyncio.gather(*(self.resolve_kubernetes_pvc(namespace, pvc) for pvc in pvcs))
+        )
+
     async def resolve_all(
         self,
         paths: Sequence[str],
@@ -69,23 +121,12 @@ class PathResolver:
             where missing_paths contains descriptions of paths that don't exist.
 
         """
-        resolved: list[ResolvedPath] = []
-        missing: list[str] = []
-
-        for path in paths:
-            rp = self.resolve_path(path)
-            resolved.append(rp)
-            if not rp.exists:
-                missing.append(f"path:{rp.filesystem_path}")
-
-        if kubernetes is not None:
-            for pvc in kubernetes.pvcs:
-                rp = await self.resolve_kubernetes_pvc(kubernetes.namespace, pvc)
-                resolved.append(rp)
-                if not rp.exists:
-                    missing.append(f"kubernetes-pvc:{rp.source_name} -> {rp.filesystem_path}")
-
-        return resolved, missing
+        namespace, pvc_names = (kubernetes.namespace, kubernetes.pvcs) if kubernetes else ("", [])
+        resolved, pvcs = await asyncio.gather(
+            self.resolve_paths(paths), self.resolve_kubernetes_pvcs(namespace, pvc_names)
+        )
+        resolved.extend(pvcs)
+        return resolved, missing_targets(resolved)
 
     async def get_backup_paths(
         self,
@@ -102,3 +143,23 @@ class PathResolver:
         resolved, missing = await self.resolve_all(paths, kubernetes)
         filesystem_paths = [r.filesystem_path for r in resolved]
         return filesystem_paths, missing
+
+
+def missing_targets(resolved: Sequence[ResolvedPath]) -> list[str]:
+    """Describe the resolved targets that do not exist."""
+    missing: list[str] = []
+    for rp in resolved:
+        if rp.exists:
+            continue
+        if rp.source_type == "kubernetes-pvc":
+            missing.append(f"kubernetes-pvc:{rp.source_name} -> {rp.filesystem_path}")
+        else:
+            missing.append(f"path:{rp.filesystem_path}")
+    return missing
+
+
+def target_key(resolved: ResolvedPath) -> str:
+    """Return how a target is named in `targetClasses`: its path, or its PVC name."""
+    if resolved.source_type == "kubernetes-pvc":
+        return resolved.source_name.partition("/")[2]
+    return resolved.source_name
@@ -0,0 +1,121 @@
+"""Prometheus TSDB snapshot backup source."""
+
+import asyncio
+import json
+import logging
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, cast
+
+from ..config import PrometheusSnapshotSource
+from ..controllers import KubernetesController, capture_process
+from .path_resolver import PathResolver, ResolvedPath, stable_pvc_path
+
+logger = logging.getLogger("svc.core.prometheus_snapshot")
+
+# `ResolvedPath.source_type` of a TSDB snapshot target; its `source_name` is the
+# path the snapshot is recorded under
+TSDB_SNAPSHOT_SOURCE = "prometheus-snapshot"
+
+
+@dataclass(frozen=True)
+class TsdbSnapshot:
+    """A TSDB snapshot taken for one backup run."""
+
+    # PVC holding the TSDB
+    pvc: ResolvedPath
+    # Backup target: the snapshot directory, recorded where the TSDB sits under the
+    # PVC's stable path, so restoring the PVC puts it back in place of the TSDB
+    target: ResolvedPath
+
+
+class PrometheusSnapshotter:
+    """
+    Take and remove Prometheus TSDB snapshots.
+
+    Snapshots are created through the admin API (`--web.enable-admin-api`), run
+    with the busybox `wget` of the Prometheus image inside its pod. They hardlink
+    the TSDB blocks, so they are instant and Prometheus keeps scraping.
+    """
+
+    def __init__(
+        self,
+        kubernetes: KubernetesController,
+        path_resolver: PathResolver,
+        mount_root: str,
+        *,
+        dry_run: bool,
+    ):
+        self.kubernetes = kubernetes
+        self.path_resolver = path_resolver
+        self.mount_root = mount_root
+        self.dry_run = dry_run
+
+    async def snapshot(
+        self, service_name: str, namespace: str, source: PrometheusSnapshotSource
+    ) -> tuple[TsdbSnapshot | None, str | None]:
+        """Return a fresh TSDB snapshot, or an error message."""
+        pvc = await self.path_resolver.resolve_kubernetes_pvc(namespace, source.pvc)
+        tsdb = Path(pvc.filesystem_path) / source.tsdb_path
+        if not pvc.exists:
+            return None, f"PVC {pvc.source_name} does not exist at {pvc.filesystem_path}"
+
+        if self.dry_run:
+            logger.info("Dry run: would snapshot the Prometheus TSDB at %s", tsdb)
+            return self._tsdb_snapshot(service_name, source, pvc, tsdb), None
+
+        url = f"http://localhost:{source.port}/api/v1/admin/tsdb/snapshot"
+        command = self.kubernetes.exec_command(
+            namespace,
+            source.deployment,
+            ["wget", "-q", "-O", "-", "--post-data=", url],
+            container=source.container,
+        )
+        logger.info("Creating Prometheus TSDB snapshot in %s/%s", namespace, source.deployment)
+        result = await capture_process(command, source.timeout_seconds)
+        if result.returncode != 0:
+            detail = result.stderr.strip() or f"exit code {result.returncode}"
+            return None, f"Prometheus TSDB snapshot failed (is the admin API enabled?): {detail}"
+
+        name = _snapshot_name(result.stdout)
+        path = tsdb / "snapshots" / name if name else None
+        if path is None or not path.is_dir():
+            return None, f"Prometheus did not create a readable TSDB snapshot: {result.stdout}"
+
+        logger.info("Created Prometheus TSDB snapshot %s", name)
+        return self._tsdb_snapshot(service_name, source, pvc, path), None
+
+    async def remove(self, snapshot: TsdbSnapshot) -> None:
+        """Delete a snapshot directory; Prometheus has no API for it."""
+        if self.dry_run:
+            return
+        logger.info("Removing Prometheus TSDB snapshot %s", snapshot.target.filesystem_path)
+        await asyncio.to_thread(shutil.rmtree, snapshot.target.filesystem_path, ignore_errors=True)
+
+    def _tsdb_snapshot(
+        self, service_name: str, source: PrometheusSnapshotSource, pvc: ResolvedPath, path: Path
+    ) -> TsdbSnapshot:
+        """Build the snapshot with its backup target."""
+        stable = Path(stable_pvc_path(self.mount_root, service_name, pvc.source_name))
+        return TsdbSnapshot(
+            pvc=pvc,
+            target=ResolvedPath(
+                source_type=TSDB_SNAPSHOT_SOURCE,
+                source_name=str(stable / source.tsdb_path),
+                filesystem_path=str(path),
+                exists=True,
+            ),
+        )
+
+
+def _snapshot_name(raw: str) -> str | None:
+    """Extract the snapshot name from the admin API response."""
+    try:
+        response: Any = json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+
+    data: Any = cast("dict[str, Any]", response).get("data") if isinstance(response, dict) else None
+    name: Any = cast("dict[str, Any]", data).get("name") if isinstance(data, dict) else None
+    return name if isinstance(name, str) and name and "/" not in name else None
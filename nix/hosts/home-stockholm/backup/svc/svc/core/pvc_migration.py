@@ -0,0 +1,365 @@
+"""Host-side copy or move of one PVC's data into another."""
+
+import asyncio
+import contextlib
+import fcntl
+import logging
+import os
+import shutil
+import stat
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import cast
+
+from ..config import KubernetesBackupConfig, validate_model
+from ..controllers import DeploymentScale, KubernetesController
+from ..exceptions import EXIT_CONFIG_ERROR, EXIT_SERVICE_ACTION_ERROR, EXIT_SUCCESS, KubernetesError
+from .deployment_scaler import DeploymentScaler
+from .path_resolver import PathResolver, ResolvedPath
+
+logger = logging.getLogger("svc.core.pvc_migration")
+
+# ioctl cloning a whole file into another on the same filesystem (reflink)
+FICLONE = 0x40049409
+PROGRESS_INTERVAL_SECONDS = 5
+# Suffix of a file being copied, so an interrupted copy is never taken as complete
+PARTIAL_SUFFIX = ".svc-partial"
+
+
+@dataclass
+class PvcMigrationResult:
+    """Result of a PVC migration."""
+
+    success: bool
+    exit_code: int
+    message: str
+    scale_up_errors: list[str] = field(default_factory=lambda: cast("list[str]", []))
+
+
+@dataclass
+class _TreePlan:
+    """What a copy has to create in the target, relative to the source."""
+
+    directories: list[Path] = field(default_factory=lambda: cast("list[Path]", []))
+    files: list[tuple[Path, int]] = field(
+        default_factory=lambda: cast("list[tuple[Path, int]]", [])
+    )
+    symlinks: list[Path] = field(default_factory=lambda: cast("list[Path]", []))
+    skipped: list[Path] = field(default_factory=lambda: cast("list[Path]", []))
+
+
+@dataclass
+class _Progress:
+    """Bytes and files transferred so far."""
+
+    total_bytes: int
+    total_files: int
+    bytes_done: int = 0
+    files_done: int = 0
+    bytes_skipped: int = 0
+
+    def describe(self) -> str:
+        percent = 100 * self.bytes_done // self.total_bytes if self.total_bytes else 100
+        return (
+            f"{_size(self.bytes_done)} of {_size(self.total_bytes)} ({percent}%), "
+            f"{self.files_done}/{self.total_files} files"
+        )
+
+
+class PvcMigrator:
+    """
+    Copy or move the data of one PVC into another on the host.
+
+    Both PVCs are resolved to their host paths, and the deployments that mount
+    either one read-write are scaled down for the duration. A move within one
+    filesystem renames the source's entries into the target. Anything else is
+    copied by `jobs` workers, cloning files (reflink) when the filesystem
+    supports it. Files already in the target with the same size and mtime are
+    skipped, so a migration that was interrupted resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        kubernetes: KubernetesController,
+        path_resolver: PathResolver,
+        *,
+        jobs: int = 4,
+        dry_run: bool = False,
+    ):
+        self.kubernetes = kubernetes
+        self.path_resolver = path_resolver
+        self.scaler = DeploymentScaler(kubernetes)
+        self.jobs = jobs
+        self.dry_run = dry_run
+
+    async def migrate(
+        self, namespace: str, source: str, target: str, *, move: bool
+    ) -> PvcMigrationResult:
+        """Copy (or move) the contents of the source PVC into the target PVC."""
+        verb = "move" if move else "copy"
+        try:
+            paths, error = await self._resolve(namespace, source, target)
+            writers = await self.kubernetes.pvc_writers(namespace, [source, target])
+        except KubernetesError as e:
+            return PvcMigrationResult(success=False, exit_code=EXIT_CONFIG_ERROR, message=str(e))
+        if paths is None:
+            return PvcMigrationResult(
+                success=False, exit_code=EXIT_CONFIG_ERROR, message=error or ""
+            )
+
+        source_path, target_path = paths
+        description = (
+            f"{namespace}/{source} ({source_path}) into {namespace}/{target} ({target_path})"
+        )
+        if self.dry_run:
+            stopped = ", ".join(writers) or "none"
+            return PvcMigrationResult(
+                success=True,
+                exit_code=EXIT_SUCCESS,
+                message=f"Dry run: would {verb} {description}; deployments to stop: {stopped}",
+            )
+
+        try:
+            scales = await self._scale_down(namespace, writers)
+        except KubernetesError as e:
+            return PvcMigrationResult(
+                success=False,
+                exit_code=EXIT_SERVICE_ACTION_ERROR,
+                message=f"Failed to stop the writers of both PVCs: {e}",
+            )
+        summary, error = "", None
+        try:
+            logger.info("Migrating (%s) %s", verb, description)
+            summary = await self._transfer(source_path, target_path, move=move)
+        except OSError as e:
+            error = f"Failed to {verb} {description}: {e}"
+        finally:
+            # Bring the writers back whatever happened, cancellation included
+            failures = await self.scaler.restore(scales, {})
+        if error is not None:
+            return PvcMigrationResult(
+                success=False,
+                exit_code=EXIT_SERVICE_ACTION_ERROR,
+                message=error,
+                scale_up_errors=failures,
+            )
+        return PvcMigrationResult(
+            success=not failures,
+            exit_code=EXIT_SERVICE_ACTION_ERROR if failures else EXIT_SUCCESS,
+            message=f"{verb.capitalize()} of {namespace}/{source} into {target} done: {summary}",
+            scale_up_errors=failures,
+        )
+
+    async def _resolve(
+        self, namespace: str, source: str, target: str
+    ) -> tuple[tuple[Path, Path] | None, str | None]:
+        """Return the host paths of both PVCs, or an error message."""
+        resolved: list[ResolvedPath] = await self.path_resolver.resolve_kubernetes_pvcs(
+            namespace, [source, target]
+        )
+        missing = [f"{r.source_name} -> {r.filesystem_path}" for r in resolved if not r.exists]
+        if missing:
+            return None, f"PVC paths do not exist: {', '.join(missing)}"
+
+        source_path, target_path = (Path(r.filesystem_path) for r in resolved)
+        if source_path == target_path:
+            return None, f"Both PVCs resolve to {source_path}"
+        if target_path.is_relative_to(source_path):
+            return None, f"Target {target_path} lies within source {source_path}"
+        if source_path.is_relative_to(target_path):
+            return None, f"Source {source_path} lies within target {target_path}"
+        return (source_path, target_path), None
+
+    async def _scale_down(self, namespace: str, writers: list[str]) -> list[DeploymentScale]:
+        """Stop the deployments writing either PVC."""
+        if not writers:
+            return []
+        logger.info("Stopping the writers of both PVCs: %s", ", ".join(writers))
+        return await self.scaler.scale_down(
+            validate_model(KubernetesBackupConfig, {"namespace": namespace, "deployments": writers})
+        )
+
+    async def _transfer(self, source: Path, target: Path, *, move: bool) -> str:
+        """Transfer the source's contents into the target and summarize it."""
+        source_device = (await asyncio.to_thread(source.stat)).st_dev
+        same_filesystem = source_device == (await asyncio.to_thread(target.stat)).st_dev
+        started = time.monotonic()
+        if move and same_filesystem:
+            moved = await asyncio.to_thread(_rename_entries, source, target)
+            return f"renamed {moved} entries in {time.monotonic() - started:.1f}s"
+
+        progress = await self._copy_tree(source, target, clone=same_filesystem)
+        if move:
+            await asyncio.to_thread(_clear, source)
+        elapsed = time.monotonic() - started
+        summary = f"{progress.describe()} in {elapsed:.1f}s"
+        if progress.bytes_skipped:
+            summary += f" ({_size(progress.bytes_skipped)} already in place)"
+        return summary
+
+    async def _copy_tree(self, source: Path, target: Path, *, clone: bool) -> _Progress:
+        """Copy a directory tree with `jobs` concurrent file copies, reporting progress."""
+        plan = await asyncio.to_thread(_plan_tree, source)
+        for skipped in plan.skipped:
+            logger.warning("Skipping special file %s", source / skipped)
+        await asyncio.to_thread(_create_directories, source, target, plan.directories)
+
+        progress = _Progress(
+            total_bytes=sum(size for _path, size in plan.files), total_files=len(plan.files)
+        )
+        slots = asyncio.Semaphore(self.jobs)
+
+        async def copy_one(relative: Path, size: int) -> None:
+            async with slots:
+                copied = await asyncio.to_thread(
+                    _copy_file, source / relative, target / relative, clone=clone
+                )
+            progress.bytes_done += size
+            progress.files_done += 1
+            if not copied:
+                progress.bytes_skipped += size
+
+        reporter = asyncio.create_task(_report(progress))
+        try:
+            await asyncio.gather(*(copy_one(relative, size) for relative, size in plan.files))
+        finally:
+            reporter.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await reporter
+
+        await asyncio.to_thread(_finish_tree, source, target, plan)
+        return progress
+
+
+async def _report(progress: _Progress) -> None:
+    """Log the progress of a copy periodically."""
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL_SECONDS)
+        logger.info("Copied %s", progress.describe())
+
+
+def _plan_tree(source: Path) -> _TreePlan:
+    """List the directories, files and symlinks under a directory."""
+    plan = _TreePlan()
+    for root, directories, files in os.walk(source):
+        relative_root = Path(root).relative_to(source)
+        for name in directories:
+            path = Path(root) / name
+            if path.is_symlink():
+                plan.symlinks.append(relative_root / name)
+            else:
+                plan.directories.append(relative_root / name)
+        for name in files:
+            info = (Path(root) / name).lstat()
+            if stat.S_ISLNK(info.st_mode):
+                plan.symlinks.append(relative_root / name)
+            elif stat.S_ISREG(info.st_mode):
+                plan.files.append((relative_root / name, info.st_size))
+            else:
+                plan.skipped.append(relative_root / name)
+    return plan
+
+
+def _create_directories(source: Path, target: Path, directories: list[Path]) -> None:
+    """Create the directories of a copy, parents first, with their owners and modes."""
+    for relative in directories:
+        (target / relative).mkdir(exist_ok=True)
+        _copy_owner(source / relative, target / relative)
+
+
+def _copy_file(source: Path, target: Path, *, clone: bool) -> bool:
+    """Copy one file with its metadata; return False if the target already matched."""
+    info = source.lstat()
+    with contextlib.suppress(FileNotFoundError):
+        existing = target.lstat()
+        if existing.st_size == info.st_size and existing.st_mtime_ns == info.st_mtime_ns:
+            return False
+
+    partial = target.with_name(target.name + PARTIAL_SUFFIX)
+    with source.open("rb") as reader, partial.open("wb") as writer:
+        if not (clone and _clone(reader.fileno(), writer.fileno())):
+            _copy_range(reader.fileno(), writer.fileno(), info.st_size)
+    _copy_owner(source, partial)
+    os.utime(partial, ns=(info.st_atime_ns, info.st_mtime_ns))
+    partial.replace(target)
+    return True
+
+
+def _clone(reader: int, writer: int) -> bool:
+    """Share the reader's extents with the writer, if the filesystem can."""
+    try:
+        fcntl.ioctl(writer, FICLONE, reader)
+    except OSError:
+        return False
+    return True
+
+
+def _copy_range(reader: int, writer: int, size: int) -> None:
+    """Copy a file in the kernel, falling back to a read/write loop."""
+    copied = 0
+    try:
+        while copied < size and (count := os.copy_file_range(reader, writer, size - copied)):
+            copied += count
+    except OSError:
+        os.lseek(reader, copied, os.SEEK_SET)
+        os.lseek(writer, copied, os.SEEK_SET)
+        while chunk := os.read(reader, 1 << 20):
+            os.write(writer, chunk)
+
+
+def _finish_tree(source: Path, target: Path, plan: _TreePlan) -> None:
+    """Create the symlinks, then restore directory times (deepest first)."""
+    for relative in plan.symlinks:
+        link = target / relative
+        destination = (source / relative).readlink()
+        if link.is_symlink() and link.readlink() == destination:
+            continue
+        if link.is_symlink():
+            link.unlink()
+        link.symlink_to(destination)
+        info = (source / relative).lstat()
+        os.lchown(link, info.st_uid, info.st_gid)
+        os.utime(link, ns=(info.st_atime_ns, info.st_mtime_ns), follow_symlinks=False)
+
+    for relative in sorted(plan.directories, key=lambda path: len(path.parts), reverse=True):
+        info = (source / relative).stat()
+        os.utime(target / relative, ns=(info.st_atime_ns, info.st_mtime_ns))
+
+
+def _copy_owner(source: Path, target: Path) -> None:
+    """Give the target the source's owner and permission bits."""
+    info = source.lstat()
+    os.chown(target, info.st_uid, info.st_gid)
+    target.chmod(stat.S_IMODE(info.st_mode))
+
+
+def _rename_entries(source: Path, target: Path) -> int:
+    """Move the source's top-level entries into an otherwise-unrelated target."""
+    entries = list(source.iterdir())
+    clashes = [entry.name for entry in entries if os.path.lexists(target / entry.name)]
+    if clashes:
+        message = f"Target already contains {', '.join(sorted(clashes))}"
+        raise FileExistsError(message)
+    for entry in entries:
+        entry.rename(target / entry.name)
+    return len(entries)
+
+
+def _clear(directory: Path) -> None:
+    """Remove the contents of a directory, keeping the directory itself."""
+    for entry in directory.iterdir():
+        if entry.is_dir() and not entry.is_symlink():
+            shutil.rmtree(entry)
+        else:
+            entry.unlink()
+
+
+def _size(size: int) -> str:
+    """Format a byte count for humans."""
+    value = float(size)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024:  # noqa: PLR2004
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TiB"
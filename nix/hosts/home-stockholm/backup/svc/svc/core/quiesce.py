@@ -0,0 +1,232 @@
+"""Quiesce strategies that keep Kubernetes pods scheduled during a backup."""
+
+import asyncio
+import logging
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import cast
+
+from ..config import KubernetesBackupConfig, QuiesceHook
+from ..controllers import CgroupFreezer, KubernetesController, kill_process_group, run_process
+from ..exceptions import CgroupError, KubernetesError, QuiesceHookError
+from .deployment_scaler import deployment_levels, gather_or_raise, validate_deployment_dependencies
+
+logger = logging.getLogger("svc.core.quiesce")
+
+
+class PodFreezer:
+    """
+    Pause a service's pods with the cgroup v2 freezer instead of scaling to zero.
+
+    Frozen pods keep their containers, page cache and network identity, so thawing is
+    instant and there is no reschedule or cold start. The on-disk state is crash
+    consistent, the same as pulling the plug; keep the freeze short (e.g. combine it
+    with a snapshot) so liveness probes do not time out meanwhile.
+    """
+
+    def __init__(self, kubernetes: KubernetesController, freezer: CgroupFreezer):
+        self.kubernetes = kubernetes
+        self.freezer = freezer
+
+    async def freeze(self, kubernetes: KubernetesBackupConfig) -> list[Path]:
+        """
+        Freeze the pods of all configured deployments, dependents first.
+
+        Returns the frozen pod cgroups for `thaw()`. On failure everything frozen so
+        far is thawed before the error is re-raised.
+        """
+        validate_deployment_dependencies(kubernetes)
+        levels = deployment_levels(kubernetes.deployments, kubernetes.depends_on)
+
+        frozen: list[Path] = []
+        try:
+            for level in reversed(levels):
+                uid_lists = await gather_or_raise(
+                    self.kubernetes.deployment_pod_uids(kubernetes.namespace, name)
+                    for name in level
+                )
+                cgroups = await gather_or_raise(
+                    self.freezer.pod_cgroup(uid) for uids in uid_lists for uid in uids
+                )
+                frozen.extend(cgroups)
+                await gather_or_raise(self.freezer.freeze(cgroup) for cgroup in cgroups)
+                logger.info(
+                    "Froze %s pod(s) of %s in %s",
+                    len(cgroups),
+                    ", ".join(level),
+                    kubernetes.namespace,
+                )
+        except (KubernetesError, CgroupError):
+            await self.thaw(frozen)
+            raise
+
+        return frozen
+
+    async def thaw(self, cgroups: list[Path]) -> list[str]:
+        """Thaw frozen pod cgroups, returning (not raising) failure messages."""
+        results = await asyncio.gather(
+            *(self.freezer.thaw(cgroup) for cgroup in reversed(cgroups)),
+            return_exceptions=True,
+        )
+        failures: list[str] = []
+        for cgroup, result in zip(reversed(cgroups), results, strict=True):
+            if isinstance(result, BaseException):
+                logger.warning("Failed to thaw %s: %s", cgroup, result)
+                failures.append(f"{cgroup.name}: {result}")
+        return failures
+
+
+@dataclass
+class QuiescedHook:
+    """A hook whose quiesce step succeeded, with its held process if any."""
+
+    hook: QuiesceHook
+    namespace: str | None
+    held: asyncio.subprocess.Process | None = None
+
+
+class HookQuiescer:
+    """
+    Bring a service to a consistent on-disk state with application hooks.
+
+    Hooks run in order on the host, or in a pod of `hook.deployment` through
+    `kubectl exec`, and are undone in reverse order. A `hold` hook keeps its quiesce
+    command running for the whole backup (e.g. a database session holding
+    `FLUSH TABLES WITH READ LOCK`): it counts as quiesced once it prints its first
+    line, and is released by closing its stdin. Commands that exceed their timeout
+    are killed with their whole process group.
+    """
+
+    def __init__(self, kubernetes: KubernetesController, dry_run: bool = False):
+        self.kubernetes = kubernetes
+        self.dry_run = dry_run
+
+    async def quiesce(
+        self, hooks: Sequence[QuiesceHook], namespace: str | None
+    ) -> list[QuiescedHook]:
+        """
+        Run the quiesce step of every hook.
+
+        Returns the quiesced hooks for `unquiesce()`. If a hook fails, its own
+        unquiesce command and those of the hooks before it are run before
+        QuiesceHookError is raised.
+        """
+        for hook in hooks:
+            if hook.deployment is not None and namespace is None:
+                message = (
+                    f"Quiesce hook {hook.name} runs in deployment/{hook.deployment} "
+                    "but the service has no Kubernetes namespace"
+                )
+                raise QuiesceHookError(message)
+
+        quiesced: list[QuiescedHook] = []
+        try:
+            for hook in hooks:
+                item = await self._quiesce_one(hook, namespace)
+                quiesced.append(item)
+        except QuiesceHookError:
+            await self.unquiesce(quiesced)
+            raise
+        return quiesced
+
+    async def unquiesce(self, quiesced: Sequence[QuiescedHook]) -> list[str]:
+        """Undo quiesced hooks in reverse order, returning (not raising) failure messages."""
+        failures: list[str] = []
+        for item in reversed(quiesced):
+            failures.extend(await self._unquiesce_one(item))
+        return failures
+
+    async def _quiesce_one(self, hook: QuiesceHook, namespace: str | None) -> QuiescedHook:
+        """Run (or start, for hold hooks) one quiesce command."""
+        logger.info("Quiescing %s: %s", hook.name, " ".join(hook.quiesce))
+        if self.dry_run:
+            return QuiescedHook(hook=hook, namespace=namespace)
+
+        argv = self._argv(hook, hook.quiesce, namespace, stdin=hook.hold)
+        if hook.hold:
+            held = await self._start_held(hook, argv, namespace)
+            return QuiescedHook(hook=hook, namespace=namespace, held=held)
+
+        result = await run_process(argv, hook.timeout_seconds)
+        if result.timed_out or result.returncode != 0:
+            reason = "timed out" if result.timed_out else f"exit code {result.returncode}"
+            await self._unquiesce_one(QuiescedHook(hook=hook, namespace=namespace))
+            message = f"Quiesce hook {hook.name} failed ({reason})"
+            raise QuiesceHookError(message)
+        return QuiescedHook(hook=hook, namespace=namespace)
+
+    async def _start_held(
+        self, hook: QuiesceHook, argv: list[str], namespace: str | None
+    ) -> asyncio.subprocess.Process:
+        """Start a hold hook and wait until it reports (by printing a line) that it is quiesced."""
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        stdout = cast("asyncio.StreamReader", proc.stdout)
+        try:
+            line = await asyncio.wait_for(stdout.readline(), hook.timeout_seconds)
+        except TimeoutError:
+            line = None
+
+        if not line:
+            await kill_process_group(proc)
+            reason = "timed out" if line is None else f"exit code {proc.returncode}"
+            await self._unquiesce_one(QuiescedHook(hook=hook, namespace=namespace))
+            message = f"Quiesce hook {hook.name} did not become ready ({reason})"
+            raise QuiesceHookError(message)
+        return proc
+
+    async def _unquiesce_one(self, item: QuiescedHook) -> list[str]:
+        """Release a held process and run the unquiesce command of one hook."""
+        hook = item.hook
+        failures: list[str] = []
+
+        if item.held is not None:
+            failures.extend(await self._release_held(hook, item.held))
+
+        if not hook.unquiesce:
+            return failures
+
+        logger.info("Unquiescing %s: %s", hook.name, " ".join(hook.unquiesce))
+        if self.dry_run:
+            return failures
+
+        argv = self._argv(hook, hook.unquiesce, item.namespace, stdin=False)
+        result = await run_process(argv, hook.timeout_seconds)
+        if result.timed_out or result.returncode != 0:
+            reason = "timed out" if result.timed_out else f"exit code {result.returncode}"
+            logger.warning("Unquiesce hook %s failed (%s)", hook.name, reason)
+            failures.append(f"hook/{hook.name}: unquiesce failed ({reason})")
+        return failures
+
+    async def _release_held(self, hook: QuiesceHook, proc: asyncio.subprocess.Process) -> list[str]:
+        """Close a hold hook's stdin and wait for it to exit, killing it on timeout."""
+        if proc.returncode is not None:
+            logger.warning("Quiesce hook %s exited before it was released", hook.name)
+            return [f"hook/{hook.name}: exited during the backup (exit code {proc.returncode})"]
+
+        cast("asyncio.StreamWriter", proc.stdin).close()
+        try:
+            await asyncio.wait_for(proc.communicate(), hook.timeout_seconds)
+        except TimeoutError:
+            await kill_process_group(proc)
+            logger.warning("Quiesce hook %s did not exit after release; killed", hook.name)
+            return [f"hook/{hook.name}: did not exit after release"]
+        return []
+
+    def _argv(
+        self, hook: QuiesceHook, command: list[str], namespace: str | None, *, stdin: bool
+    ) -> list[str]:
+        """Return the argv running a hook command on the host or in its deployment's pod."""
+        if hook.deployment is None:
+            return command
+        if namespace is None:
+            message = f"Quiesce hook {hook.name} has no Kubernetes namespace"
+            raise QuiesceHookError(message)
+        return self.kubernetes.exec_command(
+            namespace, hook.deployment, command, container=hook.container, stdin=stdin
+        )
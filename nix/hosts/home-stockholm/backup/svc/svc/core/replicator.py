@@ -0,0 +1,84 @@
+"""Replication of service snapshots between restic repositories."""
+
+import asyncio
+import logging
+from datetime import UTC, datetime, timedelta
+
+from ..config import RetentionPolicy, ServiceConfig
+from ..controllers import ResticRunner, ResticSnapshot, parse_snapshot_time
+
+logger = logging.getLogger("svc.core.replicator")
+
+
+class SnapshotReplicator:
+    """
+    Copy a service's snapshots from one repository to another with `restic copy`.
+
+    Unlike a second `svc backup`, this needs no service downtime and reads no source
+    data: only packs missing from the target repository are sent.
+    """
+
+    def __init__(self, source: ResticRunner, target: ResticRunner):
+        self.source = source
+        self.target = target
+
+    async def missing_snapshots(self, svc: ServiceConfig, now: datetime | None = None) -> list[str]:
+        """
+        Return the IDs of source snapshots of the service that the target lacks.
+
+        Snapshots are matched by time and tree, which `restic copy` preserves, so a
+        snapshot an interrupted copy left behind is picked up by the next run, however
+        old. Only snapshots older than the service's retention window are left out,
+        since the target's retention would forget them again.
+        """
+        tag = ",".join(svc.backup.tags)
+        source, target = await asyncio.gather(
+            self.source.snapshots([tag]), self.target.snapshots([tag])
+        )
+
+        present = {_snapshot_key(snap) for snap in target}
+        cutoff = _retention_cutoff(svc.backup.policy, now or datetime.now(UTC))
+
+        missing: list[str] = []
+        for snap in source:
+            snap_id = snap.get("id")
+            if snap_id is None or _snapshot_key(snap) in present:
+                continue
+            snap_time = parse_snapshot_time(snap.get("time"))
+            if cutoff is not None and snap_time is not None and snap_time < cutoff:
+                continue
+            missing.append(snap_id)
+        return missing
+
+    async def copy(self, snapshot_ids: list[str]) -> int:
+        """Copy snapshots from the source into the target repository."""
+        logger.info("Copying %s snapshot(s)...", len(snapshot_ids))
+        return await self.target.copy(self.source, snapshot_ids)
+
+
+def _retention_cutoff(policy: RetentionPolicy | None, now: datetime) -> datetime | None:
+    """
+    Return the start of the span a retention policy keeps snapshots for.
+
+    None when the policy keeps snapshots by count only (or there is no policy), in
+    which case nothing is left out.
+    """
+    if policy is None:
+        return None
+    spans = [
+        timedelta(hours=count) * unit
+        for count, unit in (
+            (policy.hourly, 1),
+            (policy.daily, 24),
+            (policy.weekly, 24 * 7),
+            (policy.monthly, 24 * 31),
+            (policy.yearly, 24 * 366),
+        )
+        if count
+    ]
+    return now - max(spans) if spans else None
+
+
+def _snapshot_key(snap: ResticSnapshot) -> tuple[str, str]:
+    """Identify a snapshot across repositories."""
+    return snap.get("time", ""), snap.get("tree", "")
@@ -6,15 +6,30 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, cast
 
-from ..config import Config, ServiceConfig
-from ..controllers import DeploymentScale, KubernetesController, ResticRunner
+from ..config import Config, ServiceConfig, VaultRaftSource
+from ..controllers import (
+    STREAM_TAG,
+    DeploymentScale,
+    KubernetesController,
+    ResticRunner,
+    ResticSnapshot,
+    VaultController,
+    parse_snapshot_time,
+)
 from ..exceptions import (
     EXIT_CONFIG_ERROR,
     EXIT_RESTIC_ERROR,
     EXIT_SUCCESS,
-    KubernetesError,
 )
-from .path_resolver import PathResolver, ResolvedPath
+from .deployment_scaler import DeploymentScaler
+from .path_resolver import (
+    PathResolver,
+    ResolvedPath,
+    missing_targets,
+    normalize_path,
+    stable_pvc_path,
+)
+from .target_schedule import drop_missing_regenerable
 
 logger = logging.getLogger("svc.core.restore")
 
@@ -41,6 +56,79 @@ class KubernetesRestoreTarget:
     current_path: str
 
 
+@dataclass
+class RestoreSource:
+    """
+    The snapshots a restore reads from.
+
+    `members` are the resolved snapshot itself, or every shard of a sharded backup;
+    each path is read from the member holding it. `fallbacks` map targets that no
+    member holds (e.g. a weekly target left out of a nightly run) to the latest
+    earlier snapshot that does.
+    """
+
+    snapshot_id: str
+    members: list[ResticSnapshot] = field(default_factory=lambda: cast("list[ResticSnapshot]", []))
+    fallbacks: dict[str, str] = field(default_factory=lambda: cast("dict[str, str]", {}))
+
+    @property
+    def sharded(self) -> bool:
+        """Return True if the snapshot is one shard of several."""
+        return len(self.members) > 1
+
+    def holds(self, path: str) -> bool:
+        """Return True if some snapshot holds a path (or, if it is split, part of it)."""
+        return path in self.fallbacks or any(
+            _holds(member, path) or _holds_part(member, path) for member in self.members
+        )
+
+    def snapshot_for(self, path: str) -> str:
+        """
+        Return the ID of the snapshot holding a path.
+
+        A path split across shards (e.g. a target sharded by directory) maps to the
+        first shard holding part of it.
+        """
+        if path in self.fallbacks:
+            return self.fallbacks[path]
+        holding = [member for member in self.members if _holds(member, path)]
+        partial = [member for member in self.members if _holds_part(member, path)]
+        for member in [*holding, *partial]:
+            member_id = member.get("id")
+            if member_id:
+                return member_id
+        return self.snapshot_id
+
+    def path_restores(self, include_paths: list[str]) -> list[tuple[str, list[str]]]:
+        """
+        Split include paths into (snapshot ID, include paths) restores.
+
+        A shard restores the parts of the include paths it holds: its own paths
+        below an include path, or an include path below one of its paths.
+        """
+        restores = [
+            (snapshot_id, [path])
+            for path, snapshot_id in self.fallbacks.items()
+            if path in include_paths
+        ]
+        remaining = [path for path in include_paths if path not in self.fallbacks]
+        if not self.sharded:
+            return [(self.snapshot_id, remaining), *restores] if remaining else restores
+
+        for member in self.members:
+            member_id = member.get("id")
+            includes = [
+                path
+                for member_path in member.get("paths", [])
+                for include in remaining
+                for path in (member_path, include)
+                if _is_within(path, include) and _is_within(path, member_path)
+            ]
+            if member_id and includes:
+                restores.append((member_id, list(dict.fromkeys(includes))))
+        return restores
+
+
 class RestoreOrchestrator:
     """Orchestrates restore operations for services."""
 
@@ -55,6 +143,7 @@ class RestoreOrchestrator:
         self.restic = restic
         self.kubernetes = kubernetes
         self.path_resolver = path_resolver
+        self.scaler = DeploymentScaler(kubernetes)
 
     async def resolve_snapshot(
         self, svc: ServiceConfig, snapshot_spec: str
@@ -75,10 +164,10 @@ class RestoreOrchestrator:
         return snapshot_spec, None
 
     async def verify_snapshot_includes(
-        self, snapshot_id: str, include_paths: list[str]
+        self, source: RestoreSource, include_paths: list[str]
     ) -> list[str]:
         """
-        Verify which paths exist in the snapshot.
+        Verify which paths exist in the snapshot (or the shard holding each path).
 
         Returns:
             List of paths that are missing from the snapshot.
@@ -86,7 +175,7 @@ class RestoreOrchestrator:
         """
         missing: list[str] = []
         for p in include_paths:
-            result = await self.restic.ls(snapshot_id, path=p)
+            result = await self.restic.ls(source.snapshot_for(p), path=p)
             if result.returncode != 0:
                 missing.append(p)
         return missing
@@ -96,6 +185,7 @@ class RestoreOrchestrator:
         svc: ServiceConfig,
         snapshot_spec: str,
         verify_includes: bool = False,
+        vault_token_file: str | None = None,
     ) -> RestoreResult:
         """
         Execute restore for a single service.
@@ -105,7 +195,16 @@ class RestoreOrchestrator:
         - Path validation
         - Kubernetes deployment scaling (if configured)
         - Restic restore execution
+
+        Services backed up by the Vault raft source are restored through the
+        Vault API instead (`restore_vault_raft()`), authenticated by
+        `vault_token_file`.
         """
+        if svc.backup.vault_raft is not None:
+            return await self.restore_vault_raft(
+                svc, svc.backup.vault_raft, snapshot_spec, vault_token_file
+            )
+
         snapshot_id, error = await self.resolve_snapshot(svc, snapshot_spec)
         if error or not snapshot_id:
             message = error or "Failed to resolve snapshot"
@@ -115,14 +214,25 @@ class RestoreOrchestrator:
                 exit_code=EXIT_RESTIC_ERROR,
                 message=message,
             )
+        source = RestoreSource(snapshot_id, await self.restic.snapshot_group(snapshot_id))
+        if source.sharded:
+            logger.info("Snapshot %s is one of %s shards", snapshot_id[:8], len(source.members))
 
-        resolved, missing = await self.path_resolver.resolve_all(
+        resolved, _ = await self.path_resolver.resolve_all(
             svc.restore.paths, svc.restore.kubernetes
         )
+        resolved = drop_missing_regenerable(svc, resolved)
+        missing = missing_targets(resolved)
         include_paths = [
             r.filesystem_path for r in resolved if r.source_type != "kubernetes-pvc"
         ]
-        kubernetes_targets = await self._kubernetes_restore_targets(snapshot_id, svc, resolved)
+        kubernetes_targets = await self._kubernetes_restore_targets(source, svc, resolved)
+        await self._add_fallbacks(
+            svc, source, [*include_paths, *(t.snapshot_path for t in kubernetes_targets)]
+        )
+        include_paths, kubernetes_targets = self._drop_unavailable_regenerable(
+            svc, source, include_paths, kubernetes_targets
+        )
         restore_paths = include_paths + [t.current_path for t in kubernetes_targets]
         snapshot_paths = include_paths + [t.snapshot_path for t in kubernetes_targets]
 
@@ -134,16 +244,16 @@ class RestoreOrchestrator:
 
         missing_in_snapshot: list[str] = []
         if verify_includes:
-            missing_in_snapshot = await self.verify_snapshot_includes(snapshot_id, snapshot_paths)
+            missing_in_snapshot = await self.verify_snapshot_includes(source, snapshot_paths)
 
         deployment_scales: list[DeploymentScale] = []
         try:
             deployment_scales = await self._scale_down_kubernetes_deployments(svc)
-            status = await self._restore_paths(snapshot_id, include_paths, svc.restore.target)
+            status = await self._restore_paths(source, include_paths, svc.restore.target)
             if status == 0:
-                status = await self._restore_kubernetes_targets(snapshot_id, kubernetes_targets)
+                status = await self._restore_kubernetes_targets(source, kubernetes_targets)
         finally:
-            await self._restore_kubernetes_deployments(deployment_scales)
+            await self._restore_kubernetes_deployments(svc, deployment_scales)
 
         if status != 0:
             message = f"Restore failed for {svc.name} (exit code {status})"
@@ -168,6 +278,140 @@ class RestoreOrchestrator:
             missing_in_snapshot=missing_in_snapshot,
         )
 
+    async def restore_vault_raft(
+        self,
+        svc: ServiceConfig,
+        source: VaultRaftSource,
+        snapshot_spec: str,
+        token_file: str | None,
+    ) -> RestoreResult:
+        """
+        Restore a Vault raft snapshot by piping it into `sys/storage/raft/snapshot-force`.
+
+        Vault keeps running: the snapshot is streamed from restic into the API and
+        never staged on disk. `snapshot-force` is root-equivalent, so the backup
+        token is not used: `token_file` must be given explicitly.
+        """
+        if token_file is None:
+            return RestoreResult(
+                service_name=svc.name,
+                success=False,
+                exit_code=EXIT_CONFIG_ERROR,
+                message=(
+                    f"Restoring {svc.name} needs --vault-token-file with a token allowed "
+                    "to write sys/storage/raft/snapshot-force"
+                ),
+            )
+
+        snapshot_id = snapshot_spec
+        if snapshot_spec == "latest":
+            snapshot_id = await self._latest_stream_snapshot(svc, source.filename)
+            if snapshot_id is None:
+                return RestoreResult(
+                    service_name=svc.name,
+                    success=False,
+                    exit_code=EXIT_RESTIC_ERROR,
+                    message=f"No Vault raft snapshots found for {svc.name} (tag: {svc.restore.tag})",
+                )
+            logger.info(f"Resolved 'latest' to snapshot {snapshot_id[:8]}")
+
+        vault = VaultController(source.address, token_file, curl=source.curl)
+        logger.info("Restoring Vault raft snapshot from %s via snapshot-force...", snapshot_id[:8])
+        status = await self.restic.dump_into(
+            snapshot_id, _stdin_path(source.filename), vault.restore_command()
+        )
+        if status != 0:
+            return RestoreResult(
+                service_name=svc.name,
+                success=False,
+                exit_code=EXIT_RESTIC_ERROR,
+                message=f"Vault raft restore failed for {svc.name} (exit code {status})",
+                snapshot_id=snapshot_id,
+            )
+        return RestoreResult(
+            service_name=svc.name,
+            success=True,
+            exit_code=EXIT_SUCCESS,
+            message=f"Restored Vault raft snapshot for {svc.name} from {snapshot_id[:8]}",
+            snapshot_id=snapshot_id,
+        )
+
+    async def _latest_stream_snapshot(self, svc: ServiceConfig, filename: str) -> str | None:
+        """Return the newest stream snapshot of a service holding `filename`."""
+        path = _stdin_path(filename)
+        candidates = [
+            (snap_time, snap_id)
+            for snap in await self.restic.snapshots([svc.restore.tag, STREAM_TAG])
+            if path in snap.get("paths", [])
+            and (snap_id := snap.get("id"))
+            and (snap_time := parse_snapshot_time(snap.get("time"))) is not None
+        ]
+        return max(candidates)[1] if candidates else None
+
+    async def _add_fallbacks(
+        self, svc: ServiceConfig, source: RestoreSource, paths: list[str]
+    ) -> None:
+        """
+        Find the latest earlier snapshot for each target the resolved snapshot lacks.
+
+        Targets with a weekly or monthly frequency class are not in every snapshot.
+        """
+        absent = [path for path in paths if not source.holds(path)]
+        member_times = [parse_snapshot_time(m.get("time")) for m in source.members]
+        newest = max((t for t in member_times if t is not None), default=None)
+        if not absent or newest is None:
+            return
+
+        candidates = [
+            (snap_time, snap)
+            for snap in await self.restic.snapshots([svc.restore.tag])
+            if (snap_time := parse_snapshot_time(snap.get("time"))) is not None
+            and snap_time <= newest
+        ]
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        for path in absent:
+            for _, snap in candidates:
+                snap_id = snap.get("id")
+                if snap_id and _holds(snap, path):
+                    logger.info("Reading %s from earlier snapshot %s", path, snap_id[:8])
+                    source.fallbacks[path] = snap_id
+                    break
+
+    def _drop_unavailable_regenerable(
+        self,
+        svc: ServiceConfig,
+        source: RestoreSource,
+        include_paths: list[str],
+        kubernetes_targets: list[KubernetesRestoreTarget],
+    ) -> tuple[list[str], list[KubernetesRestoreTarget]]:
+        """Leave out regenerable targets that no snapshot holds; they can be rebuilt."""
+        regenerable = {
+            name
+            for name, target_class in svc.backup.target_classes.items()
+            if target_class.regenerable
+        }
+        if not regenerable or not source.members:
+            return include_paths, kubernetes_targets
+
+        regenerable_paths = {normalize_path(name) for name in regenerable}
+        kept_paths: list[str] = []
+        for path in include_paths:
+            if path in regenerable_paths and not source.holds(path):
+                logger.warning("No snapshot holds regenerable %s; not restoring it", path)
+                continue
+            kept_paths.append(path)
+
+        kept_targets: list[KubernetesRestoreTarget] = []
+        for target in kubernetes_targets:
+            pvc = target.source_name.partition("/")[2]
+            if pvc in regenerable and not source.holds(target.snapshot_path):
+                logger.warning(
+                    "No snapshot holds regenerable %s; not restoring it", target.source_name
+                )
+                continue
+            kept_targets.append(target)
+        return kept_paths, kept_targets
+
     def _validate_include_paths(
         self,
         svc: ServiceConfig,
@@ -213,17 +457,18 @@ class RestoreOrchestrator:
             logger.info("  %s -> %s", target.snapshot_path, target.current_path)
 
     async def _restore_paths(
-        self, snapshot_id: str, include_paths: list[str], target: str
+        self, source: RestoreSource, include_paths: list[str], target: str
     ) -> int:
-        """Restore raw filesystem path targets."""
-        if not include_paths:
-            return 0
-
-        logger.info("Running restic restore...")
-        return await self.restic.restore(snapshot_id, include_paths, target)
+        """Restore raw filesystem path targets, shard by shard for sharded snapshots."""
+        for snapshot_id, includes in source.path_restores(include_paths):
+            logger.info("Running restic restore from %s...", snapshot_id[:8])
+            status = await self.restic.restore(snapshot_id, includes, target)
+            if status != 0:
+                return status
+        return 0
 
     async def _restore_kubernetes_targets(
-        self, snapshot_id: str, targets: list[KubernetesRestoreTarget]
+        self, source: RestoreSource, targets: list[KubernetesRestoreTarget]
     ) -> int:
         """Restore Kubernetes PVC targets using restic subfolder restore."""
         for target in targets:
@@ -234,7 +479,7 @@ class RestoreOrchestrator:
                 target.current_path,
             )
             status = await self.restic.restore_subfolder(
-                snapshot_id,
+                source.snapshot_for(target.snapshot_path),
                 target.snapshot_path,
                 target.current_path,
                 delete=True,
@@ -245,12 +490,13 @@ class RestoreOrchestrator:
 
     async def _kubernetes_restore_targets(
         self,
-        snapshot_id: str,
+        source: RestoreSource,
         svc: ServiceConfig,
         resolved: list[ResolvedPath],
     ) -> list[KubernetesRestoreTarget]:
         """Build Kubernetes restore targets from snapshot metadata and current PVC paths."""
-        metadata = await self._load_backup_metadata(snapshot_id, svc.name)
+        metadata_path = str(self._backup_metadata_path(svc.name))
+        metadata = await self._load_backup_metadata(source.snapshot_for(metadata_path), svc.name)
         snapshot_paths = self._snapshot_pvc_paths(metadata)
         targets: list[KubernetesRestoreTarget] = []
 
@@ -261,13 +507,29 @@ class RestoreOrchestrator:
             targets.append(
                 KubernetesRestoreTarget(
                     source_name=item.source_name,
-                    snapshot_path=snapshot_paths.get(item.source_name, item.filesystem_path),
+                    snapshot_path=self._pvc_snapshot_path(svc.name, item, snapshot_paths),
                     current_path=item.filesystem_path,
                 )
             )
 
         return targets
 
+    def _pvc_snapshot_path(
+        self, service_name: str, item: ResolvedPath, snapshot_paths: dict[str, str]
+    ) -> str:
+        """
+        Return the path a PVC is recorded under in the snapshot.
+
+        PVCs missing from metadata that lists others were left out of that backup
+        (by frequency class); they are found in earlier snapshots under their
+        stable path. Without metadata, PVCs were recorded under their PV path.
+        """
+        if item.source_name in snapshot_paths:
+            return snapshot_paths[item.source_name]
+        if snapshot_paths:
+            return stable_pvc_path(self.config.paths.mount_root, service_name, item.source_name)
+        return item.filesystem_path
+
     async def _load_backup_metadata(
         self, snapshot_id: str, service_name: str
     ) -> dict[str, Any]:
@@ -316,46 +578,32 @@ class RestoreOrchestrator:
         kubernetes = svc.restore.kubernetes
         if kubernetes is None:
             return []
-
-        original_scales: list[DeploymentScale] = []
-        try:
-            for deployment in kubernetes.deployments:
-                scale = await self.kubernetes.deployment_scale(kubernetes.namespace, deployment)
-                original_scales.append(scale)
-                if scale.replicas == 0:
-                    continue
-
-                await self.kubernetes.scale_deployment(scale, 0)
-                await self.kubernetes.wait_for_deployment_replicas(
-                    scale.namespace,
-                    scale.name,
-                    0,
-                )
-        except KubernetesError:
-            await self._restore_kubernetes_deployments(original_scales)
-            raise
-
-        return original_scales
+        return await self.scaler.scale_down(kubernetes)
 
     async def _restore_kubernetes_deployments(
-        self, deployment_scales: list[DeploymentScale]
+        self, svc: ServiceConfig, deployment_scales: list[DeploymentScale]
     ) -> None:
         """Restore Kubernetes deployments to their original replica counts."""
-        for scale in reversed(deployment_scales):
-            if scale.replicas == 0:
-                continue
+        kubernetes = svc.restore.kubernetes
+        depends_on = kubernetes.depends_on if kubernetes is not None else {}
+        await self.scaler.restore(deployment_scales, depends_on)
 
-            try:
-                await self.kubernetes.scale_deployment(scale, scale.replicas)
-                await self.kubernetes.wait_for_deployment_replicas(
-                    scale.namespace,
-                    scale.name,
-                    scale.replicas,
-                )
-            except KubernetesError as error:
-                logger.warning(
-                    "Failed to restore deployment/%s in %s: %s",
-                    scale.name,
-                    scale.namespace,
-                    error,
-                )
+
+def _is_within(path: str, root: str) -> bool:
+    """Return True if `path` is `root` or below it."""
+    return path == root or path.startswith(root.rstrip("/") + "/")
+
+
+def _holds(snapshot: ResticSnapshot, path: str) -> bool:
+    """Return True if a snapshot's paths contain `path`."""
+    return any(_is_within(path, snapshot_path) for snapshot_path in snapshot.get("paths", []))
+
+
+def _holds_part(snapshot: ResticSnapshot, path: str) -> bool:
+    """Return True if a snapshot holds something below `path` (e.g. one of its shards)."""
+    return any(_is_within(snapshot_path, path) for snapshot_path in snapshot.get("paths", []))
+
+
+def _stdin_path(filename: str) -> str:
+    """Return the path restic records a `--stdin-filename` under."""
+    return "/" + filename.lstrip("/")
@@ -0,0 +1,100 @@
+"""Weighted concurrent scheduling of per-service backup jobs."""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Sequence
+from typing import TypeVar
+
+from ..config import ServiceConfig
+
+logger = logging.getLogger("svc.core.scheduler")
+
+TResult = TypeVar("TResult")
+
+
+class BackupScheduler:
+    """
+    Run per-service jobs concurrently under a weighted concurrency limit.
+
+    Each service consumes `backup.weight` slots (capped at the limit) while it runs,
+    so heavy services such as large media libraries can claim more of the budget.
+    Services are dispatched heaviest first, which keeps the total run close to the
+    longest single service rather than the sum of all of them.
+    """
+
+    def __init__(self, concurrency: int = 1):
+        if concurrency < 1:
+            message = f"Backup concurrency must be at least 1 (got {concurrency})"
+            raise ValueError(message)
+        self.concurrency = concurrency
+        self._available = concurrency
+        self._condition = asyncio.Condition()
+
+    def weight(self, svc: ServiceConfig) -> int:
+        """Return the number of slots a service occupies while running."""
+        return max(1, min(svc.backup.weight, self.concurrency))
+
+    def dispatch_order(self, services: Sequence[ServiceConfig]) -> list[int]:
+        """Return service indices in dispatch order (heaviest first, stable)."""
+        return sorted(range(len(services)), key=lambda i: -self.weight(services[i]))
+
+    async def run(
+        self,
+        services: Sequence[ServiceConfig],
+        job: Callable[[ServiceConfig], Awaitable[TResult]],
+    ) -> list[TResult]:
+        """
+        Run `job` for every service and return results in input order.
+
+        If a job raises, no further services are started; jobs already running are
+        allowed to finish (so they can restore their deployments) before the first
+        exception is re-raised.
+        """
+        results: dict[int, TResult] = {}
+        running: set[asyncio.Task[None]] = set()
+        failure: BaseException | None = None
+
+        async def run_one(index: int, weight: int) -> None:
+            try:
+                results[index] = await job(services[index])
+            finally:
+                await self._release(weight)
+
+        for index in self.dispatch_order(services):
+            weight = self.weight(services[index])
+            await self._acquire(weight)
+            failure = failure or self._first_failure(running)
+            if failure is not None:
+                await self._release(weight)
+                break
+
+            logger.debug("Starting %s (weight %s)", services[index].name, weight)
+            task = asyncio.create_task(run_one(index, weight), name=services[index].name)
+            running.add(task)
+
+        if running:
+            await asyncio.wait(running)
+        failure = failure or self._first_failure(running)
+        if failure is not None:
+            raise failure
+
+        return [results[i] for i in range(len(services))]
+
+    def _first_failure(self, tasks: set[asyncio.Task[None]]) -> BaseException | None:
+        """Return the exception of the first finished task that failed."""
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                return task.exception()
+        return None
+
+    async def _acquire(self, weight: int) -> None:
+        """Wait until `weight` slots are free and claim them."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._available >= weight)
+            self._available -= weight
+
+    async def _release(self, weight: int) -> None:
+        """Return `weight` slots and wake waiting dispatchers."""
+        async with self._condition:
+            self._available += weight
+            self._condition.notify_all()
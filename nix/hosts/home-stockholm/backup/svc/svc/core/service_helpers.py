@@ -2,9 +2,13 @@
 
 import os
 
-from ..config import Config, ServiceConfig
+from ..config import Config, ServiceConfig, StreamSource, validate_model
+from ..controllers import VaultController
 from ..exceptions import ServiceNotFoundError, SvcPermissionError
 
+# Name of the stream source of the built-in Vault raft snapshot source
+VAULT_RAFT_STREAM = "vault-raft"
+
 
 def validate_service(config: Config, service_name: str) -> ServiceConfig:
     """
@@ -47,3 +51,22 @@ def require_root(operation: str) -> None:
     if os.geteuid() != 0:
         message = f"{operation} requires root privileges. Try: sudo svc ..."
         raise SvcPermissionError(message)
+
+
+def stream_sources(svc: ServiceConfig) -> list[StreamSource]:
+    """Return the stream sources of a service, including those of built-in sources."""
+    streams = list(svc.backup.streams)
+    vault_raft = svc.backup.vault_raft
+    if vault_raft is not None:
+        vault = VaultController(vault_raft.address, vault_raft.token_path, curl=vault_raft.curl)
+        streams.append(
+            validate_model(
+                StreamSource,
+                {
+                    "name": VAULT_RAFT_STREAM,
+                    "command": vault.snapshot_command(),
+                    "filename": vault_raft.filename,
+                },
+            )
+        )
+    return streams
@@ -0,0 +1,72 @@
+"""Splitting of a service's backup targets into independently snapshotted shards."""
+
+import hashlib
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+from ..controllers import SHARD_TAG_PREFIX
+
+
+@dataclass(frozen=True)
+class Shard:
+    """A set of snapshot paths backed up as one restic snapshot."""
+
+    # Stable name, used in results and to find the shard's parent snapshot
+    name: str
+    # Backup target (snapshot path) the paths belong to
+    target: str
+    paths: list[str]
+
+    @property
+    def tag(self) -> str:
+        """Return the restic tag identifying this shard across runs."""
+        digest = hashlib.blake2b(self.name.encode(), digest_size=8).hexdigest()
+        return f"{SHARD_TAG_PREFIX}{digest}"
+
+
+def plan_shards(
+    targets: Mapping[str, str],
+    read_paths: Mapping[str, str],
+    by: Literal["target", "directory"],
+) -> list[Shard]:
+    """
+    Split backup targets (snapshot path -> host path) into shards.
+
+    With `by="target"` every target is a shard of its own. With `by="directory"`,
+    plain directory targets are further split into one shard per top-level
+    subdirectory, plus one for the files directly inside them; targets recorded
+    under another path (PVC aliases) stay whole so they restore from one tree.
+    Entries are listed from `read_paths` (e.g. a frozen view) where given.
+    """
+    shards: list[Shard] = []
+    for path, source in targets.items():
+        read_path = read_paths.get(source, source)
+        if by == "target" or path != source or not Path(read_path).is_dir():
+            shards.append(Shard(name=path, target=path, paths=[path]))
+            continue
+        shards.extend(_directory_shards(path, read_path))
+    return shards
+
+
+def _directory_shards(path: str, read_path: str) -> list[Shard]:
+    """Split one directory target into per-subdirectory shards."""
+    subdirs: list[str] = []
+    files: list[str] = []
+    with os.scandir(read_path) as entries:
+        for entry in entries:
+            snapshot_path = str(Path(path) / entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(snapshot_path)
+            else:
+                files.append(snapshot_path)
+
+    if not subdirs:
+        return [Shard(name=path, target=path, paths=[path])]
+
+    shards = [Shard(name=subdir, target=path, paths=[subdir]) for subdir in sorted(subdirs)]
+    if files:
+        shards.append(Shard(name=f"{path}/*", target=path, paths=sorted(files)))
+    return shards
@@ -0,0 +1,389 @@
+"""Point-in-time snapshot providers used to shorten backup downtime."""
+
+import asyncio
+import logging
+import os
+import shutil
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import ClassVar
+
+from ..config import SnapshotConfig
+from ..controllers import ProcessResult, capture_process
+from ..exceptions import SnapshotError
+
+logger = logging.getLogger("svc.core.snapshots")
+
+LVM_MOUNT_ROOT = "/run/svc/snapshots"
+STAGING_DIRNAME = ".svc-snapshots"
+
+# Inode number of every btrfs subvolume root (BTRFS_FIRST_FREE_OBJECTID).
+BTRFS_SUBVOLUME_INODE = 256
+REFLINK_FILESYSTEMS = frozenset({"btrfs", "xfs", "bcachefs"})
+
+
+@dataclass(frozen=True)
+class MountInfo:
+    """A mount from /proc/self/mountinfo."""
+
+    mount_point: str
+    root: str
+    fstype: str
+    device: str
+
+
+def mount_for(path: str, mountinfo: str = "/proc/self/mountinfo") -> MountInfo:
+    """Return the mount containing `path` (longest matching mount point)."""
+    target = os.path.realpath(path)
+    best: MountInfo | None = None
+    with Path(mountinfo).open() as f:
+        for line in f:
+            fields = line.split()
+            separator = fields.index("-")
+            mount_point = _unescape(fields[4])
+            if not _is_within(target, mount_point):
+                continue
+            if best is None or len(mount_point) >= len(best.mount_point):
+                best = MountInfo(
+                    mount_point=mount_point,
+                    root=_unescape(fields[3]),
+                    fstype=fields[separator + 1],
+                    device=_unescape(fields[separator + 2]),
+                )
+
+    if best is None:
+        message = f"No mount found for {path}"
+        raise SnapshotError(message)
+    return best
+
+
+class SnapshotProvider(ABC):
+    """Creates point-in-time views of paths on one kind of filesystem."""
+
+    name: ClassVar[str]
+    # Whether unchanged files keep their inode/ctime in the view across runs.
+    stable_inodes: ClassVar[bool] = True
+
+    def __init__(self, service_name: str, staging_dir: str | None, *, dry_run: bool):
+        self.service_name = service_name
+        self.staging_dir = staging_dir
+        self.dry_run = dry_run
+
+    @abstractmethod
+    async def supports(self, mount: MountInfo) -> bool:
+        """Return whether this provider can snapshot paths on `mount`."""
+        ...
+
+    @abstractmethod
+    async def create(self, source: str, mount: MountInfo) -> str:
+        """Freeze `source` (an already resolved path) and return its point-in-time view."""
+        ...
+
+    async def release(self) -> None:
+        """Remove views created by this provider (no-op for persistent staging)."""
+        return
+
+    def staging_path(self, mount: MountInfo, source: str) -> Path:
+        """Return a stable per-service staging location on the source filesystem."""
+        root = Path(self.staging_dir or Path(mount.mount_point) / STAGING_DIRNAME)
+        return root / self.service_name / _flatten(source)
+
+    async def run(self, args: list[str], *, check: bool = True) -> ProcessResult:
+        """Run a helper command, raising SnapshotError on failure when `check`."""
+        logger.debug("Running: %s", " ".join(args))
+        if self.dry_run:
+            logger.info("[DRY RUN] Would run: %s", " ".join(args))
+            return ProcessResult(returncode=0)
+
+        try:
+            result = await capture_process(args)
+        except FileNotFoundError as error:
+            message = f"{args[0]} not found"
+            raise SnapshotError(message) from error
+
+        if check and result.returncode != 0:
+            message = result.stderr.strip() or f"{' '.join(args)} failed"
+            raise SnapshotError(message)
+        return result
+
+
+class LvmThinSnapshotProvider(SnapshotProvider):
+    """Snapshot the thin logical volume holding a path and mount it read-only."""
+
+    name = "lvm"
+
+    def __init__(self, service_name: str, staging_dir: str | None, *, dry_run: bool):
+        super().__init__(service_name, staging_dir, dry_run=dry_run)
+        self._volumes: dict[str, tuple[str, Path]] = {}
+
+    async def supports(self, mount: MountInfo) -> bool:
+        return await self._thin_volume(mount.device) is not None
+
+    async def create(self, source: str, mount: MountInfo) -> str:
+        if mount.device not in self._volumes:
+            volume = await self._thin_volume(mount.device)
+            if volume is None:
+                message = f"{mount.device} is not an LVM thin volume"
+                raise SnapshotError(message)
+            self._volumes[mount.device] = await self._snapshot_volume(*volume, mount)
+
+        _, mount_dir = self._volumes[mount.device]
+        relative = Path(source).relative_to(mount.mount_point)
+        return str(mount_dir / mount.root.lstrip("/") / relative)
+
+    async def release(self) -> None:
+        for snapshot, mount_dir in self._volumes.values():
+            await self.run(["umount", str(mount_dir)], check=False)
+            await self.run(["lvremove", "--yes", snapshot], check=False)
+        self._volumes.clear()
+
+    async def _thin_volume(self, device: str) -> tuple[str, str] | None:
+        """Return (vg, lv) if `device` is an LVM thin volume."""
+        if not device.startswith("/dev/") or shutil.which("lvs") is None:
+            return None
+        result = await capture_process(
+            ["lvs", "--noheadings", "--separator", ";", "-o", "vg_name,lv_name,segtype", device]
+        )
+        if result.returncode != 0:
+            return None
+        vg, _, rest = result.stdout.strip().partition(";")
+        lv, _, segtype = rest.partition(";")
+        return (vg, lv) if segtype == "thin" else None
+
+    async def _snapshot_volume(self, vg: str, lv: str, mount: MountInfo) -> tuple[str, Path]:
+        """Create and mount a read-only thin snapshot of vg/lv."""
+        snapshot_lv = f"{lv}-svc-{self.service_name}"
+        snapshot = f"{vg}/{snapshot_lv}"
+        mount_dir = Path(LVM_MOUNT_ROOT) / self.service_name / snapshot_lv
+
+        # Clean up after an interrupted run before reusing the name.
+        await self.run(["umount", str(mount_dir)], check=False)
+        await self.run(["lvremove", "--yes", snapshot], check=False)
+
+        await self.run(
+            [
+                "lvcreate",
+                "--snapshot",
+                "--setactivationskip",
+                "n",
+                "--name",
+                snapshot_lv,
+                f"{vg}/{lv}",
+            ]
+        )
+        options = ["ro"]
+        if mount.fstype == "xfs":
+            options.append("nouuid")
+        elif mount.fstype.startswith("ext"):
+            options.append("noload")
+        try:
+            if not self.dry_run:
+                mount_dir.mkdir(parents=True, mode=0o700, exist_ok=True)
+            await self.run(
+                ["mount", "-o", ",".join(options), f"/dev/{vg}/{snapshot_lv}", str(mount_dir)]
+            )
+        except SnapshotError:
+            await self.run(["lvremove", "--yes", snapshot], check=False)
+            raise
+        return snapshot, mount_dir
+
+
+class BtrfsSnapshotProvider(SnapshotProvider):
+    """Take a read-only snapshot of the btrfs subvolume holding a path."""
+
+    name = "btrfs"
+
+    def __init__(self, service_name: str, staging_dir: str | None, *, dry_run: bool):
+        super().__init__(service_name, staging_dir, dry_run=dry_run)
+        self._subvolumes: dict[str, Path] = {}
+
+    async def supports(self, mount: MountInfo) -> bool:
+        return mount.fstype == "btrfs"
+
+    async def create(self, source: str, mount: MountInfo) -> str:
+        subvolume = await asyncio.to_thread(_btrfs_subvolume_root, source, mount.mount_point)
+        if subvolume not in self._subvolumes:
+            dest = self.staging_path(mount, subvolume)
+            if await asyncio.to_thread(dest.exists):
+                await self.run(["btrfs", "subvolume", "delete", str(dest)])
+            if not self.dry_run:
+                dest.parent.mkdir(parents=True, mode=0o700, exist_ok=True)
+            await self.run(["btrfs", "subvolume", "snapshot", "-r", subvolume, str(dest)])
+            self._subvolumes[subvolume] = dest
+
+        return str(self._subvolumes[subvolume] / Path(source).relative_to(subvolume))
+
+    async def release(self) -> None:
+        for dest in self._subvolumes.values():
+            await self.run(["btrfs", "subvolume", "delete", str(dest)], check=False)
+        self._subvolumes.clear()
+
+
+class ReflinkCopyProvider(SnapshotProvider):
+    """Clone a path with copy-on-write reflinks (metadata-only copy)."""
+
+    name = "reflink"
+    stable_inodes = False
+
+    def __init__(self, service_name: str, staging_dir: str | None, *, dry_run: bool):
+        super().__init__(service_name, staging_dir, dry_run=dry_run)
+        self._views: list[Path] = []
+
+    async def supports(self, mount: MountInfo) -> bool:
+        return mount.fstype in REFLINK_FILESYSTEMS
+
+    async def create(self, source: str, mount: MountInfo) -> str:
+        dest = self.staging_path(mount, source)
+        if not self.dry_run:
+            await asyncio.to_thread(_remove_path, dest)
+            dest.parent.mkdir(parents=True, mode=0o700, exist_ok=True)
+        await self.run(["cp", "-a", "--reflink=always", source, str(dest)])
+        self._views.append(dest)
+        return str(dest)
+
+    async def release(self) -> None:
+        if not self.dry_run:
+            for dest in self._views:
+                await asyncio.to_thread(_remove_path, dest)
+        self._views.clear()
+
+
+class StagedCopyProvider(SnapshotProvider):
+    """
+    Mirror a path into a persistent staging copy with rsync.
+
+    The staging copy is kept between runs, so each freeze only copies what changed
+    since the last one and unchanged files keep their inodes for restic.
+    """
+
+    name = "copy"
+
+    async def supports(self, mount: MountInfo) -> bool:
+        del mount
+        return True
+
+    async def create(self, source: str, mount: MountInfo) -> str:
+        dest = self.staging_path(mount, source)
+        is_dir = await asyncio.to_thread(Path(source).is_dir)
+        if not self.dry_run:
+            dest.parent.mkdir(parents=True, mode=0o700, exist_ok=True)
+        src_arg, dest_arg = (f"{source}/", f"{dest}/") if is_dir else (source, str(dest))
+        await self.run(
+            [
+                "rsync",
+                "--archive",
+                "--hard-links",
+                "--acls",
+                "--xattrs",
+                "--numeric-ids",
+                "--delete",
+                src_arg,
+                dest_arg,
+            ]
+        )
+        return str(dest)
+
+
+PROVIDERS: dict[str, type[SnapshotProvider]] = {
+    provider.name: provider
+    for provider in (
+        LvmThinSnapshotProvider,
+        BtrfsSnapshotProvider,
+        ReflinkCopyProvider,
+        StagedCopyProvider,
+    )
+}
+
+
+class FrozenView:
+    """
+    Point-in-time views of a service's backup paths.
+
+    `views` maps each original path to the path holding its frozen contents; restic
+    is pointed at the views through bind mounts so snapshot paths stay unchanged.
+    """
+
+    def __init__(self, service_name: str, config: SnapshotConfig, *, dry_run: bool):
+        self.service_name = service_name
+        self.config = config
+        self.dry_run = dry_run
+        self.views: dict[str, str] = {}
+        self._providers: dict[str, SnapshotProvider] = {}
+
+    @property
+    def stable_inodes(self) -> bool:
+        """Whether restic can trust inode/ctime of files in the views."""
+        return all(p.stable_inodes for p in self._providers.values())
+
+    async def freeze(self, paths: list[str]) -> None:
+        """Create views for all paths, releasing partial work on failure."""
+        try:
+            for path in paths:
+                real = await asyncio.to_thread(os.path.realpath, path)
+                mount = await asyncio.to_thread(mount_for, real)
+                provider = await self._provider_for(mount)
+                self.views[path] = await provider.create(real, mount)
+                logger.info("Froze %s with %s -> %s", path, provider.name, self.views[path])
+        except (SnapshotError, OSError) as error:
+            await self.release()
+            if isinstance(error, SnapshotError):
+                raise
+            raise SnapshotError(str(error)) from error
+
+    async def release(self) -> None:
+        """Release all views (logging, not raising, cleanup failures)."""
+        for provider in self._providers.values():
+            try:
+                await provider.release()
+            except (SnapshotError, OSError) as error:
+                logger.warning("Failed to release %s snapshot: %s", provider.name, error)
+        self.views.clear()
+
+    async def _provider_for(self, mount: MountInfo) -> SnapshotProvider:
+        """Pick the configured provider, or the cheapest supported one for `auto`."""
+        names = list(PROVIDERS) if self.config.provider == "auto" else [self.config.provider]
+        for name in names:
+            provider = self._providers.get(name) or PROVIDERS[name](
+                self.service_name, self.config.staging_dir, dry_run=self.dry_run
+            )
+            if await provider.supports(mount):
+                self._providers[name] = provider
+                return provider
+
+        message = f"No {self.config.provider} snapshot provider supports {mount.mount_point} ({mount.fstype})"
+        raise SnapshotError(message)
+
+
+def _btrfs_subvolume_root(path: str, mount_point: str) -> str:
+    """Walk up from `path` to the nearest btrfs subvolume root."""
+    current = Path(path) if Path(path).is_dir() else Path(path).parent
+    while True:
+        if current.stat().st_ino == BTRFS_SUBVOLUME_INODE:
+            return str(current)
+        if str(current) == mount_point or current.parent == current:
+            return str(current)
+        current = current.parent
+
+
+def _remove_path(path: Path) -> None:
+    """Remove a file or directory tree if it exists."""
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    elif path.exists() or path.is_symlink():
+        path.unlink()
+
+
+def _flatten(path: str) -> str:
+    """Turn an absolute path into a single stable directory name."""
+    return path.strip("/").replace("/", "_") or "root"
+
+
+def _is_within(path: str, mount_point: str) -> bool:
+    """Return whether `path` equals or lies below `mount_point`."""
+    return mount_point in {"/", path} or path.startswith(f"{mount_point}/")
+
+
+def _unescape(field: str) -> str:
+    r"""Decode octal escapes (e.g. `\040` for space) used in mountinfo."""
+    return field.encode().decode("unicode_escape") if "\\" in field else field
@@ -0,0 +1,124 @@
+"""Frequency classes of backup targets and when each was last backed up."""
+
+import asyncio
+import json
+import logging
+from collections.abc import Sequence
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, cast
+
+from ..config import ServiceConfig
+from .path_resolver import ResolvedPath, target_key
+
+logger = logging.getLogger("svc.core.target_schedule")
+
+SCHEDULE_VERSION = 1
+
+FREQUENCY_INTERVALS = {
+    "weekly": timedelta(days=7),
+    "monthly": timedelta(days=30),
+}
+
+# Backup timers drift by a few minutes each run; without some slack a weekly target
+# would only be due on the eighth night.
+_SLACK = timedelta(hours=12)
+
+
+class TargetSchedule:
+    """
+    Per-env record of the last successful backup of weekly and monthly targets.
+
+    Records live under `<backup_metadata_root>/target-schedule/<env>/`. Nightly
+    targets are always due and `never` targets never are, so neither is recorded.
+    """
+
+    def __init__(self, metadata_root: str, env: str):
+        self.directory = Path(metadata_root) / "target-schedule" / env
+
+    def deferred(self, svc: ServiceConfig, now: datetime | None = None) -> list[str]:
+        """Return the targets of a service that are not due for backup on this run."""
+        now = now or datetime.now(UTC)
+        last_runs = self._load(svc.name)
+        deferred: list[str] = []
+        for target, target_class in svc.backup.target_classes.items():
+            if target_class.frequency == "never":
+                deferred.append(target)
+                continue
+            interval = FREQUENCY_INTERVALS.get(target_class.frequency)
+            last_run = last_runs.get(target)
+            if interval is not None and last_run is not None and now - last_run < interval - _SLACK:
+                deferred.append(target)
+        return deferred
+
+    async def record(self, service_name: str, targets: Sequence[str]) -> None:
+        """Record that targets were backed up successfully just now."""
+        if targets:
+            await asyncio.to_thread(self._record, service_name, targets)
+
+    def _record(self, service_name: str, targets: Sequence[str]) -> None:
+        """Merge new backup times into a service's record and write it atomically."""
+        last_runs = self._load(service_name)
+        now = datetime.now(UTC)
+        last_runs.update(dict.fromkeys(targets, now))
+
+        self.directory.mkdir(parents=True, mode=0o700, exist_ok=True)
+        record = {
+            "version": SCHEDULE_VERSION,
+            "targets": {target: time.isoformat() for target, time in last_runs.items()},
+        }
+        path = self._record_path(service_name)
+        tmp_path = path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(record, indent=2, sort_keys=True))
+        tmp_path.replace(path)
+
+    def _record_path(self, service_name: str) -> Path:
+        """Return the record file of a service."""
+        return self.directory / f"{service_name}.json"
+
+    def _load(self, service_name: str) -> dict[str, datetime]:
+        """Read a service's record, treating a missing or unreadable one as empty."""
+        try:
+            raw: Any = json.loads(self._record_path(service_name).read_text())
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+        if not isinstance(raw, dict):
+            return {}
+        data = cast("dict[str, Any]", raw)
+        targets: Any = data.get("targets")
+        if data.get("version") != SCHEDULE_VERSION or not isinstance(targets, dict):
+            return {}
+
+        last_runs: dict[str, datetime] = {}
+        for target, value in cast("dict[str, Any]", targets).items():
+            try:
+                last_runs[target] = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                continue
+        return last_runs
+
+
+def scheduled_targets(svc: ServiceConfig, deferred: Sequence[str]) -> list[str]:
+    """Return the weekly and monthly targets of a service that are due on this run."""
+    return [
+        target
+        for target, target_class in svc.backup.target_classes.items()
+        if target_class.frequency in FREQUENCY_INTERVALS and target not in deferred
+    ]
+
+
+def drop_missing_regenerable(
+    svc: ServiceConfig, resolved: list[ResolvedPath]
+) -> list[ResolvedPath]:
+    """Leave out regenerable targets that do not exist (e.g. a cache not built yet)."""
+    kept: list[ResolvedPath] = []
+    for item in resolved:
+        target_class = svc.backup.target_classes.get(target_key(item))
+        if not item.exists and target_class is not None and target_class.regenerable:
+            logger.warning(
+                "Skipping missing regenerable target %s of %s", item.source_name, svc.name
+            )
+            continue
+        kept.append(item)
+    return kept
@@ -63,3 +63,21 @@ class KubernetesError(SvcError):
     """Kubernetes command execution failed."""
 
     exit_code = EXIT_CONFIG_ERROR
+
+
+class SnapshotError(SvcError):
+    """Point-in-time snapshot creation or cleanup failed."""
+
+    exit_code = EXIT_CONFIG_ERROR
+
+
+class CgroupError(SvcError):
+    """cgroup freezer operation failed."""
+
+    exit_code = EXIT_CONFIG_ERROR
+
+
+class QuiesceHookError(SvcError):
+    """Application quiesce hook failed."""
+
+    exit_code = EXIT_CONFIG_ERROR
@@ -3,10 +3,12 @@
 svc - Service backup and restore CLI tool
 
 Commands:
-  svc backup <local|remote> <service|all>
-  svc restore <local|remote> <service> [latest|SNAPSHOT_ID]
+  svc backup [--jobs N] [--async-scale-up] [--force] [--replicate-from local|remote]
+             [--resume [--resume-max-age HOURS]] <local|remote|both> <service|all>
+  svc restore [--vault-token-file FILE] <local|remote> <service> [latest|SNAPSHOT_ID]
   svc list
   svc list-backups <local|remote> <service>
+  svc migrate-pvc [-n NAMESPACE] [--jobs N] <copy|move> <source_pvc> <target_pvc>
 """
 
 import logging
@@ -0,0 +1,179 @@
+"""Tests for the Kubernetes API client against a stand-in API server."""
+
+import asyncio
+import gc
+import json
+import unittest
+import warnings
+from collections.abc import Awaitable, Callable
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from svc.controllers.kube_api import KubeApiClient, ObjectWatch, WatchExpiredError
+
+PODS_PATH = "/api/v1/namespaces/apps/pods"
+
+Handler = Callable[[str, dict[str, str], asyncio.StreamWriter], Awaitable[None]]
+
+
+def _pod(name: str, version: str) -> dict[str, Any]:
+    return {"metadata": {"name": name, "resourceVersion": version}}
+
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, obj: dict[str, Any]) -> None:
+    """Send a JSON response on a keep-alive connection."""
+    body = json.dumps(obj).encode()
+    writer.write(
+        f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+
+
+async def _send_events(
+    writer: asyncio.StreamWriter, events: list[dict[str, Any]], *, hold: bool = False
+) -> None:
+    """Send watch events as a chunked stream, each split across two chunks."""
+    writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n")
+    for event in events:
+        line = json.dumps(event).encode() + b"\n"
+        for part in (line[:7], line[7:]):
+            writer.write(b"%x\r\n%s\r\n" % (len(part), part))
+    await writer.drain()
+    if hold:
+        # Keep the watch open like a real server until the client goes away
+        await asyncio.Event().wait()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+class StandInServer:
+    """HTTP/1.1 server on localhost answering requests with a test's handler."""
+
+    def __init__(self, handler: Handler):
+        self.handler = handler
+        self.connections = 0
+        self.requests: list[tuple[str, dict[str, str]]] = []
+        self._server: asyncio.Server | None = None
+
+    async def __aenter__(self) -> KubeApiClient:
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.client = KubeApiClient(f"http://127.0.0.1:{port}", timeout_seconds=5)
+        return self.client
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.client.close()
+        if self._server is not None:
+            self._server.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while request_line := await reader.readline():
+                while (await reader.readline()) not in {b"\r\n", b""}:
+                    pass
+                url = urlsplit(request_line.split(b" ")[1].decode())
+                query = {name: values[0] for name, values in parse_qs(url.query).items()}
+                self.requests.append((url.path, query))
+                await self.handler(url.path, query, writer)
+                if "watch" in query:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+class KubeApiClientTest(unittest.IsolatedAsyncioTestCase):
+    async def test_requests_reuse_one_connection(self) -> None:
+        async def handler(_path: str, _query: dict[str, str], writer: asyncio.StreamWriter):
+            await _send_json(writer, 200, {"items": [], "metadata": {"resourceVersion": "1"}})
+
+        server = StandInServer(handler)
+        async with server as api:
+            for _ in range(3):
+                await api.get(PODS_PATH)
+        self.assertEqual(server.connections, 1)
+
+    async def test_cancelled_request_closes_its_connection(self) -> None:
+        received = asyncio.Event()
+
+        async def handler(_path: str, _query: dict[str, str], _writer: asyncio.StreamWriter):
+            received.set()
+            await asyncio.Event().wait()
+
+        async with StandInServer(handler) as api:
+            request = asyncio.create_task(api.get(PODS_PATH))
+            await received.wait()
+            request.cancel()
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always", ResourceWarning)
+                with self.assertRaises(asyncio.CancelledError):
+                    await request
+                del request
+                gc.collect()
+        # Closed by the client rather than reclaimed as an unclosed transport
+        self.assertEqual([w for w in caught if w.category is ResourceWarning], [])
+
+    async def test_watch_streams_events_split_across_chunks(self) -> None:
+        async def handler(_path: str, _query: dict[str, str], writer: asyncio.StreamWriter):
+            await _send_events(
+                writer,
+                [
+                    {"type": "ADDED", "object": _pod("a", "2")},
+                    {"type": "BOOKMARK", "object": {"metadata": {"resourceVersion": "3"}}},
+                    {"type": "DELETED", "object": _pod("a", "4")},
+                ],
+            )
+
+        server = StandInServer(handler)
+        async with server as api:
+            events = [
+                (kind, obj["metadata"]["resourceVersion"])
+                async for kind, obj in api.watch(PODS_PATH, {"resourceVersion": "1"})
+            ]
+        self.assertEqual(events, [("ADDED", "2"), ("BOOKMARK", "3"), ("DELETED", "4")])
+        self.assertEqual(server.requests[0][1]["resourceVersion"], "1")
+
+    async def test_watch_raises_expired_on_gone_status(self) -> None:
+        async def handler(_path: str, _query: dict[str, str], writer: asyncio.StreamWriter):
+            await _send_json(writer, 410, {"kind": "Status", "code": 410})
+
+        async with StandInServer(handler) as api:
+            with self.assertRaises(WatchExpiredError):
+                async for _ in api.watch(PODS_PATH, {"resourceVersion": "1"}):
+                    pass
+
+    async def test_object_watch_lists_again_after_expiry(self) -> None:
+        listings = [
+            {"metadata": {"resourceVersion": "1"}, "items": [_pod("a", "1")]},
+            {"metadata": {"resourceVersion": "5"}, "items": [_pod("a", "1"), _pod("b", "5")]},
+        ]
+
+        async def handler(_path: str, query: dict[str, str], writer: asyncio.StreamWriter):
+            if "watch" not in query:
+                await _send_json(writer, 200, listings.pop(0))
+            elif query["resourceVersion"] == "1":
+                gone = {"kind": "Status", "code": 410, "message": "too old resource version"}
+                await _send_events(writer, [{"type": "ERROR", "object": gone}])
+            else:
+                await _send_events(writer, [{"type": "ADDED", "object": _pod("c", "6")}], hold=True)
+
+        server = StandInServer(handler)
+        async with server as api:
+            watch = ObjectWatch(api, PODS_PATH)
+            try:
+                await asyncio.wait_for(watch.wait_until(lambda objects: "c" in objects), 5)
+            finally:
+                await watch.close()
+
+        self.assertEqual(sorted(watch.objects), ["a", "b", "c"])
+        watches = [query["resourceVersion"] for _, query in server.requests if "watch" in query]
+        self.assertEqual(watches, ["1", "5"])
+        self.assertEqual(len(server.requests) - len(watches), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
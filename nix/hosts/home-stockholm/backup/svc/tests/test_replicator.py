@@ -0,0 +1,72 @@
+"""Tests for picking the snapshots to replicate between repositories."""
+
+import unittest
+from datetime import UTC, datetime
+from typing import Any, cast
+
+from svc.config import ServiceConfig, validate_model
+from svc.controllers import ResticRunner, ResticSnapshot
+from svc.core import SnapshotReplicator
+
+NOW = datetime(2026, 6, 15, 12, tzinfo=UTC)
+
+
+class FakeRepository:
+    """Stands in for a ResticRunner whose repository holds the given snapshots."""
+
+    def __init__(self, snapshots: list[ResticSnapshot]):
+        self._snapshots = snapshots
+
+    async def snapshots(self, _tags: list[str]) -> list[ResticSnapshot]:
+        return self._snapshots
+
+
+def _snapshot(snap_id: str, time: str) -> ResticSnapshot:
+    return {"id": snap_id, "time": time, "tree": f"tree-{snap_id}"}
+
+
+def _service(policy: dict[str, int] | None = None) -> ServiceConfig:
+    backup: dict[str, Any] = {"enable": True, "tags": ["app"], "policy": policy}
+    return validate_model(
+        ServiceConfig, {"name": "app", "backup": backup, "restore": {"tag": "app"}}
+    )
+
+
+def _replicator(source: list[ResticSnapshot], target: list[ResticSnapshot]) -> SnapshotReplicator:
+    return SnapshotReplicator(
+        cast("ResticRunner", FakeRepository(source)), cast("ResticRunner", FakeRepository(target))
+    )
+
+
+class MissingSnapshotsTest(unittest.IsolatedAsyncioTestCase):
+    async def test_copies_older_snapshot_still_missing(self) -> None:
+        # An interrupted copy brought over the newest snapshot of a run but not its
+        # older sibling (e.g. a stream snapshot taken a second earlier)
+        stream = _snapshot("stream", "2026-06-15T03:00:01+00:00")
+        files = _snapshot("files", "2026-06-15T03:00:02+00:00")
+        replicator = _replicator([stream, files], [files])
+
+        missing = await replicator.missing_snapshots(_service(), NOW)
+
+        self.assertEqual(missing, ["stream"])
+
+    async def test_skips_snapshots_outside_the_retention_window(self) -> None:
+        old = _snapshot("old", "2026-06-01T03:00:00+00:00")
+        recent = _snapshot("recent", "2026-06-10T03:00:00+00:00")
+        replicator = _replicator([old, recent], [])
+
+        missing = await replicator.missing_snapshots(_service({"daily": 7}), NOW)
+
+        self.assertEqual(missing, ["recent"])
+
+    async def test_count_only_policy_keeps_everything_missing(self) -> None:
+        old = _snapshot("old", "2020-01-01T03:00:00+00:00")
+        replicator = _replicator([old], [])
+
+        missing = await replicator.missing_snapshots(_service({"last": 3}), NOW)
+
+        self.assertEqual(missing, ["old"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -38,12 +38,24 @@ in {
       description = "Vault address for the Vault agent.";
     };
 
+    vault.localAddress = mkOption {
+      type = types.str;
+      default = "http://127.0.0.1:8200";
+      description = "Vault address on this host (the vault pod's loopback host port), for calls that must not go through the public ingress.";
+    };
+
     vault.tokenPath = mkOption {
       type = types.str;
       default = "/var/lib/secrets/vault/access-token";
       description = "Path to Vault token used by the Vault agent (read-only).";
     };
 
+    vault.backupTokenPath = mkOption {
+      type = types.str;
+      default = "/var/lib/secrets/vault/backup-token";
+      description = "Path to the Vault token used by backups (read-only). Its policy should only grant `read` on `sys/storage/raft/snapshot`.";
+    };
+
     vault.unsealTokenPath = mkOption {
       type = types.str;
       default = "/var/lib/secrets/vault/unseal-token";
@@ -116,15 +128,42 @@ in {
                         default = [];
                         description = "Kubernetes PersistentVolumeClaims to back up.";
                       };
+                      dependsOn = mkOption {
+                        type = types.attrsOf (types.listOf types.str);
+                        default = {};
+                        description = "Deployment ordering graph: each deployment maps to the deployments it needs. Dependents are scaled down first and started last; deployments on the same level are scaled concurrently.";
+                      };
+                      detectWriters = mkOption {
+                        type = types.bool;
+                        default = false;
+                        description = "Quiesce only the namespace's deployments whose pod templates mount one of `pvcs` read-write, instead of `deployments` (which restore still uses). `svc backup --dry-run` shows the computed set.";
+                      };
                     };
                   });
                   default = null;
                   description = "Kubernetes backup targets for this service.";
                 };
                 preBackupCommands = mkOption {
-                  type = types.listOf (types.listOf types.str);
+                  type = types.listOf (types.coercedTo (types.listOf types.str) (command: {inherit command;}) (types.submodule {
+                    options = {
+                      command = mkOption {
+                        type = types.listOf types.str;
+                        description = "Command to run on the host.";
+                      };
+                      parallel = mkOption {
+                        type = types.bool;
+                        default = false;
+                        description = "Run concurrently with the neighbouring parallel commands instead of on its own.";
+                      };
+                      timeoutSeconds = mkOption {
+                        type = types.ints.positive;
+                        default = 1800;
+                        description = "How long the command may take before its process group is killed and the backup fails.";
+                      };
+                    };
+                  }));
                   default = [];
-                  description = "Commands to run immediately before resolving and backing up targets.";
+                  description = "Commands to run immediately before backing up targets (a bare argv is a serial command with the default timeout). Kubernetes PVCs are resolved while they run.";
                 };
                 tags = mkOption {
                   type = types.listOf types.str;
@@ -155,6 +194,226 @@ in {
                   };
                   description = "Retention policy for backups (set to null to skip forget).";
                 };
+                snapshot = mkOption {
+                  type = types.nullOr (types.submodule {
+                    options = {
+                      provider = mkOption {
+                        type = types.enum ["auto" "lvm" "btrfs" "reflink" "copy"];
+                        default = "auto";
+                        description = "How to freeze backup targets: LVM thin snapshot, btrfs snapshot, reflink clone, or an rsync-maintained staging copy (`auto` picks the cheapest supported one).";
+                      };
+                      stagingDir = mkOption {
+                        type = types.nullOr types.str;
+                        default = null;
+                        description = "Where reflink/copy views are kept (defaults to `.svc-snapshots` at the target's mount point). The copy provider keeps a full mirror here between runs.";
+                      };
+                    };
+                  });
+                  default = null;
+                  description = "Freeze a point-in-time view of the targets so scaled-down deployments can come back before restic runs.";
+                };
+                quiesce = mkOption {
+                  type = types.enum ["scale" "freeze"];
+                  default = "scale";
+                  description = "How deployments are stopped for the backup: scale them to zero, or freeze their pods' cgroups in place (crash-consistent, no restart; best combined with `snapshot` to keep the freeze short).";
+                };
+                quiesceHooks = mkOption {
+                  type = types.listOf (types.submodule {
+                    options = {
+                      name = mkOption {
+                        type = types.str;
+                        description = "Name used in logs and error messages.";
+                      };
+                      quiesce = mkOption {
+                        type = types.listOf types.str;
+                        description = "Command that makes the application's on-disk state consistent (e.g. enable maintenance mode, flush and lock tables).";
+                      };
+                      unquiesce = mkOption {
+                        type = types.listOf types.str;
+                        default = [];
+                        description = "Command that undoes `quiesce` once the data is captured.";
+                      };
+                      deployment = mkOption {
+                        type = types.nullOr types.str;
+                        default = null;
+                        description = "Run the commands in a pod of this deployment (in the backup namespace) via `kubectl exec`; null runs them on the host.";
+                      };
+                      container = mkOption {
+                        type = types.nullOr types.str;
+                        default = null;
+                        description = "Container to exec into (defaults to the pod's default container).";
+                      };
+                      hold = mkOption {
+                        type = types.bool;
+                        default = false;
+                        description = "Keep the quiesce command running until the data is captured, e.g. a database session holding a read lock. The hook is quiesced once the command prints a line; it is released by closing its stdin.";
+                      };
+                      timeoutSeconds = mkOption {
+                        type = types.ints.positive;
+                        default = 60;
+                        description = "How long each command may take (for hold hooks: to print its ready line, and to exit after release) before its process group is killed.";
+                      };
+                    };
+                  });
+                  default = [];
+                  description = "Application-aware quiesce/unquiesce hooks. When set, they replace stopping the Kubernetes deployments, so the service keeps serving during the backup.";
+                };
+                streams = mkOption {
+                  type = types.listOf (types.submodule {
+                    options = {
+                      name = mkOption {
+                        type = types.str;
+                        description = "Name used in logs and backup results.";
+                      };
+                      command = mkOption {
+                        type = types.listOf types.str;
+                        description = "Command whose stdout is backed up (e.g. `pg_dump`); a non-zero exit fails the stream and saves no snapshot.";
+                      };
+                      filename = mkOption {
+                        type = types.str;
+                        description = "Path the stream is stored under in its restic snapshot.";
+                      };
+                      deployment = mkOption {
+                        type = types.nullOr types.str;
+                        default = null;
+                        description = "Run the command in a pod of this deployment (in the backup namespace) via `kubectl exec`; null runs it on the host.";
+                      };
+                      container = mkOption {
+                        type = types.nullOr types.str;
+                        default = null;
+                        description = "Container to exec into (defaults to the pod's default container).";
+                      };
+                    };
+                  });
+                  default = [];
+                  description = "Commands whose output is piped straight into `restic backup --stdin-from-command`, one snapshot each, before the service is quiesced. Nothing is staged on disk.";
+                };
+                k3sEtcd = mkOption {
+                  type = types.nullOr (types.submodule {
+                    options = {
+                      k3s = mkOption {
+                        type = types.str;
+                        description = "Path to the k3s binary used to save and prune etcd snapshots.";
+                      };
+                      etcdctl = mkOption {
+                        type = types.nullOr types.str;
+                        default = null;
+                        description = "Path to etcdctl, used to compact and defragment etcd before the snapshot; null skips both.";
+                      };
+                      timeoutSeconds = mkOption {
+                        type = types.ints.positive;
+                        default = 600;
+                        description = "How long each k3s or etcdctl command may take before it is killed.";
+                      };
+                    };
+                  });
+                  default = null;
+                  description = "Built-in k3s embedded-etcd source: take one fresh `svc-backup` etcd snapshot, prune older ones, and back up only that file and the server token. The file name is recorded in the backup metadata for `svc restore`.";
+                };
+                vaultRaft = mkOption {
+                  type = types.nullOr (types.submodule {
+                    options = {
+                      address = mkOption {
+                        type = types.str;
+                        description = "Vault API address; use a local listener so snapshots never leave the host.";
+                      };
+                      tokenPath = mkOption {
+                        type = types.str;
+                        description = "File holding a token allowed to read `sys/storage/raft/snapshot`. Restores take a token allowed to write `sys/storage/raft/snapshot-force` through `svc restore --vault-token-file`.";
+                      };
+                      curl = mkOption {
+                        type = types.str;
+                        default = "curl";
+                        description = "curl binary used to call the Vault API.";
+                      };
+                      filename = mkOption {
+                        type = types.str;
+                        default = "vault-raft.snap";
+                        description = "Path the raft snapshot is stored under in its restic snapshot.";
+                      };
+                    };
+                  });
+                  default = null;
+                  description = "Built-in stream source: pipe a Vault raft snapshot from the API straight into restic, without stopping Vault. `svc restore` feeds it back through `snapshot-force`.";
+                };
+                prometheusSnapshot = mkOption {
+                  type = types.nullOr (types.submodule {
+                    options = {
+                      pvc = mkOption {
+                        type = types.str;
+                        description = "PVC holding the Prometheus TSDB, in the backup namespace. Leave it out of `kubernetes.pvcs`.";
+                      };
+                      deployment = mkOption {
+                        type = types.str;
+                        default = "prometheus";
+                        description = "Prometheus deployment the snapshot request is run in via `kubectl exec`. Prometheus must run with `--web.enable-admin-api`.";
+                      };
+                      container = mkOption {
+                        type = types.nullOr types.str;
+                        default = null;
+                        description = "Container of the deployment's pod; null uses the default container.";
+                      };
+                      tsdbPath = mkOption {
+                        type = types.str;
+                        default = "data";
+                        description = "TSDB directory (`--storage.tsdb.path`) relative to the PVC root.";
+                      };
+                      port = mkOption {
+                        type = types.port;
+                        default = 9090;
+                        description = "Port Prometheus listens on inside its pod.";
+                      };
+                      timeoutSeconds = mkOption {
+                        type = types.ints.positive;
+                        default = 300;
+                        description = "Timeout for the snapshot request.";
+                      };
+                    };
+                  });
+                  default = null;
+                  description = "Built-in source: back up a TSDB snapshot taken through the Prometheus admin API instead of the live PVC, without stopping Prometheus. `svc restore` restores it into the PVC in place of the TSDB.";
+                };
+                sharding = mkOption {
+                  type = types.nullOr (types.submodule {
+                    options = {
+                      by = mkOption {
+                        type = types.enum ["target" "directory"];
+                        default = "target";
+                        description = "Write one snapshot per backup target (path or PVC), or additionally split plain directory targets into one snapshot per top-level subdirectory.";
+                      };
+                      jobs = mkOption {
+                        type = types.ints.positive;
+                        default = 2;
+                        description = "How many shard snapshots restic writes at once.";
+                      };
+                    };
+                  });
+                  default = null;
+                  description = "Back up the targets as several concurrently written snapshots instead of one. Shards of a run share a group tag, and `svc restore` reads each path from the shard holding it.";
+                };
+                targetClasses = mkOption {
+                  type = types.attrsOf (types.submodule {
+                    options = {
+                      frequency = mkOption {
+                        type = types.enum ["nightly" "weekly" "monthly" "never"];
+                        default = "nightly";
+                        description = "How often the target is backed up. Runs in between leave it out of the snapshot.";
+                      };
+                      regenerable = mkOption {
+                        type = types.bool;
+                        default = false;
+                        description = "The target can be rebuilt (caches, thumbnails): backups skip it when it is missing and restores skip it when no snapshot holds it.";
+                      };
+                    };
+                  });
+                  default = {};
+                  description = "Frequency classes of backup targets, keyed by path or PVC name. Unlisted targets are backed up on every run; `svc restore` reads targets missing from a snapshot from the latest earlier snapshot holding them.";
+                };
+                weight = mkOption {
+                  type = types.ints.positive;
+                  default = 1;
+                  description = "Scheduler slots this service occupies while `svc backup --jobs N` runs services concurrently.";
+                };
 
                 restore = mkOption {
                   type = types.nullOr (types.submodule ({...}: {
@@ -188,6 +447,11 @@ in {
                               default = [];
                               description = "Kubernetes PersistentVolumeClaims to restore.";
                             };
+                            dependsOn = mkOption {
+                              type = types.attrsOf (types.listOf types.str);
+                              default = {};
+                              description = "Deployment ordering graph used during restore (see backup.kubernetes.dependsOn).";
+                            };
                           };
                         });
                         default = backupCfg.kubernetes;
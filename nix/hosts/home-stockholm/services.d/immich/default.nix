@@ -6,6 +6,9 @@
       namespace = "immich";
       deployments = ["immich-server" "immich-machine-learning" "redis" "database"];
       pvcs = ["immich-db" "immich-model-cache"];
+      dependsOn = {
+        immich-server = ["database" "redis"];
+      };
     };
   };
 }
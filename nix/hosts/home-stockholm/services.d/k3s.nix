@@ -2,21 +2,10 @@
   name = "k3s";
   backup = {
     enable = true;
-    preBackupCommands = [
-      [
-        "${pkgs.k3s}/bin/k3s"
-        "etcd-snapshot"
-        "save"
-        "--name"
-        "svc-backup"
-        "--snapshot-retention"
-        "5"
-      ]
-    ];
-    paths = [
-      "/var/lib/rancher/k3s/server/db/snapshots"
-      "/var/lib/rancher/k3s/server/token"
-    ];
+    k3sEtcd = {
+      k3s = "${pkgs.k3s}/bin/k3s";
+      etcdctl = "${pkgs.etcd}/bin/etcdctl";
+    };
     tags = ["k3s" "cluster-state"];
     restore = {
       paths = [];
@@ -4,8 +4,10 @@
     enable = true;
     kubernetes = {
       namespace = "monitoring";
-      deployments = ["grafana" "prometheus" "influxdb"];
-      pvcs = ["grafana-data" "influxdb-data" "prometheus-data"];
+      deployments = ["grafana" "influxdb"];
+      pvcs = ["grafana-data" "influxdb-data"];
     };
+    # Prometheus keeps scraping: its TSDB is backed up from an admin API snapshot
+    prometheusSnapshot = {pvc = "prometheus-data";};
   };
 }
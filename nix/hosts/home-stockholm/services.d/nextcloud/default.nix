@@ -11,6 +11,10 @@
         "nextcloud-site"
         "nextcloud-redis-data"
       ];
+      dependsOn = {
+        nextcloud = ["mariadb-nc" "redis"];
+        nextcloud-cron = ["mariadb-nc" "redis"];
+      };
     };
     tags = ["nextcloud"];
     exclude = [
@@ -11,6 +11,11 @@
         "mautrix-signal-data"
         "mautrix-whatsapp-data"
       ];
+      dependsOn = {
+        synapse = ["synapse-db"];
+        mautrix-signal = ["synapse"];
+        mautrix-whatsapp = ["synapse"];
+      };
     };
     tags = ["synapse"];
     exclude = [
@@ -1,11 +1,15 @@
-{...}: {
+{
+  config,
+  pkgs,
+  ...
+}: {
   name = "vault";
   backup = {
     enable = true;
-    kubernetes = {
-      namespace = "vault";
-      deployments = ["vault"];
-      pvcs = ["vault-data"];
+    vaultRaft = {
+      address = config.homeserver.vault.localAddress;
+      tokenPath = config.homeserver.vault.backupTokenPath;
+      curl = "${pkgs.curl}/bin/curl";
     };
   };
 }
@@ -55,6 +55,7 @@
     ++ [
       config.homeserver.vault.tokenPath
       config.homeserver.vault.unsealTokenPath
+      config.homeserver.vault.backupTokenPath
     ];
 
   # Cleanup script: remove files in secretsRoot not in current config
@@ -149,6 +150,7 @@ in
         # z: restore the mode/ownership if the file exists (do not create if absent).
         "z ${config.homeserver.vault.tokenPath} 0400 root root -"
         "z ${config.homeserver.vault.unsealTokenPath} 0400 root root -"
+        "z ${config.homeserver.vault.backupTokenPath} 0400 root root -"
       ]
       ++ map (dir: "d ${dir} 0700 root root -") secretDirs;
   }